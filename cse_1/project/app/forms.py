@@ -1,5 +1,9 @@
 # forms.py - Simplified approach using JSON field for day-time preferences
 from django import forms
+from django.conf import settings
+
+from .seating import parse_capacities
+from .solver import SOLVER_PROFILES
 
 class TotalTeachersForm(forms.Form):
     total_teachers = forms.IntegerField(
@@ -13,6 +17,12 @@ class TotalTeachersForm(forms.Form):
             ('even', 'Even Semester (4, 6, 8)')
         ]
     )
+    solver_profile = forms.ChoiceField(
+        label="Solver Profile",
+        choices=[(name, p["label"]) for name, p in SOLVER_PROFILES.items()],
+        initial=lambda: settings.TIMETABLE_SOLVER_PROFILE,
+        required=False
+    )
 
 class TeacherForm(forms.Form):
     def __init__(self, *args, **kwargs):
@@ -55,6 +65,30 @@ class TeacherForm(forms.Form):
 
 class SeatingForm(forms.Form):
     num_sems = forms.IntegerField(label="Number of Semesters", min_value=1, initial=2)
-    num_classes = forms.IntegerField(label="Total Classrooms", min_value=1)
-    benches_per_class = forms.IntegerField(label="Benches per Classroom", min_value=1)
-    students_per_bench = forms.IntegerField(label="Students per Bench", min_value=1, max_value=3, initial=2)
\ No newline at end of file
+    num_classes = forms.IntegerField(label="Total Classrooms", min_value=1, required=False)
+    benches_per_class = forms.IntegerField(label="Benches per Classroom", min_value=1, required=False)
+    # Rooms of different sizes, overriding the two fields above: "30, 30, 6x5"
+    room_benches = forms.CharField(label="Benches in Each Room", required=False)
+    students_per_bench = forms.IntegerField(label="Students per Bench", min_value=1, max_value=3, initial=2)
+    roster_backend = forms.ChoiceField(
+        label="Read PDFs with",
+        choices=[('', 'Automatic (by file type and content)'),
+                 ('pypdf2', 'PyPDF2 (text; misreads ruled tables)'), ('pypdfium2', 'PDFium (text, fast)'),
+                 ('pdfplumber', 'pdfplumber (ruled tables)')],
+        required=False
+    )
+
+    def clean_room_benches(self):
+        try:
+            return parse_capacities(self.cleaned_data.get('room_benches'))
+        except ValueError as exc:
+            raise forms.ValidationError(str(exc))
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not cleaned_data.get('room_benches'):
+            rooms, benches = cleaned_data.get('num_classes'), cleaned_data.get('benches_per_class')
+            if not rooms or not benches:
+                raise forms.ValidationError("Enter the number of classrooms and benches, or the benches in each room.")
+            cleaned_data['room_benches'] = [benches] * rooms
+        return cleaned_data
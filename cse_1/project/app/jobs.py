@@ -0,0 +1,282 @@
+# jobs.py
+# Background timetable solve jobs.
+#
+# Submitting the teacher formset no longer blocks a Django worker for the
+# whole CP-SAT time budget: the solve runs on a small thread pool (CP-SAT
+# releases the GIL while searching) and the views poll the job by id.
+# The registry is per process. Every job also has a TimetableJobState row
+# that follows its status, so another worker can answer a poll for it or
+# ask it to cancel, and a finished job's result is stored with its id (see
+# results.job_result_id), so any worker can still serve it.
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from . import metrics, results, solution_cache
+from .models import TimetableJobState
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+
+class SolveJob:
+    """One timetable solve: its inputs, state and, once finished, its result."""
+
+    def __init__(self, entries, owner=None, profile=None, cache_key=None, previous=None,
+                 changed_teacher=None, changed_years=(), source=None, previous_index=None):
+        self.id = uuid.uuid4().hex
+        self.entries = entries
+        self.owner = owner
+        self.profile = profile
+        self.cache_key = cache_key
+        self.previous = previous
+        # Teacher index of `previous` (see solver.extract_teacher_index)
+        self.previous_index = previous_index
+        self.changed_teacher = changed_teacher
+        self.changed_years = changed_years
+        # View that submitted the job, used to label its metrics
+        self.source = source
+        self.status = PENDING
+        self.result = None
+        # Id of the stored TimetableResult once the job is done
+        self.result_id = None
+        self.error = None
+        # Best solution so far of an optimizing solve (see solver.add_objective)
+        self.progress = None
+        self._solver = None
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATES
+
+    def _attach_solver(self, solver):
+        # Called by the allocator right before the search starts
+        with self._lock:
+            self._solver = solver
+            if self.status == CANCELLED:
+                solver.StopSearch()
+
+    def _record_progress(self, progress):
+        # Called from the solver thread on every improving solution
+        self.progress = progress
+
+    def cancel(self):
+        """Stop the job; returns False if it had already finished."""
+        with self._lock:
+            if self.finished:
+                return False
+            self.status = CANCELLED
+            if self._solver is not None:
+                self._solver.StopSearch()
+        self._save_state()
+        return True
+
+    def _cancelled_elsewhere(self):
+        # Another worker process marked the job's row as cancelled
+        try:
+            return TimetableJobState.objects.filter(pk=self.id, status=CANCELLED).exists()
+        except Exception:
+            logger.exception("Could not read the state of timetable job %s", self.id)
+            return False
+
+    def _save_state(self):
+        try:
+            TimetableJobState.objects.update_or_create(
+                pk=self.id, defaults={"owner_id": self.owner, "status": self.status, "error": self.error or ""})
+        except Exception:
+            logger.exception("Could not save the state of timetable job %s", self.id)
+
+    def run(self):
+        from .solver import resolve_teacher, solve_timetable
+
+        with self._lock:
+            if self.status == CANCELLED or self._cancelled_elsewhere():
+                self.status = CANCELLED
+                return
+            self.status = RUNNING
+        self._save_state()
+        try:
+            if self.changed_teacher:
+                solved = resolve_teacher(self.entries, self.previous, self.changed_teacher, self.changed_years,
+                                         profile=self.profile, on_solver=self._attach_solver,
+                                         previous_index=self.previous_index)
+            else:
+                solved = solve_timetable(self.entries, profile=self.profile, on_solver=self._attach_solver,
+                                         previous=self.previous, previous_index=self.previous_index,
+                                         on_solution=self._record_progress)
+        except Exception as exc:
+            logger.exception("Timetable job %s failed", self.id)
+            with self._lock:
+                self.status = FAILED
+                self.error = str(exc)
+            self._save_state()
+            return
+        for phase, seconds in solved["stats"].get("timings", {}).items():
+            metrics.observe(self.source, phase, seconds)
+        metrics.SOLVES.labels(self.source or "unknown", solved["stats"]["status"]).inc()
+        # A cancel sent to another worker cannot stop the search here; the
+        # result is dropped instead
+        elsewhere = self._cancelled_elsewhere()
+        with self._lock:
+            if self.status == CANCELLED or elsewhere:
+                self.status = CANCELLED
+                return
+            self._finish(solved)
+        self._store()
+        self._save_state()
+
+        if self.cache_key and solved["stats"]["status"] in ("OPTIMAL", "FEASIBLE"):
+            try:
+                solution_cache.put(self.cache_key, solved)
+            except Exception:
+                logger.exception("Could not cache timetable job %s", self.id)
+
+    def _finish(self, solved):
+        self.result = {
+            "timetables": solved["timetables"],
+            "teacher_index": solved["teacher_index"],
+            "unallocated": solved["unallocated"],
+            "teacher_subjects": collect_teacher_subjects(self.entries),
+            "stats": solved["stats"],
+        }
+        self.result["version"] = results.result_version(self.result)
+        self.status = DONE
+
+    def _store(self):
+        # The in-memory result keeps serving this job if the write fails
+        try:
+            self.result_id = results.store(self.owner, self.entries, self.result, job_id=self.id)
+        except Exception:
+            logger.exception("Could not store the result of timetable job %s", self.id)
+
+
+def collect_teacher_subjects(entries):
+    """teacher -> list of subjects, in entry order."""
+    teacher_subjects = {}
+    for entry in entries:
+        subjects = teacher_subjects.setdefault(entry['teacher'], [])
+        if entry['subject'] not in subjects:
+            subjects.append(entry['subject'])
+    return teacher_subjects
+
+
+_jobs = OrderedDict()
+_jobs_lock = threading.Lock()
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    with _jobs_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "TIMETABLE_JOB_WORKERS", 4),
+                thread_name_prefix="timetable-job",
+            )
+        return _executor
+
+
+def _forget_old_jobs():
+    # Keep the registry bounded; only finished jobs are ever dropped.
+    keep = getattr(settings, "TIMETABLE_JOBS_KEEP", 200)
+    finished = [job_id for job_id, job in _jobs.items() if job.finished]
+    for job_id in finished[:max(0, len(_jobs) - keep)]:
+        del _jobs[job_id]
+
+
+def submit(entries, owner=None, profile=None, use_cache=True, previous=None,
+           changed_teacher=None, changed_years=(), source=None, previous_index=None):
+    """
+    Queue a solve for `entries` and return the job immediately.
+
+    If the same entries were already solved with the same profile, the job
+    is finished straight from the solution cache. Pass use_cache=False to
+    force a fresh solve (the new solution still replaces the cached one).
+    `previous` warm-starts the solve from an earlier timetable and asks for
+    a different one; with `changed_teacher` it is instead the timetable to
+    keep stable while only that teacher's `changed_years` are re-solved.
+    Such a partial re-solve never uses the solution cache: a cached full
+    solve could move every other teacher, and its result is not a full
+    solve of `entries` for later lookups either.
+    `previous_index` is the teacher index that was solved with `previous`.
+    `source` names the submitting view in the job's metrics.
+    """
+    if changed_teacher:
+        use_cache = False
+    job = SolveJob(entries, owner=owner, profile=profile,
+                   cache_key=None if changed_teacher else solution_cache.cache_key(entries, profile),
+                   previous=previous,
+                   changed_teacher=changed_teacher, changed_years=changed_years, source=source,
+                   previous_index=previous_index)
+    cached = solution_cache.get(job.cache_key) if use_cache else None
+    if use_cache:
+        metrics.SOLUTION_CACHE.labels("hit" if cached is not None else "miss").inc()
+    if cached is not None:
+        cached["stats"]["cached"] = True
+        job._finish(cached)
+        job._store()
+    job._save_state()
+    _forget_old_states(owner)
+    with _jobs_lock:
+        _jobs[job.id] = job
+        _forget_old_jobs()
+    if not job.finished:
+        if getattr(settings, "TIMETABLE_JOBS_EAGER", False):
+            job.run()
+        else:
+            _get_executor().submit(job.run)
+    return job
+
+
+def _forget_old_states(owner):
+    # Keep TIMETABLE_JOBS_KEEP job rows per user
+    keep = getattr(settings, "TIMETABLE_JOBS_KEEP", 200)
+    try:
+        stale = list(TimetableJobState.objects.filter(owner_id=owner).order_by("-created_at")
+                     .values_list("pk", flat=True)[keep:])
+        if stale:
+            TimetableJobState.objects.filter(pk__in=stale).delete()
+    except Exception:
+        logger.exception("Could not drop old timetable job states")
+
+
+def get_state(job_id, owner=None):
+    """
+    The TimetableJobState row of a job, for jobs that run in another
+    worker process (or ran before a restart); None if there is none.
+    """
+    return TimetableJobState.objects.filter(pk=job_id, owner_id=owner).first()
+
+
+def cancel_elsewhere(state):
+    """
+    Mark the job of `state` cancelled for the worker that runs it; returns
+    False if it had already finished. That worker stops the job before it
+    starts or drops its result when the search ends.
+    """
+    cancelled = TimetableJobState.objects.filter(pk=state.pk, status__in=(PENDING, RUNNING)).update(
+        status=CANCELLED)
+    if cancelled:
+        state.status = CANCELLED
+    return bool(cancelled)
+
+
+def get(job_id, owner=None):
+    """Look up a job; jobs belonging to another user are treated as missing."""
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+    if job is None or (owner is not None and job.owner != owner):
+        return None
+    return job
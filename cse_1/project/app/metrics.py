@@ -0,0 +1,135 @@
+# metrics.py
+# Prometheus metrics for the timetable and seating views.
+#
+# Instrumented views are wrapped in @timed_view, which counts requests and
+# times the whole view; phases inside a view are timed with span() or
+# mark(). The session write happens after the view returns and is timed by
+# TimedSessionMiddleware. Solver phases run in the job thread and are
+# reported by jobs.py from the solve statistics. Everything is exported by
+# the /metrics/ view, to the scrapers allowed by the TIMETABLE_METRICS_*
+# settings.
+#
+# Metrics are kept per process. With more than one worker process, start
+# them with PROMETHEUS_MULTIPROC_DIR pointing at an empty directory, so
+# each writes its values there and /metrics/ sums them up (see the
+# prometheus_client docs on multiprocess mode). Without it, a scrape only
+# sees the worker that answers it.
+import hmac
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.sessions.middleware import SessionMiddleware
+from prometheus_client import Counter, Histogram
+
+# From sub-millisecond session writes up to the longest solver time limit
+PHASE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+PHASE_SECONDS = Histogram(
+    "timetable_phase_seconds", "Time spent in each phase of a request or a solve.",
+    ["view", "phase"], buckets=PHASE_BUCKETS,
+)
+REQUESTS = Counter(
+    "timetable_view_requests_total", "Requests handled by instrumented views.",
+    ["view", "method"],
+)
+SOLVES = Counter(
+    "timetable_solves_total", "Finished timetable solves by solver status.",
+    ["view", "status"],
+)
+SOLUTION_CACHE = Counter(
+    "timetable_solution_cache_total", "Solution cache lookups by result.",
+    ["result"],
+)
+RENDER_CACHE = Counter(
+    "timetable_render_cache_total", "Download render cache lookups by result.",
+    ["result"],
+)
+ROSTER_CACHE = Counter(
+    "timetable_roster_cache_total", "Parsed roster cache lookups by result.",
+    ["result"],
+)
+
+_current = threading.local()
+
+
+def observe(view, phase, seconds):
+    PHASE_SECONDS.labels(view or "unknown", phase).observe(seconds)
+
+
+def mark(phase, started):
+    """Record `phase` of the current view as lasting since perf_counter() value `started`."""
+    observe(getattr(_current, "view", None), phase, time.perf_counter() - started)
+
+
+@contextmanager
+def span(phase):
+    """Time the enclosed block as `phase` of the current view."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        mark(phase, started)
+
+
+def timed_view(name):
+    """Count and time a view; spans inside it are labelled with `name`."""
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            REQUESTS.labels(name, request.method).inc()
+            request._metrics_view = name
+            previous, _current.view = getattr(_current, "view", None), name
+            try:
+                with span("total"):
+                    return view_func(request, *args, **kwargs)
+            finally:
+                _current.view = previous
+        return wrapper
+    return decorator
+
+
+def scrape_allowed(request):
+    """
+    Whether `request` may read the metrics: staff users, clients from
+    TIMETABLE_METRICS_ALLOWED_IPS and requests with the header
+    "Authorization: Bearer <TIMETABLE_METRICS_TOKEN>".
+    """
+    user = getattr(request, "user", None)
+    if user is not None and user.is_staff:
+        return True
+    if request.META.get("REMOTE_ADDR") in getattr(settings, "TIMETABLE_METRICS_ALLOWED_IPS", ()):
+        return True
+    token = getattr(settings, "TIMETABLE_METRICS_TOKEN", "")
+    return bool(token) and hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}")
+
+
+def exposition():
+    """(body, content type) of the metrics, of every worker in multiprocess mode."""
+    from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest
+
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+class TimedSessionMiddleware(SessionMiddleware):
+    """SessionMiddleware that records the session write of instrumented views."""
+
+    def process_response(self, request, response):
+        view = getattr(request, "_metrics_view", None)
+        if view is None:
+            return super().process_response(request, response)
+        started = time.perf_counter()
+        try:
+            return super().process_response(request, response)
+        finally:
+            observe(view, "session_write", time.perf_counter() - started)
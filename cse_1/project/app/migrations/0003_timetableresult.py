@@ -0,0 +1,42 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0002_solutioncacheentry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimetableResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('entries', models.JSONField()),
+                ('teacher_subjects', models.JSONField()),
+                ('teacher_years', models.JSONField()),
+                ('unallocated', models.JSONField(default=list)),
+                ('stats', models.JSONField(default=dict)),
+                ('owner', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='timetable_results', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TimetableYear',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('grid', models.JSONField()),
+                ('result', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='years', to='app.timetableresult')),
+            ],
+            options={
+                'ordering': ['year'],
+                'unique_together': {('result', 'year')},
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_timetableresult'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimetableTeacher',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('teacher', models.CharField(max_length=100)),
+                ('slots', models.JSONField()),
+                ('result', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='teachers', to='app.timetableresult')),
+            ],
+            options={
+                'unique_together': {('result', 'teacher')},
+            },
+        ),
+    ]
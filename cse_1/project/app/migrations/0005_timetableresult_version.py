@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_timetableteacher'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timetableresult',
+            name='version',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
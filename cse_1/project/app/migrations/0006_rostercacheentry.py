@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_timetableresult_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RosterCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('payload', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(auto_now=True, db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_rostercacheentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timetableresult',
+            name='job_id',
+            field=models.CharField(blank=True, db_index=True, max_length=32),
+        ),
+    ]
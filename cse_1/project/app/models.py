@@ -1,3 +1,4 @@
+from django.contrib.auth.models import User
 from django.db import models
 
 class SeatingArrangement(models.Model):
@@ -8,3 +9,99 @@ class SeatingArrangement(models.Model):
 
     def __str__(self):
         return f"Room {self.room_number} - Bench {self.bench_number}"
+
+
+class SolutionCacheEntry(models.Model):
+    """A solved timetable keyed by a hash of its canonical entries and solver profile."""
+    key = models.CharField(max_length=64, unique=True)
+    payload = models.TextField()  # JSON: timetables, unallocated, stats
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __str__(self):
+        return self.key
+
+
+class RosterCacheEntry(models.Model):
+    """The students parsed from one uploaded roster, keyed by a hash of its bytes and the parser."""
+    key = models.CharField(max_length=64, unique=True)
+    payload = models.TextField()  # JSON: list of [usn, name]
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __str__(self):
+        return self.key
+
+
+class TimetableResult(models.Model):
+    """
+    A finished timetable solve, referenced from the session by id.
+
+    The grids live in one TimetableYear row per year so a page can load
+    only the years it shows; `teacher_years` says which years those are
+    for a single teacher, and that teacher's TimetableTeacher row lists
+    the slots to show in them.
+    """
+    owner = models.ForeignKey(User, null=True, blank=True, on_delete=models.CASCADE,
+                              related_name="timetable_results")
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    entries = models.JSONField()           # solver input, for "Generate Again" and teacher edits
+    teacher_subjects = models.JSONField()  # teacher -> subjects, in entry order
+    teacher_years = models.JSONField()     # teacher -> years taught
+    unallocated = models.JSONField(default=list)
+    stats = models.JSONField(default=dict)
+    version = models.CharField(max_length=64, blank=True)  # content hash, see results.result_version
+    job_id = models.CharField(max_length=32, blank=True, db_index=True)  # solve job that produced it
+
+    def __str__(self):
+        return f"Timetable {self.pk} ({self.created_at:%Y-%m-%d %H:%M})"
+
+
+class TimetableYear(models.Model):
+    """One year's grid of a TimetableResult: day -> the 9 period slots."""
+    result = models.ForeignKey(TimetableResult, on_delete=models.CASCADE, related_name="years")
+    year = models.PositiveSmallIntegerField()
+    grid = models.JSONField()
+
+    class Meta:
+        ordering = ["year"]
+        unique_together = [("result", "year")]
+
+    def __str__(self):
+        return f"Timetable {self.result_id} year {self.year}"
+
+
+class TimetableTeacher(models.Model):
+    """One teacher's slots in a TimetableResult: [[year, day, period, kind], ...]."""
+    result = models.ForeignKey(TimetableResult, on_delete=models.CASCADE, related_name="teachers")
+    teacher = models.CharField(max_length=100)
+    slots = models.JSONField()
+
+    class Meta:
+        unique_together = [("result", "teacher")]
+
+    def __str__(self):
+        return f"Timetable {self.result_id} of {self.teacher}"
+
+
+class TimetableJobState(models.Model):
+    """
+    The state of a solve job, shared by every worker process.
+
+    The job itself runs in the process that accepted it (app/jobs.py);
+    this row lets the others answer status polls and cancel requests.
+    """
+    id = models.CharField(primary_key=True, max_length=32)
+    owner = models.ForeignKey(User, null=True, blank=True, on_delete=models.CASCADE,
+                              related_name="timetable_jobs")
+    status = models.CharField(max_length=16)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def finished(self):
+        return self.status in ("done", "failed", "cancelled")
+
+    def __str__(self):
+        return f"Job {self.id} ({self.status})"
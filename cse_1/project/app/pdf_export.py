@@ -0,0 +1,457 @@
+# pdf_export.py
+# ReportLab builders for the timetable and seating PDFs.
+#
+# The builders take plain result data and return the PDF bytes, so the
+# download views and the bulk "all teachers" bundle share them. Paragraph
+# and table styles are built once per process (get_styles()); tables get
+# one shared base style plus a command per highlighted run of cells. The bundle
+# renders one PDF per teacher in a shared process pool and streams the ZIP while
+# the pool is still working. ReportLab is imported inside the builders
+# (see app/startup.py).
+import atexit
+import os
+import threading
+import time
+import zipfile
+from io import BytesIO
+
+from .solver import DAYS
+
+PERIODS = [
+    ("1st", "9:00-10:00"), ("2nd", "10:00-11:00"),
+    ("Break", "11:00-11:15"),
+    ("3rd", "11:15-12:15"), ("4th", "12:15-1:15"),
+    ("Lunch", "1:15-2:30"),
+    ("5th", "2:30-3:20"), ("6th", "3:20-4:15"), ("7th", "4:15-5:00")
+]
+
+
+def _mark(mark, phase, started):
+    if mark is not None:
+        mark(phase, started)
+
+
+def teacher_filename(teacher_name):
+    return f"{teacher_name.replace(' ', '_')}_timetable.pdf"
+
+
+class PdfStyles:
+    """
+    Paragraph and table styles of the three exporters, built once per
+    process by get_styles() and shared by every document afterwards.
+
+    Treat every attribute as read-only: the builders derive per-document
+    styles with ParagraphStyle(parent=...) or a second setStyle() call
+    instead of mutating these.
+    """
+
+    def __init__(self):
+        from reportlab.lib import colors
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        from reportlab.platypus import TableStyle
+
+        sample = getSampleStyleSheet()
+        self.normal = sample['Normal']
+        self.heading1 = sample['Heading1']
+        self.title = sample['Title']
+
+        # Department timetable
+        self.timetable_title = ParagraphStyle('TimetableTitle', parent=sample['Title'], alignment=1, fontSize=14)
+        self.timetable_heading = ParagraphStyle(
+            'TimetableHeading', parent=sample['Heading3'], borderWidth=0, borderColor=colors.HexColor('#ddd'),
+            borderPadding=2, spaceAfter=5, fontSize=12,
+        )
+        self.warning = ParagraphStyle(
+            'Warning', parent=sample['Normal'], backColor=colors.HexColor('#ffe6e6'),
+            borderColor=colors.HexColor('#ff9999'), borderWidth=1, borderPadding=5, spaceAfter=10, fontSize=8,
+        )
+        self.teacher_box = ParagraphStyle(
+            'TeacherBox', parent=sample['Normal'], backColor=colors.HexColor('#e9f7ef'),
+            borderColor=colors.HexColor('#27ae60'), borderWidth=1, borderPadding=5, alignment=1, fontSize=8,
+        )
+        self.teacher_boxes_table = TableStyle([('VALIGN', (0, 0), (-1, -1), 'MIDDLE')])
+        self.timetable_header = ['Day'] + [f"{name} {period_time}" for name, period_time in PERIODS]
+        # letter is 612 points wide; 10 point margins leave ~592 for Day + 9 periods
+        self.timetable_col_widths = [592 / 10] * 10
+        self.timetable_table = TableStyle([
+            # Header: background #f2f2f2, bold, center, tiny font
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f2f2f2')),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('FONTSIZE', (0, 0), (-1, 0), 6),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 1),
+            ('TOPPADDING', (0, 0), (-1, 0), 1),
+            ('LEFTPADDING', (0, 0), (-1, -1), 1),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 1),
+            # Body: tiny font
+            ('FONTSIZE', (0, 1), (-1, -1), 4),
+            # Grid: thin
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#ddd')),
+        ])
+        self.lab_background = colors.lightblue
+
+        # Teacher timetable: every body cell starts as an empty slot
+        # (#f9f9f9, grey text); the teacher's classes are painted over it
+        self.teacher_header = ['Day'] + [f"{name}\n{period_time}" for name, period_time in PERIODS]
+        self.teacher_table = TableStyle([
+            # Header row: background #f2f2f2, bold, center
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f2f2f2')),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+            ('TOPPADDING', (0, 0), (-1, 0), 8),
+            ('LEFTPADDING', (0, 0), (-1, -1), 8),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 8),
+            # Grid: 1px solid #ddd
+            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#ddd')),
+            # Empty slots: background #f9f9f9, color #999
+            ('BACKGROUND', (1, 1), (-1, -1), colors.HexColor('#f9f9f9')),
+            ('TEXTCOLOR', (1, 1), (-1, -1), colors.HexColor('#999')),
+        ])
+        self.subject_background = colors.HexColor('#e9f7ef')
+        self.subject_text = colors.black
+
+        # Seating arrangement
+        self.seating_title = ParagraphStyle('SeatingTitle', parent=sample['Title'], fontSize=18, alignment=1)
+        self.seating_cell = ParagraphStyle('Cell', parent=sample['Normal'], fontSize=10, leading=10)
+        # Student cells are plain "usn\nname" strings laid out like seating_cell
+        # (Paragraph is only used for names that need wrapping)
+        self.seating_table = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+            ('TOPPADDING', (0, 0), (-1, 0), 8),
+            ('LEFTPADDING', (0, 0), (-1, -1), 6),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 6),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('FONTSIZE', (0, 1), (-1, -1), 10),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+            ('ALIGN', (1, 1), (-1, -1), 'LEFT'),
+            ('FONTNAME', (1, 1), (-1, -1), self.seating_cell.fontName),
+            ('LEADING', (1, 1), (-1, -1), self.seating_cell.leading),
+        ])
+
+
+_styles = None
+
+
+def get_styles():
+    """The process-wide PdfStyles, built on first use."""
+    global _styles
+    if _styles is None:
+        # Two threads racing here each build an identical set; one wins
+        _styles = PdfStyles()
+    return _styles
+
+
+def _runs(cells, selected):
+    # (first, last) column spans of consecutive cells for which selected()
+    # holds, counting the first cell as column 1 (column 0 is the day)
+    runs, start = [], None
+    for col, cell in enumerate(cells, start=1):
+        if selected(cell):
+            if start is None:
+                start = col
+        elif start is not None:
+            runs.append((start, col - 1))
+            start = None
+    if start is not None:
+        runs.append((start, len(cells)))
+    return runs
+
+
+def _is_lab(slot):
+    return bool(slot) and ' - Lab' in slot
+
+
+def timetable_pdf(timetables, unallocated, teacher_subjects, year_labels, mark=None):
+    """
+    The department timetable PDF: every year's grid, the teacher list and
+    the unallocated warnings. `mark(phase, started)`, if given, is called
+    after the pdf_layout and pdf_build phases.
+    """
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Table, Paragraph, Spacer
+
+    layout_started = time.perf_counter()
+    styles = get_styles()
+    # Generate PDF matching HTML layout exactly
+    buffer = BytesIO()
+    # Use minimal margins to maximize space
+    doc = SimpleDocTemplate(buffer, pagesize=letter, leftMargin=10, rightMargin=10, topMargin=10, bottomMargin=10)
+    elements = [Paragraph("Generated Timetables", styles.timetable_title), Spacer(1, 6)]
+
+    # Warning box if unallocated, smaller
+    if unallocated:
+        warning_text = "<strong>Warning — some hours couldn't be scheduled:</strong><br/>"
+        for u in unallocated:
+            theory_rem = u.get('theory_remaining', 0)
+            lab_rem = u.get('lab_remaining', 0)
+            warning_text += f"• {u['teacher']} (Year {u['year']}) — {u['subject']} — theory: {theory_rem}, lab: {lab_rem} — int: {'Y' if u['is_integrated'] else 'N'} — ext: {'Y' if u['is_external_lab'] else 'N'}<br/>"
+            if u.get('reason'):
+                warning_text += f"&nbsp;&nbsp;{u['reason']}<br/>"
+        elements.append(Paragraph(warning_text, styles.warning))
+        elements.append(Spacer(1, 6))
+
+    # Teacher boxes, 3 per row
+    if teacher_subjects:
+        boxes = [Paragraph(f"<strong>{teacher}</strong><br/>{', '.join(subjects)}", styles.teacher_box)
+                 for teacher, subjects in teacher_subjects.items()]
+        boxes += [''] * (-len(boxes) % 3)  # Pad the last row
+        teacher_table = Table([boxes[i:i + 3] for i in range(0, len(boxes), 3)], colWidths=[180]*3)
+        teacher_table.setStyle(styles.teacher_boxes_table)
+        elements.append(teacher_table)
+        elements.append(Spacer(1, 10))
+
+    # Timetables per semester
+    empty_day = [None] * len(PERIODS)
+    for year, days_dict in timetables.items():
+        sem_label = year_labels.get(year, f"Year {year}")
+        elements.append(Paragraph(f"Semester {sem_label}", styles.timetable_heading))
+
+        data = [styles.timetable_header]
+        lab_runs = []
+        for row_idx, day in enumerate(DAYS, start=1):
+            slots = days_dict.get(day, empty_day)
+            data.append([day] + [slot if slot else '-' for slot in slots])
+            # One command per lab block instead of one per cell
+            lab_runs += [('BACKGROUND', (first, row_idx), (last, row_idx), styles.lab_background)
+                         for first, last in _runs(slots, _is_lab)]
+
+        table = Table(data, colWidths=styles.timetable_col_widths)
+        table.setStyle(styles.timetable_table)
+        if lab_runs:
+            table.setStyle(lab_runs)
+        elements.append(table)
+        elements.append(Spacer(1, 10))  # Smaller spacer
+    _mark(mark, "pdf_layout", layout_started)
+
+    build_started = time.perf_counter()
+    doc.build(elements)
+    _mark(mark, "pdf_build", build_started)
+    return buffer.getvalue()
+
+
+def teacher_timetable_pdf(teacher_name, subjects, teacher_timetables, year_labels, mark=None):
+    """
+    One teacher's timetable PDF. `teacher_timetables` is the teacher's
+    year -> day -> slots grid (see results.teacher_grids); `mark` is as in
+    timetable_pdf().
+    """
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Table, Paragraph
+
+    layout_started = time.perf_counter()
+    styles = get_styles()
+    # Generate PDF matching the HTML layout and styles
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    elements = [
+        Paragraph(f"{teacher_name}'s Timetable", styles.title),
+        Paragraph(f"Subjects: {', '.join(subjects)}", styles.normal),
+        Paragraph("", styles.normal),  # Spacer
+    ]
+
+    empty_day = [None] * len(PERIODS)
+    for year, days_dict in teacher_timetables.items():
+        sem_label = year_labels.get(year, f"Year {year}")
+        elements.append(Paragraph(f"Semester {sem_label}", styles.heading1))
+
+        data = [styles.teacher_header]
+        class_runs = []
+        for row_idx, day in enumerate(DAYS, start=1):
+            slots = days_dict.get(day, empty_day)
+            data.append([day] + [slot if slot else '-' for slot in slots])
+            # The teacher's classes, painted over the empty-slot band
+            for first, last in _runs(slots, bool):
+                class_runs += [
+                    ('BACKGROUND', (first, row_idx), (last, row_idx), styles.subject_background),
+                    ('FONTNAME', (first, row_idx), (last, row_idx), 'Helvetica-Bold'),
+                    ('TEXTCOLOR', (first, row_idx), (last, row_idx), styles.subject_text),
+                ]
+
+        table = Table(data)
+        table.setStyle(styles.teacher_table)
+        if class_runs:
+            table.setStyle(class_runs)
+        elements.append(table)
+        elements.append(Paragraph("", styles.normal))  # Spacer
+    _mark(mark, "pdf_layout", layout_started)
+
+    build_started = time.perf_counter()
+    doc.build(elements)
+    _mark(mark, "pdf_build", build_started)
+    return buffer.getvalue()
+
+
+def seating_pdf(arrangement, students_per_bench, mark=None, overflow=None):
+    """
+    The seating arrangement PDF: one page per room, benches in tables of
+    five, and a last page listing the `overflow` students that could not
+    be seated, if any. Rooms are seating.Room records or their stored lists
+    [number, benches, empty]; students are roster.Student records or their
+    stored lists [usn, name, section]. `mark` is as in timetable_pdf().
+    """
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+    from reportlab.platypus import SimpleDocTemplate, Table, Paragraph, Spacer, PageBreak
+
+    layout_started = time.perf_counter()
+    styles = get_styles()
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=A4,
+        leftMargin=20,
+        rightMargin=20,
+        topMargin=20,
+        bottomMargin=20
+    )
+    elements = []
+
+    # Decide column headers based on students_per_bench
+    if students_per_bench == 3:
+        col_headers = ["column 1 (left)", "column 2 (middle)", "column 3 (right)"]
+    elif students_per_bench == 2:
+        col_headers = ["column 1 (left)", "column 2 (right)"]
+    else:
+        col_headers = [f"Student {j+1}" for j in range(students_per_bench)]
+
+    headers = ['Bench'] + col_headers
+
+    # Page width for colWidths
+    page_width = 555  # approx usable width (A4 - margins)
+    bench_width = 60
+    student_width = (page_width - bench_width) / students_per_bench
+    colWidths = [bench_width] + [student_width] * students_per_bench
+    cell = styles.seating_cell
+    text_width = student_width - 12  # minus LEFTPADDING and RIGHTPADDING
+
+    def fits(text):
+        return stringWidth(text, cell.fontName, cell.fontSize) <= text_width
+
+    def student_cell(student):
+        usn, name = student[0], student[1]
+        if fits(usn) and fits(name):
+            return f"{usn}\n{name}" if name else usn
+        return Paragraph(f"{usn}<br/>{name}" if name else usn, cell)
+
+    for room_index, (room, benches, empty) in enumerate(arrangement):
+        # Room title
+        elements.append(Paragraph(f"Seating Arrangement - Room {room}", styles.seating_title))
+        elements.append(Spacer(1, 12))
+
+        # Filled benches are numbered from 1 in order; the empty ones follow
+        rows = [[str(bench_num)] + [student_cell(s) for s in students] + [''] * (students_per_bench - len(students))
+                for bench_num, students in enumerate(benches, 1)]
+        rows += [[str(bench_num)] + [''] * students_per_bench
+                 for bench_num in range(len(benches) + 1, len(benches) + empty + 1)]
+
+        # ✅ create a SEPARATE TABLE for every 5 benches
+        for start in range(0, len(rows), 5):
+            data = [headers] + rows[start:start + 5]
+
+            table = Table(data, colWidths=colWidths)
+            table.setStyle(styles.seating_table)
+
+            elements.append(table)
+            elements.append(Spacer(1, 16))  # space between groups of 5 benches
+
+        # Page break between rooms
+        if room_index < len(arrangement) - 1:
+            elements.append(PageBreak())
+
+    if overflow:
+        elements.append(PageBreak())
+        elements.append(Paragraph(f"Not Seated - {len(overflow)} students", styles.seating_title))
+        elements.append(Spacer(1, 12))
+        data = [['USN', 'Name', 'Semester']] + [[usn, name, str(section or '')] for usn, name, section in overflow]
+        table = Table(data, colWidths=[140, 335, 80], repeatRows=1)
+        table.setStyle(styles.seating_table)
+        elements.append(table)
+    _mark(mark, "pdf_layout", layout_started)
+
+    build_started = time.perf_counter()
+    doc.build(elements)
+    _mark(mark, "pdf_build", build_started)
+    return buffer.getvalue()
+
+
+def _render_teacher(args):
+    teacher_name, subjects, teacher_timetables, year_labels = args
+    return teacher_filename(teacher_name), teacher_timetable_pdf(teacher_name, subjects, teacher_timetables,
+                                                                 year_labels)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _render_pool():
+    # Shared by every bundle download so none of them pays for starting the
+    # workers
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            from .startup import process_context
+
+            _pool = process_context().Pool(os.cpu_count() or 1)
+            atexit.register(_pool.terminate)
+        return _pool
+
+
+class _ZipStream:
+    # Write-only file for zipfile: written bytes are collected until the
+    # bundle generator drains them. zipfile sees no tell()/seek() and writes
+    # data descriptors instead of seeking back into local headers.
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def iter_teacher_bundle(teachers, year_labels, master=None, processes=None):
+    """
+    Render one PDF per teacher and yield a ZIP archive of them chunk by chunk.
+
+    `teachers` is a list of (teacher_name, subjects, teacher_timetables).
+    `master`, if given, is the department PDF to add as timetable.pdf.
+    With more than one of `processes` (default: one per core) and of
+    teachers, the PDFs are rendered in the shared worker pool and added in
+    the order they finish; otherwise they are rendered inline.
+    """
+    tasks = [(name, subjects, grids, year_labels) for name, subjects, grids in teachers]
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = min(processes, len(tasks))
+
+    stream = _ZipStream()
+    with zipfile.ZipFile(stream, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        if master is not None:
+            archive.writestr("timetable.pdf", master)
+            yield stream.drain()
+        if processes > 1:
+            for filename, pdf in _render_pool().imap_unordered(_render_teacher, tasks):
+                archive.writestr(filename, pdf)
+                yield stream.drain()
+        else:
+            for task in tasks:
+                filename, pdf = _render_teacher(task)
+                archive.writestr(filename, pdf)
+                yield stream.drain()
+    yield stream.drain()
@@ -0,0 +1,52 @@
+# profiling.py
+# Opt-in cProfile of a single request, for staff users.
+#
+# Add ?_profile=1 (or an "X-Profile: 1" header) to any URL to get the
+# profile report back instead of the page. With ?_profile=store the page is
+# returned as usual and the raw profile is written to TIMETABLE_PROFILE_DIR
+# (named in the X-Profile-File response header) for snakeviz/pstats.
+import cProfile
+import io
+import logging
+import os
+import pstats
+import time
+
+from django.conf import settings
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+# Number of functions listed in a returned report
+REPORT_LINES = 60
+
+
+class ProfileMiddleware:
+    """Run one request under cProfile when a staff user asks for it."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = request.GET.get("_profile") or request.headers.get("X-Profile")
+        user = getattr(request, "user", None)
+        if not mode or user is None or not user.is_staff:
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        response = profiler.runcall(self.get_response, request)
+
+        if mode == "store":
+            directory = settings.TIMETABLE_PROFILE_DIR
+            os.makedirs(directory, exist_ok=True)
+            view = request.resolver_match.url_name if request.resolver_match else "unknown"
+            path = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{view}-{os.getpid()}.prof")
+            profiler.dump_stats(path)
+            logger.info("Stored request profile of %s in %s", request.path, path)
+            response["X-Profile-File"] = os.path.basename(path)
+            return response
+
+        report = io.StringIO()
+        stats = pstats.Stats(profiler, stream=report)
+        stats.sort_stats("cumulative").print_stats(REPORT_LINES)
+        return HttpResponse(report.getvalue(), content_type="text/plain; charset=utf-8")
@@ -0,0 +1,60 @@
+# render_cache.py
+# Rendered downloads, keyed by the version of the data they show.
+#
+# Every stored timetable result and seating arrangement carries a content
+# hash (its version). PDFs rendered from it are kept in the "renders" cache
+# under that version, and download responses carry an ETag (plus
+# Last-Modified when known) so a repeat download is answered with 304 Not
+# Modified or from the cache instead of a ReportLab layout pass. The result
+# pages cache their grids with the {% cache %} tag under the same version.
+import hashlib
+import json
+
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from . import metrics
+
+CACHE_ALIAS = "renders"
+
+
+def content_version(*parts):
+    """SHA-256 of the JSON form of `parts`."""
+    blob = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def download(request, version, variant, render, filename, content_type="application/pdf", last_modified=None):
+    """
+    Serve the bytes of `render()` as an attachment, cached by version.
+
+    `variant` tells apart the documents rendered from one version (which
+    teacher, which semester labels); `render` is only called on a cache
+    miss. `last_modified` is a Unix timestamp. Clients that already hold
+    this version get 304 Not Modified.
+    """
+    key = content_version(version, variant)
+    response = HttpResponse(content_type=content_type)
+    response["ETag"] = quote_etag(key)
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified)
+    # Per-user data: browsers may keep it but must revalidate every time
+    patch_cache_control(response, private=True, no_cache=True)
+
+    conditional = get_conditional_response(request, etag=response["ETag"], last_modified=last_modified,
+                                           response=response)
+    if conditional is not response:
+        metrics.RENDER_CACHE.labels("not_modified").inc()
+        return conditional
+
+    cache = caches[CACHE_ALIAS]
+    content = cache.get(key)
+    metrics.RENDER_CACHE.labels("hit" if content is not None else "miss").inc()
+    if content is None:
+        content = render()
+        cache.set(key, content)
+    response.content = content
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
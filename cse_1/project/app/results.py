@@ -0,0 +1,150 @@
+# results.py
+# Persistent store of finished timetables.
+#
+# A finished solve is written once as a TimetableResult with one
+# TimetableYear row per year and one TimetableTeacher row per teacher with
+# the slots the solver gave them; the session only keeps its id, so session
+# reads and writes stay the same size whatever the department. Pages load
+# just what they show: the full result, one teacher's years, or the
+# entries needed to re-solve.
+import logging
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import TimetableResult, TimetableTeacher, TimetableYear
+from .render_cache import content_version
+
+logger = logging.getLogger(__name__)
+
+
+def teacher_years(entries):
+    """teacher -> sorted list of years taught."""
+    years = {}
+    for entry in entries:
+        years.setdefault(entry["teacher"], set()).add(int(entry.get("year", 1)))
+    return {teacher: sorted(ys) for teacher, ys in years.items()}
+
+
+def result_version(result):
+    """Content hash of a result: its grids, teacher index, unallocated list and teacher subjects."""
+    return content_version(result["timetables"], result.get("teacher_index"), result["unallocated"],
+                           result["teacher_subjects"])
+
+
+def teacher_grids(timetables, subjects, slots=None, years=None):
+    """
+    Year -> day -> slots of one teacher, None where they have no class.
+
+    Filled from the teacher's own `slots` in the solver's index; without an
+    index (results stored before it existed) cells are matched against the
+    teacher's `subjects`. `years`, if given, limits the grids to those years.
+    """
+    if years is not None:
+        years = {str(y) for y in years}
+        timetables = {year: days for year, days in timetables.items() if str(year) in years}
+    grids = {year: {day: [None] * len(row) for day, row in days.items()}
+             for year, days in timetables.items()}
+    if slots is None:
+        labels = set()
+        for subject in subjects:
+            labels.update((subject, f"{subject} - Lab"))
+        for year, days in timetables.items():
+            for day, row in days.items():
+                grids[year][day] = [slot if slot in labels else None for slot in row]
+        return grids
+
+    for year, day, period, _kind in slots:
+        if year not in grids:
+            year = str(year)  # grids that went through JSON are keyed by string
+        if year in grids:
+            grids[year][day][period] = timetables[year][day][period]
+    return grids
+
+
+def store(owner_id, entries, result, job_id=""):
+    """Persist a job result and return its id; older results of the owner beyond the limit are dropped."""
+    with transaction.atomic():
+        row = TimetableResult.objects.create(
+            owner_id=owner_id,
+            entries=entries,
+            teacher_subjects=result["teacher_subjects"],
+            teacher_years=teacher_years(entries),
+            unallocated=result["unallocated"],
+            stats=result["stats"],
+            version=result.get("version") or result_version(result),
+            job_id=job_id or "",
+        )
+        TimetableYear.objects.bulk_create([
+            TimetableYear(result=row, year=int(year), grid=grid)
+            for year, grid in result["timetables"].items()
+        ])
+        TimetableTeacher.objects.bulk_create([
+            TimetableTeacher(result=row, teacher=teacher, slots=slots)
+            for teacher, slots in result.get("teacher_index", {}).items()
+        ])
+
+    keep = getattr(settings, "TIMETABLE_RESULTS_PER_USER", 20)
+    stale = (TimetableResult.objects.filter(owner_id=owner_id).order_by("-created_at")
+             .values_list("pk", flat=True)[keep:])
+    stale_ids = list(stale)
+    if stale_ids:
+        TimetableResult.objects.filter(pk__in=stale_ids).delete()
+        logger.debug("Dropped %d old timetable results of user %s", len(stale_ids), owner_id)
+    return row.pk
+
+
+def job_result_id(job_id, owner_id):
+    """
+    Id of the stored result of a finished job, or None.
+
+    Jobs only live in the registry of the worker process that ran them;
+    this is how other workers, or the same one after a restart, find them.
+    """
+    return (TimetableResult.objects.filter(job_id=job_id, owner_id=owner_id).order_by("-pk")
+            .values_list("pk", flat=True).first())
+
+
+def load(result_id, owner_id, teacher=None, with_entries=False, with_index=False):
+    """
+    Load a stored result as {"timetables", "unallocated", "teacher_subjects",
+    "teacher_years", "stats", "version", "last_modified"}.
+
+    With `teacher`, only the years that teacher teaches are loaded, plus
+    their slots from the solver's teacher index under "teacher_slots".
+    `with_index` adds every teacher's slots under "teacher_index"; both are
+    None for results stored without an index. `with_entries` adds the
+    solver input under "entries". Returns None if the result does not exist
+    or belongs to someone else.
+    """
+    rows = TimetableResult.objects.filter(pk=result_id, owner_id=owner_id)
+    if not with_entries:
+        rows = rows.defer("entries")
+    row = rows.first()
+    if row is None:
+        return None
+
+    years = TimetableYear.objects.filter(result=row)
+    if teacher is not None:
+        years = years.filter(year__in=row.teacher_years.get(teacher, []))
+    loaded = {
+        "id": row.pk,
+        "timetables": {y.year: y.grid for y in years},
+        "unallocated": row.unallocated,
+        "teacher_subjects": row.teacher_subjects,
+        "teacher_years": row.teacher_years,
+        "stats": row.stats,
+        "version": row.version or None,
+        "last_modified": int(row.created_at.timestamp()),
+    }
+    if teacher is not None:
+        slots = TimetableTeacher.objects.filter(result=row, teacher=teacher).values_list("slots", flat=True).first()
+        if slots is None and row.teachers.exists():
+            slots = []  # indexed result, teacher has no classes
+        loaded["teacher_slots"] = slots
+    if with_index:
+        index = dict(TimetableTeacher.objects.filter(result=row).values_list("teacher", "slots"))
+        loaded["teacher_index"] = index or None
+    if with_entries:
+        loaded["entries"] = row.entries
+    return loaded
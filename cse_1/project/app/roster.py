@@ -0,0 +1,322 @@
+# roster.py
+# Student rosters from the class lists uploaded to the seating page.
+#
+# A roster is read by one of several backends (BACKENDS): the PDF text
+# extractors of PyPDF2 and pypdfium2, pdfplumber's table finder, or a CSV or
+# XLSX export of the class list, which skips PDF text extraction entirely.
+# CSV and XLSX uploads are recognised by their extension; PDFs go to the
+# backend picked on the form or SEATING_ROSTER_BACKEND. Left on "auto",
+# each upload is read by the backend its content calls for (see
+# detect_backend). Every backend yields
+# one (usn, name) pair per student, page by page, as a generator, so no
+# whole-document string is ever built; parse_rosters turns them into
+# Student records that the allocator, the session, the result page and the
+# PDF use as they are. The uploaded files are parsed side
+# by side in a process pool (SEATING_PARSE_WORKERS), so a seating run takes
+# as long as its slowest roster rather than the sum, and a roster parsed
+# before is taken from the roster cache (app/roster_cache.py) instead.
+import csv
+import io
+import logging
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import NamedTuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Bump when a backend's output changes so stale cached rosters are never reused
+PARSER_VERSION = 2
+
+# Header words of the roster tables; lines containing them as words are not students
+HEADER_WORDS = ('sl no', 'sl.no', 'serial', 'usn', 'name')
+_HEADER_RE = re.compile(r'\b(?:' + '|'.join(re.escape(word) for word in HEADER_WORDS) + r')\b')
+
+
+class RosterError(ValueError):
+    """An uploaded roster that cannot be read."""
+
+
+class Student(NamedTuple):
+    """
+    One student of an uploaded roster; `section` is the 1-based upload it
+    came from. A tuple without per-instance dict, stored in the session as
+    the JSON list [usn, name, section].
+    """
+    usn: str
+    name: str
+    section: int
+
+
+def split_line(line):
+    """(usn, name) of a roster text line "USN Name"."""
+    usn, _, name = line.partition(' ')
+    return usn, name.strip()
+
+
+def is_student_line(line):
+    """True for a non-empty roster line that is not a page number, page footer or table header."""
+    lowered = line.lower()
+    return (
+        len(line) > 5
+        and not line.isdigit()
+        and not lowered.startswith('page')
+        and not _HEADER_RE.search(lowered)
+        and any(c.isalpha() for c in line)
+    )
+
+
+def _student_lines(lines):
+    """(usn, name) of the roster lines that pass is_student_line, without a leading serial number."""
+    for line in lines:
+        line = line.strip()
+        if not line or not is_student_line(line):
+            continue
+        first, _, rest = line.partition(' ')
+        if rest and first.rstrip('.').isdigit():
+            line = rest.lstrip()
+        yield split_line(line)
+
+
+def _tabular_students(rows):
+    """
+    (usn, name) of table rows, without any line heuristics.
+
+    A row with a USN and a name heading picks the columns (tables that
+    repeat their header on every page are fine); before one is seen, the
+    first cell that is not a serial number is the USN and the next one
+    the name. Rows without both are skipped.
+    """
+    usn_col = name_col = None
+    for row in rows:
+        cells = [' '.join(str(cell).split()) if cell is not None else '' for cell in row]
+        lowered = [cell.lower() for cell in cells]
+        usn_heading = next((i for i, cell in enumerate(lowered) if re.search(r'\busn\b', cell)), None)
+        name_heading = next((i for i, cell in enumerate(lowered) if 'name' in cell and i != usn_heading), None)
+        if usn_heading is not None and name_heading is not None:
+            usn_col, name_col = usn_heading, name_heading
+            continue
+        if usn_col is not None:
+            usn = cells[usn_col] if usn_col < len(cells) else ''
+            name = cells[name_col] if name_col < len(cells) else ''
+        else:
+            filled = [cell for cell in cells if cell]
+            while filled and filled[0].rstrip('.').isdigit():
+                filled.pop(0)
+            usn, name = (filled + ['', ''])[:2]
+        if usn and name:
+            yield usn, name
+
+
+def iter_students(pdf_file):
+    """Yield the (usn, name) of the students of a roster PDF, page by page."""
+    import PyPDF2
+
+    for page in PyPDF2.PdfReader(pdf_file).pages:
+        text = page.extract_text()
+        if text:
+            yield from _student_lines(text.split('\n'))
+
+
+def iter_students_pdfium(pdf_file):
+    """iter_students with PDFium's text extraction."""
+    import pypdfium2
+
+    pdf = pypdfium2.PdfDocument(pdf_file.read())
+    try:
+        for page in pdf:
+            textpage = page.get_textpage()
+            text = textpage.get_text_range()
+            textpage.close()
+            page.close()
+            yield from _student_lines(text.splitlines())
+    finally:
+        pdf.close()
+
+
+def iter_students_pdfplumber(pdf_file):
+    """Rows of the ruled tables on each page; pages without a table fall back to their text lines."""
+    import pdfplumber
+
+    with pdfplumber.open(pdf_file) as pdf:
+        for page in pdf.pages:
+            tables = page.extract_tables()
+            if tables:
+                yield from _tabular_students(row for table in tables for row in table)
+            else:
+                yield from _student_lines((page.extract_text() or '').split('\n'))
+            page.close()
+
+
+def iter_students_csv(csv_file):
+    """Rows of a CSV class list (comma, semicolon or tab separated)."""
+    data = csv_file.read()
+    try:
+        text = data.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        text = data.decode('latin-1')
+    try:
+        dialect = csv.Sniffer().sniff(text[:4096], delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    yield from _tabular_students(csv.reader(io.StringIO(text), dialect))
+
+
+def iter_students_xlsx(xlsx_file):
+    """Rows of the first worksheet of an XLSX class list."""
+    try:
+        import openpyxl
+    except ImportError:
+        raise RosterError("XLSX rosters need openpyxl; upload a CSV or PDF instead.")
+
+    workbook = openpyxl.load_workbook(xlsx_file, read_only=True, data_only=True)
+    try:
+        yield from _tabular_students(workbook.worksheets[0].iter_rows(values_only=True))
+    finally:
+        workbook.close()
+
+
+BACKENDS = {
+    "pypdf2": iter_students,
+    "pypdfium2": iter_students_pdfium,
+    "pdfplumber": iter_students_pdfplumber,
+    "csv": iter_students_csv,
+    "xlsx": iter_students_xlsx,
+}
+
+# Backends that read PDFs, in the order the seating form offers them
+PDF_BACKENDS = ("pypdf2", "pypdfium2", "pdfplumber")
+
+# Uploads that are read by their extension whatever PDF backend is chosen
+EXTENSION_BACKENDS = {".csv": "csv", ".xlsx": "xlsx"}
+
+
+# Pick the backend from each upload's content, see detect_backend
+AUTO = "auto"
+
+
+def backend_for(filename, requested=None):
+    """
+    Backend for an upload: by extension for CSV/XLSX, else `requested` or
+    SEATING_ROSTER_BACKEND. AUTO is resolved when the file is parsed.
+    """
+    extension = os.path.splitext(filename or '')[1].lower()
+    backend = EXTENSION_BACKENDS.get(extension) or requested or getattr(settings, "SEATING_ROSTER_BACKEND", AUTO)
+    if backend != AUTO and backend not in BACKENDS:
+        raise RosterError(f"Unknown roster backend {backend!r}.")
+    return backend
+
+
+def detect_backend(data, filename=None):
+    """
+    Backend for an upload by its content. XLSX files are ZIP archives and
+    PDFs start with "%PDF-"; anything else is read as CSV unless it is
+    named .pdf. A PDF whose first page has a ruled table goes to
+    pdfplumber, which reads the cells exactly; other PDFs go to pypdfium2,
+    the fastest of the text extractors. PyPDF2 is never picked: it breaks
+    the cells of ruled tables apart (no row read back exactly in
+    benchmarks/bench_roster.py).
+    """
+    if data.startswith(b"PK\x03\x04"):
+        return "xlsx"
+    if b"%PDF-" not in data[:1024]:
+        extension = os.path.splitext(filename or '')[1].lower()
+        return EXTENSION_BACKENDS.get(extension) or ("pypdfium2" if extension == ".pdf" else "csv")
+    return "pdfplumber" if _has_ruled_table(data) else "pypdfium2"
+
+
+def _has_ruled_table(data):
+    try:
+        import pdfplumber
+
+        with pdfplumber.open(BytesIO(data)) as pdf:
+            if not pdf.pages:
+                return False
+            page = pdf.pages[0]
+            try:
+                return bool(page.find_tables())
+            finally:
+                page.close()
+    except Exception as exc:
+        # Leave the error to the backend that actually reads the file
+        logger.debug("Could not look for ruled tables: %s", exc)
+        return False
+
+
+def read_roster(roster_file, backend):
+    """All (usn, name) pairs of one roster with the given backend."""
+    try:
+        return list(BACKENDS[backend](roster_file))
+    except RosterError:
+        raise
+    except Exception as exc:
+        logger.info("Roster could not be read with %s: %s", backend, exc)
+        raise RosterError(f"{getattr(roster_file, 'name', None) or 'A roster'} could not be read as {backend}.") from exc
+
+
+def _parse_bytes(backend, data, name=None):
+    if backend == AUTO:
+        backend = detect_backend(data, name)
+        logger.debug("Reading %s with %s", name or "a roster", backend)
+    roster_file = BytesIO(data)
+    roster_file.name = name
+    return read_roster(roster_file, backend)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            from .startup import process_context
+
+            _executor = ProcessPoolExecutor(max_workers=_workers(), mp_context=process_context())
+        return _executor
+
+
+def _workers():
+    return getattr(settings, "SEATING_PARSE_WORKERS", None) or os.cpu_count() or 1
+
+
+def parse_rosters(files, backend=None, use_cache=True):
+    """
+    Parse uploaded rosters into one list of Student records per file, in order.
+
+    `backend` picks the PDF backend (see backend_for), AUTO or None a
+    backend per file by its content. Rosters parsed before
+    are taken from the roster cache; of the others, with more than one to
+    parse and more than one worker, they are parsed in the shared process
+    pool; otherwise in the calling thread. Raises RosterError for a file
+    that cannot be read.
+    """
+    from . import metrics, roster_cache
+
+    uploads = []
+    for f in files:
+        name = getattr(f, 'name', None)
+        b = backend_for(name, backend)
+        data = f.read()
+        uploads.append((roster_cache.cache_key(data, b), b, data, name))
+
+    parsed = roster_cache.get_many(key for key, *_ in uploads) if use_cache else {}
+    missing = {key: (b, data, name) for key, b, data, name in uploads if key not in parsed}
+    metrics.ROSTER_CACHE.labels("hit").inc(len(uploads) - len(missing))
+    metrics.ROSTER_CACHE.labels("miss").inc(len(missing))
+
+    if len(missing) < 2 or _workers() < 2:
+        parsed.update((key, _parse_bytes(*args)) for key, args in missing.items())
+    else:
+        futures = {key: _get_executor().submit(_parse_bytes, *args) for key, args in missing.items()}
+        parsed.update((key, future.result()) for key, future in futures.items())
+    if use_cache:
+        for key in missing:
+            roster_cache.put(key, parsed[key])
+    return [[Student(usn, name, section) for usn, name in parsed[key]]
+            for section, (key, *_) in enumerate(uploads, 1)]
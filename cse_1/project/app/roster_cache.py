@@ -0,0 +1,47 @@
+# roster_cache.py
+# Content-addressed cache of parsed rosters.
+#
+# Entries are keyed by a SHA-256 of the uploaded file's bytes plus the
+# backend that reads it and roster.PARSER_VERSION, so uploading the same
+# class list again, or re-running seating with other room numbers, skips
+# text extraction entirely. Like the solution cache the store is a database
+# table shared by every worker process, bounded by SEATING_ROSTER_CACHE_SIZE
+# and evicting the least recently used rows.
+import hashlib
+import json
+import logging
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import RosterCacheEntry
+
+logger = logging.getLogger(__name__)
+
+
+def cache_key(data, backend):
+    from .roster import PARSER_VERSION
+
+    digest = hashlib.sha256(f"{PARSER_VERSION}:{backend}:".encode("utf-8"))
+    digest.update(data)
+    return digest.hexdigest()
+
+
+def get_many(keys):
+    """key -> cached [usn, name] pairs, for the keys that are cached."""
+    rows = list(RosterCacheEntry.objects.filter(key__in=set(keys)).only("key", "payload"))
+    if rows:
+        RosterCacheEntry.objects.filter(pk__in=[row.pk for row in rows]).update(last_used_at=timezone.now())
+    return {row.key: json.loads(row.payload) for row in rows}
+
+
+def put(key, students):
+    """Store the parsed (usn, name) pairs of a roster and evict the least recently used rows beyond the size limit."""
+    RosterCacheEntry.objects.update_or_create(key=key, defaults={"payload": json.dumps(students)})
+
+    limit = getattr(settings, "SEATING_ROSTER_CACHE_SIZE", 200)
+    stale = RosterCacheEntry.objects.order_by("-last_used_at").values_list("pk", flat=True)[limit:]
+    stale_ids = list(stale)
+    if stale_ids:
+        RosterCacheEntry.objects.filter(pk__in=stale_ids).delete()
+        logger.debug("Evicted %d cached rosters", len(stale_ids))
@@ -0,0 +1,137 @@
+# seating.py
+# Bench allocation for exam seating.
+#
+# Students of all sections are seated bench by bench from a max-heap of the
+# sections keyed on how many of their students are still unseated, so the
+# biggest sections are spread first and small ones never end up bunched at
+# the end. A bench takes students of different sections, preferring
+# sections not seated on the bench before it; a second student of one
+# section shares a bench only when the remaining capacity leaves no other
+# way to seat everyone. Each bench costs O(students_per_bench * log
+# sections), so an exam of tens of thousands of students is allocated in
+# one linear pass. Students that do not fit are returned as overflow
+# instead of being dropped.
+#
+# Rooms are given as an array of bench capacities (one per room) and the
+# benches are split between them with NumPy. A room is stored as
+# [number, benches, empty]: its filled benches in order (bench numbers are
+# their positions, no empty seats are padded in) and the count of empty
+# benches after them, so a hundred-room plan stays small in the session.
+import heapq
+import random
+import re
+from typing import NamedTuple
+
+# One room's size on the seating form: "30" benches or "6x5" rows x columns
+_CAPACITY_RE = re.compile(r'^(\d+)(?:\s*[x×*]\s*(\d+))?$', re.IGNORECASE)
+
+
+class Room(NamedTuple):
+    """A room of a seating plan, stored in the session as [number, benches, empty]."""
+    number: int
+    benches: list  # filled benches, each a list of students
+    empty: int  # benches left empty after them
+
+
+def parse_capacities(text):
+    """
+    Bench counts of the rooms in `text`, comma separated: "30, 30, 24" or
+    "6x5" for six rows of five benches. Raises ValueError for anything else.
+    """
+    capacities = []
+    for part in re.split(r'[,;\n]', text or ''):
+        part = part.strip()
+        if not part:
+            continue
+        match = _CAPACITY_RE.match(part)
+        if match is None:
+            raise ValueError(f"{part!r} is not a number of benches or rows x columns.")
+        benches = int(match.group(1)) * int(match.group(2) or 1)
+        if benches < 1:
+            raise ValueError(f"Room {len(capacities) + 1} has no benches.")
+        capacities.append(benches)
+    return capacities
+
+
+def allocate_benches(sections, students_per_bench, total_benches=None, rng=random):
+    """
+    Seat the students of `sections` (one list per section) on benches.
+
+    Returns (benches, overflow): benches in seating order, each a list of
+    at most `students_per_bench` students, and the students beyond
+    `total_benches` benches (None means as many benches as needed). Each
+    section is shuffled with `rng` first; pass rng=None to keep the given
+    order.
+    """
+    queues = []
+    for students in sections:
+        students = list(students)
+        if rng is not None:
+            rng.shuffle(students)
+        students.reverse()  # pop() from the end takes them in order
+        queues.append(students)
+
+    # (-remaining, section): the largest section first, ties by section order
+    heap = [(-len(students), index) for index, students in enumerate(queues) if students]
+    heapq.heapify(heap)
+    remaining = sum(len(students) for students in queues)
+    benches_left = total_benches if total_benches is not None else remaining
+
+    benches = []
+    previous = set()
+    while heap and benches_left > 0:
+        # Students this bench must take so that the rest still fits on the
+        # benches after it
+        must_seat = min(students_per_bench, remaining - (benches_left - 1) * students_per_bench)
+
+        picked, skipped = [], []
+        while heap and len(picked) < students_per_bench:
+            item = heapq.heappop(heap)
+            (skipped if item[1] in previous else picked).append(item)
+        # Not enough sections apart from the last bench's: reuse those, largest first
+        for item in sorted(skipped):
+            if len(picked) < students_per_bench:
+                picked.append(item)
+            else:
+                heapq.heappush(heap, item)
+
+        bench = []
+        for count, index in picked:
+            bench.append(queues[index].pop())
+            count += 1
+            if count:
+                heapq.heappush(heap, (count, index))
+        # Too few sections left to fill the bench with different ones:
+        # double up only as far as the remaining capacity requires
+        while len(bench) < must_seat and heap:
+            count, index = heapq.heappop(heap)
+            bench.append(queues[index].pop())
+            if count + 1:
+                heapq.heappush(heap, (count + 1, index))
+
+        remaining -= len(bench)
+        benches_left -= 1
+        benches.append(bench)
+        previous = {index for _, index in picked}
+
+    overflow = [student for students in queues for student in reversed(students)]
+    return benches, overflow
+
+
+def pack_rooms(benches, capacities):
+    """
+    Split `benches` in seating order over rooms of the given `capacities`
+    (benches per room, in room order) and return their Room records.
+    Benches beyond the total capacity are left out; allocate_benches
+    reports their students as overflow.
+    """
+    import numpy as np
+
+    capacities = np.asarray(capacities, dtype=np.int64)
+    ends = np.cumsum(capacities)
+    stops = np.minimum(ends, len(benches))
+    starts = np.concatenate(([0], stops[:-1]))
+    empty = capacities - (stops - starts)
+    return [Room(number, benches[start:stop], free)
+            for number, start, stop, free in zip(range(1, len(capacities) + 1), starts.tolist(), stops.tolist(),
+                                                 empty.tolist())]
@@ -0,0 +1,85 @@
+# solution_cache.py
+# Content-addressed cache of solved timetables.
+#
+# Entries are keyed by a SHA-256 of the canonical (normalized, sorted)
+# entries list plus the resolved solver profile, so re-submitting the same
+# formset skips CP-SAT entirely. The store is a database table, which makes
+# it shared by every worker process; it is bounded by
+# TIMETABLE_SOLUTION_CACHE_SIZE and evicts the least recently used rows.
+import hashlib
+import json
+import logging
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import SolutionCacheEntry
+from .solver import get_profile
+
+logger = logging.getLogger(__name__)
+
+# Bump when the model or the result format changes so stale rows are never reused
+CACHE_VERSION = 2
+
+
+def canonical_entries(entries):
+    """Entries reduced to the fields the solver reads, in a stable order."""
+    canonical = []
+    for e in entries:
+        prefs = e.get("day_time_prefs") or {}
+        canonical.append({
+            "teacher": e["teacher"],
+            "year": int(e.get("year", 1)),
+            "subject": e["subject"],
+            "hours": int(e.get("hours") or 0),
+            "is_integrated": bool(e.get("is_integrated")),
+            "is_lab": bool(e.get("is_lab")),
+            "is_external_lab": bool(e.get("is_external_lab")),
+            "day_time_prefs": {d: str(p) for d, p in sorted(prefs.items())},
+        })
+    canonical.sort(key=lambda c: json.dumps(c, sort_keys=True))
+    return canonical
+
+
+def cache_key(entries, profile=None):
+    profile_config = get_profile(profile)
+    profile_config.pop("label", None)
+    blob = json.dumps(
+        {"v": CACHE_VERSION, "entries": canonical_entries(entries), "profile": profile_config},
+        sort_keys=True, separators=(",", ":"),
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _decode(payload):
+    result = json.loads(payload)
+    # JSON object keys are strings; the grids are keyed by int year
+    result["timetables"] = {int(y): days for y, days in result["timetables"].items()}
+    return result
+
+
+def get(key):
+    """Return the cached solve result for `key`, or None."""
+    row = SolutionCacheEntry.objects.filter(key=key).only("payload").first()
+    if row is None:
+        return None
+    SolutionCacheEntry.objects.filter(pk=row.pk).update(last_used_at=timezone.now())
+    return _decode(row.payload)
+
+
+def put(key, result):
+    """Store a solve result and evict the least recently used rows beyond the size limit."""
+    payload = json.dumps({
+        "timetables": result["timetables"],
+        "teacher_index": result["teacher_index"],
+        "unallocated": result["unallocated"],
+        "stats": result["stats"],
+    })
+    SolutionCacheEntry.objects.update_or_create(key=key, defaults={"payload": payload})
+
+    limit = getattr(settings, "TIMETABLE_SOLUTION_CACHE_SIZE", 500)
+    stale = SolutionCacheEntry.objects.order_by("-last_used_at").values_list("pk", flat=True)[limit:]
+    stale_ids = list(stale)
+    if stale_ids:
+        SolutionCacheEntry.objects.filter(pk__in=stale_ids).delete()
+        logger.debug("Evicted %d cached timetable solutions", len(stale_ids))
@@ -0,0 +1,1282 @@
+# solver.py
+# Timetable allocation with Google OR-Tools (CP-SAT).
+#
+# The model is built in a single pass over the requirements: every decision
+# variable is dropped into per-(year, day, period) and per-(teacher, day,
+# period) buckets as it is created, and the constraints are then emitted
+# once per bucket. Build time therefore grows linearly with the number of
+# entries instead of (years + teachers) x entries.
+import atexit
+import logging
+import os
+import threading
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+# Internal period indices (0-8); 2 and 5 are Break and Lunch
+PERIOD_COUNT = 9
+TEACHING_PERIODS = [0, 1, 3, 4, 6, 7, 8]  # Periods where classes can happen
+DAYS = ["Mon", "Tue", "Wed", "Thu", "Fri"]
+
+# Map periods to next rest period
+# 0->1, 1->3, 3->4, 4->6, 6->7, 7->8, 8->None
+NEXT_REST_MAP = {0: 1, 1: 3, 3: 4, 4: 6, 6: 7, 7: 8, 8: None}
+
+# Human-readable time of each teaching period (for diagnosis messages)
+PERIOD_TIMES = {
+    0: "9:00-10:00", 1: "10:00-11:00", 3: "11:15-12:15", 4: "12:15-1:15",
+    6: "2:30-3:20", 7: "3:20-4:15", 8: "4:15-5:00",
+}
+
+# Valid lab start periods by lab duration
+LAB_STARTS = {
+    2: [0, 3, 6, 7],
+    3: [0, 3, 6],
+}
+
+# (start, duration) -> teaching periods covered by the lab block
+LAB_COVER = {
+    (0, 2): (0, 1),
+    (3, 2): (3, 4),
+    (6, 2): (6, 7),
+    (7, 2): (7, 8),
+    (0, 3): (0, 1, 3),
+    (3, 3): (3, 4, 6),
+    (6, 3): (6, 7, 8),
+}
+
+# (start, duration) -> last teaching period of the lab block
+LAB_LAST = {key: cover[-1] for key, cover in LAB_COVER.items()}
+
+# Solver performance profiles.
+# num_workers = 0 lets CP-SAT use every available core. Deterministic runs
+# interleave the workers and bound the search by deterministic time, so the
+# same input, seed and profile always produce the same timetable.
+# Optimizing profiles treat preferences as soft and maximize the weighted
+# score of add_objective(); `weights` overrides entries of SOFT_WEIGHTS.
+SOLVER_PROFILES = {
+    "fast": {
+        "label": "Fast (3s, 4 workers)",
+        "num_workers": 4, "max_time_in_seconds": 3.0,
+        "random_seed": 0, "deterministic": False, "optimize": False,
+    },
+    "balanced": {
+        "label": "Balanced (10s, 8 workers)",
+        "num_workers": 8, "max_time_in_seconds": 10.0,
+        "random_seed": 0, "deterministic": False, "optimize": False,
+    },
+    "thorough": {
+        "label": "Thorough (30s, all cores)",
+        "num_workers": 0, "max_time_in_seconds": 30.0,
+        "random_seed": 0, "deterministic": False, "optimize": False,
+    },
+    "deterministic": {
+        "label": "Deterministic (reproducible, 8 workers)",
+        "num_workers": 8, "max_time_in_seconds": 10.0,
+        "random_seed": 42, "deterministic": True, "optimize": False,
+    },
+    "optimize": {
+        "label": "Optimize preferences (soft, 20s, 8 workers)",
+        "num_workers": 8, "max_time_in_seconds": 20.0,
+        "random_seed": 0, "deterministic": False, "optimize": True,
+    },
+}
+# Deterministic runs spend `max_time_in_seconds` as deterministic time; the
+# wall clock limit is only a ceiling this many times larger, so a slow or
+# busy machine does not cut the search short and change the result.
+DETERMINISTIC_WALL_TIME_FACTOR = 4
+DEFAULT_SOLVER_PROFILE = "balanced"
+
+# Departments smaller than this are solved as one model even when they split
+# into independent components; handing them to the worker processes would
+# cost more than it saves.
+PARALLEL_MIN_ENTRIES = 30
+
+# Objective weights of optimizing profiles: reward per met preference,
+# penalty per class in the last period and per day a teacher comes in.
+# A weight of 0 switches the term off.
+SOFT_WEIGHTS = {"preference": 10, "late_period": 1, "compactness": 1}
+
+# Time limit of each solve made while diagnosing an infeasible timetable
+DIAGNOSIS_TIME_LIMIT = 2.0
+
+# Which guarded requirement of a conflict is relaxed first
+RELAX_ORDER = ("theory_pref", "lab_pref", "lab", "theory")
+
+
+def lab_start_covering(duration, period):
+    """Return the first valid lab start whose block covers `period`, or None."""
+    for start in LAB_STARTS.get(duration, []):
+        if period in LAB_COVER[(start, duration)]:
+            return start
+    return None
+
+
+def split_requirements(entries):
+    """
+    Split normalized entries into theory and lab requirements.
+
+    IMPORTANT: For integrated subjects (with or without external),
+    the 'hours' field represents ONLY theory hours.
+    Labs are allocated separately and do NOT consume theory hours.
+    """
+    theory_reqs = []  # {'id', 'year', 'teacher', 'subject', 'hours', 'prefs'}
+    lab_reqs = []     # {'id', 'year', 'teacher', 'subject', 'duration', 'prefs', ...}
+
+    for i, e in enumerate(entries):
+        y = int(e.get("year", 1))
+        t = e['teacher']
+        s = e['subject']
+        prefs = e.get('day_time_prefs', {}) or {}
+
+        # Theory Component
+        th_hours = 0
+        if e.get("is_integrated"):
+            # Integrated subjects: 'hours' = theory hours only
+            th_hours = int(e.get("hours", 0))
+        elif not (e.get("is_lab") or e.get("is_external_lab")):
+            # Pure theory subjects (no lab component)
+            th_hours = int(e.get("hours", 0))
+        # Note: For pure lab subjects (is_lab=True but not integrated),
+        # th_hours stays 0 as all time is in lab
+
+        if th_hours > 0:
+            theory_reqs.append({
+                'id': i, 'year': y, 'teacher': t, 'subject': s,
+                'hours': th_hours, 'prefs': prefs
+            })
+
+        # Lab Component
+        # Labs are allocated if: is_lab OR is_external_lab OR is_integrated
+        # For integrated subjects, lab allocation is INDEPENDENT of theory hours
+        if e.get("is_lab") or e.get("is_external_lab") or e.get("is_integrated"):
+            lab_reqs.append({
+                'id': i, 'year': y, 'teacher': t, 'subject': s,
+                'duration': 3 if e.get("is_external_lab") else 2,
+                'prefs': prefs,
+                'is_integrated': e.get("is_integrated", False),
+                'is_external_lab': e.get("is_external_lab", False)
+            })
+
+    return theory_reqs, lab_reqs
+
+
+class TimetableModel:
+    """A built CP-SAT model together with the variable maps needed to read it back."""
+
+    def __init__(self, model, years, theory_reqs, lab_reqs, theory_vars, lab_vars, guards=None):
+        self.model = model
+        self.years = years
+        self.theory_reqs = theory_reqs
+        self.lab_reqs = lab_reqs
+        # theory_vars[(req_idx, day, period)] = bool
+        self.theory_vars = theory_vars
+        # lab_vars[(req_idx, day, start_period)] = bool
+        self.lab_vars = lab_vars
+        # guards = [(literal, kind, req, detail)] when built with guarded=True
+        self.guards = guards or []
+
+
+def _parse_pref(p_str):
+    # A preference value is a period index, or empty for "any time that day"
+    if not p_str:
+        return None
+    try:
+        return int(p_str)
+    except ValueError:
+        return False
+
+
+def _lab_slots(req):
+    """
+    Admissible (day, start) slots of a lab requirement.
+
+    C5. Integrated + External Labs MUST be in 2:30-5:00 PM slot (period 6 start only)
+    C5b. Integrated-ONLY Labs (not external) MUST start at period 0 or 3
+    (9:00-11:00 or 11:15-1:15, excluding the afternoon 2:30-5:00 slot)
+    """
+    starts = LAB_STARTS.get(req['duration'], [])
+    if req.get('is_integrated'):
+        allowed = [6] if req.get('is_external_lab') else [0, 3]
+        starts = [p for p in starts if p in allowed]
+    return [(d, p) for d in DAYS for p in starts]
+
+
+def _preferred_lab_slots(req, slots):
+    # Narrow `slots` to those every preference of `req` allows (hard preferences)
+    dur = req['duration']
+    for d, p_str in req['prefs'].items():
+        if d not in DAYS:
+            continue
+        target_p = _parse_pref(p_str)
+        if target_p is False:
+            continue
+        if target_p is None:
+            slots = [(sd, sp) for sd, sp in slots if sd == d]
+        else:
+            # The lab must start at the block that covers the target period
+            forced_start = lab_start_covering(dur, target_p)
+            if forced_start is not None:
+                slots = [(sd, sp) for sd, sp in slots if (sd, sp) == (d, forced_start)]
+    return slots
+
+
+def build_model(entries, fixed_busy=(), fixed_rest=(), guarded=False, soft_preferences=False,
+                reduce=True):
+    """
+    Build the CP-SAT timetable model for normalized `entries`.
+
+    `fixed_busy` and `fixed_rest` are (teacher, day, period) slots taken or
+    forced to rest by classes outside the model (see frozen_occupancy).
+    With `guarded`, every hours requirement and preference is only enforced
+    under its own assumption literal (recorded in TimetableModel.guards);
+    hours become "at most" otherwise, so dropping literals always leaves a
+    feasible model. Used by diagnose_infeasibility().
+    With `soft_preferences`, only preferences get a literal, which
+    add_objective() then rewards instead of requiring it.
+    With `reduce` (the default), variables are only created for admissible
+    lab starts, and hard preferences are encoded in the domains: preferred
+    slots are fixed to 1 and the slots they rule out get no variable.
+    reduce=False keeps the literal constraint-per-rule encoding, which is
+    only useful to measure the difference (see model_size).
+    """
+    from ortools.sat.python import cp_model
+
+    model = cp_model.CpModel()
+    theory_reqs, lab_reqs = split_requirements(entries)
+    years = sorted(set(int(e.get("year", 1)) for e in entries))
+    hard_prefs = reduce and not (guarded or soft_preferences)
+
+    theory_vars = {}
+    lab_vars = {}
+    guards = []
+
+    def require(constraint, kind, req, detail=None):
+        # Enforce `constraint` outright, or only under a fresh assumption literal
+        if guarded or (soft_preferences and kind.endswith('_pref')):
+            lit = model.NewBoolVar(f'G_{len(guards)}')
+            constraint.OnlyEnforceIf(lit)
+            guards.append((lit, kind, req, detail))
+
+    # Buckets filled while creating variables
+    year_slot = defaultdict(list)      # (year, day, period) -> vars occupying the slot
+    year_day_labs = defaultdict(list)  # (year, day) -> lab start vars
+    teacher_busy = defaultdict(list)   # (teacher, day, period) -> vars occupying the teacher
+    teacher_rest = defaultdict(list)   # (teacher, day, period) -> vars forcing a rest at period
+    subject_day = defaultdict(list)    # (year, subject, day) -> theory vars
+
+    # --- Theory variables ---
+    for r_idx, req in enumerate(theory_reqs):
+        y, t = req['year'], req['teacher']
+        fixed = {}
+        if hard_prefs:
+            # A preferred period is fixed; with at most one class of a subject
+            # per day (C6), the rest of that day is then ruled out.
+            for d, p_str in req['prefs'].items():
+                p = _parse_pref(p_str)
+                if d in DAYS and p in TEACHING_PERIODS:
+                    fixed[d] = p
+        req_vars = []
+        for d in DAYS:
+            for p in TEACHING_PERIODS:
+                if d in fixed:
+                    if p != fixed[d]:
+                        continue
+                    var = model.NewConstant(1)
+                else:
+                    var = model.NewBoolVar(f'T_{r_idx}_{d}_{p}')
+                theory_vars[(r_idx, d, p)] = var
+                req_vars.append(var)
+                year_slot[(y, d, p)].append(var)
+                teacher_busy[(t, d, p)].append(var)
+                subject_day[(y, req['subject'], d)].append(var)
+                nxt = NEXT_REST_MAP[p]
+                if nxt is not None:
+                    teacher_rest[(t, d, nxt)].append(var)
+
+        # C1. Subject Hours (Theory)
+        hours = sum(req_vars)
+        require(model.Add(hours == req['hours']), 'theory', req)
+        if guarded:
+            model.Add(hours <= req['hours'])
+
+    # --- Lab variables ---
+    for r_idx, req in enumerate(lab_reqs):
+        y, t, dur = req['year'], req['teacher'], req['duration']
+        if reduce:
+            slots = _lab_slots(req)
+            if hard_prefs and req['prefs']:
+                slots = _preferred_lab_slots(req, slots)
+        else:
+            slots = [(d, p) for d in DAYS for p in LAB_STARTS.get(dur, [])]
+        for d, start in slots:
+            var = model.NewBoolVar(f'L_{r_idx}_{d}_{start}')
+            lab_vars[(r_idx, d, start)] = var
+            year_day_labs[(y, d)].append(var)
+            for p in LAB_COVER[(start, dur)]:
+                year_slot[(y, d, p)].append(var)
+                teacher_busy[(t, d, p)].append(var)
+            nxt = NEXT_REST_MAP[LAB_LAST[(start, dur)]]
+            if nxt is not None:
+                teacher_rest[(t, d, nxt)].append(var)
+
+        # C2. Subject Hours (Lab) - Exactly one slot per lab requirement
+        if LAB_STARTS.get(dur):
+            placed = sum(lab_vars[(r_idx, d, p)] for d, p in slots)
+            if slots:
+                require(model.Add(placed == 1), 'lab', req)
+            else:
+                # Every admissible start is ruled out by a preference
+                require(model.AddBoolOr([]), 'lab', req)
+            if guarded and slots:
+                model.Add(placed <= 1)
+
+        if not reduce and req.get('is_integrated'):
+            # C5 / C5b (see _lab_slots), as constraints on every start
+            admissible = set(_lab_slots(req))
+            for d, p in slots:
+                if (d, p) not in admissible:
+                    model.Add(lab_vars[(r_idx, d, p)] == 0)
+
+    # Slots fixed by the frozen part of a timetable count as constants
+    for key in fixed_busy:
+        teacher_busy[key].append(1)
+    for key in fixed_rest:
+        teacher_rest[key].append(1)
+
+    # C3. Single Class per Year/Day/Period
+    for slot_vars in year_slot.values():
+        if len(slot_vars) > 1:
+            model.Add(sum(slot_vars) <= 1)
+
+    # C6. Only one theory class per subject per day
+    for day_vars in subject_day.values():
+        model.Add(sum(day_vars) <= 1)
+
+    # C6b. Only ONE lab per day per year
+    for day_lab_vars in year_day_labs.values():
+        model.Add(sum(day_lab_vars) <= 1)
+    logger.debug("C6b: at most one lab on each of %d year-days", len(year_day_labs))
+
+    # C4. Teacher Availability & Rest Periods
+    # A teacher is busy at most once at p, and anything that ends right
+    # before p (theory at the previous period or a lab whose last period is
+    # the previous one) forces a rest at p. Both collapse into one linear
+    # constraint: sum(rest_vars) + sum(busy_vars) <= 1.
+    for key in teacher_busy.keys() | teacher_rest.keys():
+        slot_vars = teacher_busy.get(key, []) + teacher_rest.get(key, [])
+        if len(slot_vars) > 1 and any(not isinstance(v, int) for v in slot_vars):
+            model.Add(sum(slot_vars) <= 1)
+
+    # --- Hard Constraints: User Preferences ---
+    # If a user specifies a preference, we enforce it as a HARD constraint.
+    # Exact theory periods and all lab preferences are already part of the
+    # variable domains when the model is reduced.
+
+    # 1. Theory Preferences
+    for r_idx, req in enumerate(theory_reqs):
+        for d, p_str in req['prefs'].items():
+            p = _parse_pref(p_str)
+            if d not in DAYS or p is False:
+                continue
+            if p is not None:
+                if p in TEACHING_PERIODS and not hard_prefs:
+                    # Force theory class to be at this specific day and period
+                    require(model.Add(theory_vars[(r_idx, d, p)] == 1), 'theory_pref', req, (d, p))
+            else:
+                # Day preference only (Any time on this day)
+                require(model.Add(sum(theory_vars[(r_idx, d, p)] for p in TEACHING_PERIODS) == 1),
+                        'theory_pref', req, (d, None))
+
+    # 2. Lab Preferences
+    for r_idx, req in enumerate(lab_reqs):
+        if hard_prefs:
+            break
+        dur = req['duration']
+        for d, p_str in req['prefs'].items():
+            target_p = _parse_pref(p_str)
+            if d not in DAYS or target_p is False:
+                continue
+            if target_p is not None:
+                # Force lab to start at the block that covers the target period
+                forced_start = lab_start_covering(dur, target_p)
+                if forced_start is None:
+                    continue
+                start_var = lab_vars.get((r_idx, d, forced_start))
+                # A start ruled out by C5/C5b can never be met
+                met = model.Add(start_var == 1) if start_var is not None else model.AddBoolOr([])
+                require(met, 'lab_pref', req, (d, target_p))
+            else:
+                # Day preference only (Any time on this day)
+                day_vars = [lab_vars[(r_idx, d, p)] for p in LAB_STARTS.get(dur, []) if (r_idx, d, p) in lab_vars]
+                if LAB_STARTS.get(dur):
+                    require(model.Add(sum(day_vars) == 1) if day_vars else model.AddBoolOr([]),
+                            'lab_pref', req, (d, None))
+
+    return TimetableModel(model, years, theory_reqs, lab_reqs, theory_vars, lab_vars, guards)
+
+
+def add_objective(tm, weights=None):
+    """
+    Turn `tm` into an optimization model built with soft_preferences=True.
+
+    Maximizes the weighted number of met preferences minus the classes in
+    the last period and the number of (teacher, day) pairs with a class.
+    Returns the named score terms, as linear expressions, for reporting.
+    """
+    weights = dict(SOFT_WEIGHTS, **(weights or {}))
+    model = tm.model
+    late = PERIOD_COUNT - 1
+    terms = {
+        "preferences_met": sum(lit for lit, kind, _, _ in tm.guards if kind.endswith('_pref')),
+        "late_classes": (
+            sum(var for (_, _, p), var in tm.theory_vars.items() if p == late)
+            + sum(var for (r_idx, _, p), var in tm.lab_vars.items()
+                  if LAB_LAST[(p, tm.lab_reqs[r_idx]['duration'])] == late)
+        ),
+    }
+    objective = weights["preference"] * terms["preferences_met"] - weights["late_period"] * terms["late_classes"]
+
+    if weights["compactness"]:
+        teacher_day_vars = defaultdict(list)
+        for (r_idx, d, _), var in tm.theory_vars.items():
+            teacher_day_vars[(tm.theory_reqs[r_idx]['teacher'], d)].append(var)
+        for (r_idx, d, _), var in tm.lab_vars.items():
+            teacher_day_vars[(tm.lab_reqs[r_idx]['teacher'], d)].append(var)
+        present = []
+        for (t, d), day_vars in teacher_day_vars.items():
+            comes_in = model.NewBoolVar(f'In_{t}_{d}')
+            model.AddMaxEquality(comes_in, day_vars)
+            present.append(comes_in)
+        terms["teacher_days"] = sum(present)
+        objective -= weights["compactness"] * terms["teacher_days"]
+
+    model.Maximize(objective)
+    terms["preferences_total"] = sum(1 for _, kind, _, _ in tm.guards if kind.endswith('_pref'))
+    return terms
+
+
+def _progress_callback(on_solution):
+    """A solution callback reporting each improving solution to `on_solution`."""
+    from ortools.sat.python import cp_model
+
+    class ProgressCallback(cp_model.CpSolverSolutionCallback):
+        def __init__(self):
+            super().__init__()
+            self.solutions = 0
+
+        def on_solution_callback(self):
+            self.solutions += 1
+            on_solution({
+                "solutions": self.solutions,
+                "objective": self.ObjectiveValue(),
+                "best_bound": self.BestObjectiveBound(),
+                "wall_time": round(self.WallTime(), 3),
+            })
+
+    return ProgressCallback()
+
+
+def score_solution(terms, value):
+    """Evaluate the score terms returned by add_objective() on a solution."""
+    return {name: term if isinstance(term, int) else value(term) for name, term in terms.items()}
+
+
+def model_size(tm):
+    """Number of variables and constraints in a built model."""
+    proto = tm.model.Proto()
+    return {"variables": len(proto.variables), "constraints": len(proto.constraints)}
+
+
+def extract_timetables(tm, value):
+    """
+    Read a solution back into timetables[year][day][period].
+
+    `value` maps a model variable to its assigned value (e.g. solver.Value).
+    """
+    timetables = {y: {d: [None] * PERIOD_COUNT for d in DAYS} for y in tm.years}
+
+    # Fill Theory
+    for (r_idx, d, p), var in tm.theory_vars.items():
+        if value(var):
+            req = tm.theory_reqs[r_idx]
+            timetables[req['year']][d][p] = req['subject']
+
+    # Fill Labs
+    for (r_idx, d, start), var in tm.lab_vars.items():
+        if value(var):
+            req = tm.lab_reqs[r_idx]
+            label = f"{req['subject']} - Lab"
+            for p in LAB_COVER[(start, req['duration'])]:
+                timetables[req['year']][d][p] = label
+
+    # Fill empty slots with Tutorial
+    for y in tm.years:
+        for d in DAYS:
+            for p in TEACHING_PERIODS:
+                if timetables[y][d][p] is None:
+                    timetables[y][d][p] = "Tutorial"
+
+    return timetables
+
+
+def _sort_index(index):
+    for slots in index.values():
+        slots.sort(key=lambda s: (s[0], DAYS.index(s[1]), s[2]))
+    return index
+
+
+def extract_teacher_index(tm, value):
+    """
+    Read a solution back into teacher -> [[year, day, period, kind], ...].
+
+    Built from the requirement behind each variable rather than from cell
+    labels, so teachers who share a subject name keep their own slots.
+    `kind` is "theory" or "lab"; a lab lists every period of its block.
+    Slots are sorted by year, day and period.
+    """
+    index = {}
+    for (r_idx, d, p), var in tm.theory_vars.items():
+        if value(var):
+            req = tm.theory_reqs[r_idx]
+            index.setdefault(req['teacher'], []).append([req['year'], d, p, "theory"])
+    for (r_idx, d, start), var in tm.lab_vars.items():
+        if value(var):
+            req = tm.lab_reqs[r_idx]
+            slots = index.setdefault(req['teacher'], [])
+            for p in LAB_COVER[(start, req['duration'])]:
+                slots.append([req['year'], d, p, "lab"])
+    return _sort_index(index)
+
+
+def _cell_teachers(entries):
+    # (year, cell label) -> teachers, for reading teachers back from grids
+    teachers_of = defaultdict(set)
+    for e in entries:
+        y = int(e.get("year", 1))
+        teachers_of[(y, e['subject'])].add(e['teacher'])
+        teachers_of[(y, f"{e['subject']} - Lab")].add(e['teacher'])
+    return teachers_of
+
+
+def grid_teacher_index(grids, entries, index=None):
+    """
+    Teacher index for grids that were not solved in this run.
+
+    Only used for years that are copied unchanged (see resolve_teacher).
+    With `index`, the teacher index those grids were solved with, its slots
+    in the grids' years are kept as they are. Otherwise cells are matched to
+    teachers by (year, subject), so a subject taught by two teachers in the
+    same year is listed under both.
+    """
+    if index is not None:
+        years = {int(y) for y in grids}
+        kept = {}
+        for t, slots in index.items():
+            slots = [[int(y), d, p, kind] for y, d, p, kind in slots if int(y) in years]
+            if slots:
+                kept[t] = slots
+        return _sort_index(kept)
+    teachers_of = _cell_teachers(entries)
+    index = {}
+    for y, days in grids.items():
+        y = int(y)
+        for d, row in days.items():
+            for p, cell in enumerate(row):
+                for t in teachers_of.get((y, cell), ()) if cell else ():
+                    kind = "lab" if cell.endswith(" - Lab") else "theory"
+                    index.setdefault(t, []).append([y, d, p, kind])
+    return _sort_index(index)
+
+
+def _index_slots(index):
+    # Teacher index (see extract_teacher_index) -> set of (teacher, year, day,
+    # period, kind). Years may be strings after a JSON round trip.
+    return {(teacher, int(y), d, p, kind) for teacher, slots in index.items() for y, d, p, kind in slots}
+
+
+def _shared_labels(tm):
+    # (year, cell label) pairs that more than one teacher of the model uses
+    teachers_of = defaultdict(set)
+    for req in tm.theory_reqs:
+        teachers_of[(req['year'], req['subject'])].add(req['teacher'])
+    for req in tm.lab_reqs:
+        teachers_of[(req['year'], f"{req['subject']} - Lab")].add(req['teacher'])
+    return {key for key, teachers in teachers_of.items() if len(teachers) > 1}
+
+
+def _previous_values(tm, previous, index=None):
+    # Yields (req, var, 0/1) for every decision variable. Year keys may be
+    # ints or strings (grids that went through JSON come back with strings).
+    # With the previous solve's teacher index a variable only counts as
+    # placed if its own teacher had those slots; without one, a label that
+    # two teachers of a year share matches neither of them.
+    grids = {int(y): days for y, days in previous.items()}
+    slots = _index_slots(index) if index is not None else None
+    shared = _shared_labels(tm) if slots is None else ()
+
+    def placed(req, d, periods, label, kind):
+        row = grids.get(req['year'], {}).get(d) or []
+        if not all(p < len(row) and row[p] == label for p in periods):
+            return 0
+        if slots is not None:
+            return int(all((req['teacher'], req['year'], d, p, kind) in slots for p in periods))
+        return int((req['year'], label) not in shared)
+
+    for (r_idx, d, p), var in tm.theory_vars.items():
+        req = tm.theory_reqs[r_idx]
+        yield req, var, placed(req, d, (p,), req['subject'], "theory")
+    for (r_idx, d, start), var in tm.lab_vars.items():
+        req = tm.lab_reqs[r_idx]
+        yield req, var, placed(req, d, LAB_COVER[(start, req['duration'])], f"{req['subject']} - Lab", "lab")
+
+
+def previous_assignment(tm, previous, index=None):
+    """Map a previous timetables[year][day][period] grid (and its teacher index) onto {var: 0/1}."""
+    return {var: val for _, var, val in _previous_values(tm, previous, index)}
+
+
+def frozen_occupancy(grids, entries, index=None):
+    """
+    Teacher slots used by the given (frozen) entries in existing grids.
+
+    Returns (busy, rest) sets of (teacher, day, period): the periods each
+    teacher teaches, and the periods right after a class or lab block where
+    the rest rule forbids teaching. Teachers are read from `index` (see
+    grid_teacher_index) when given, else from the cell labels.
+    """
+    busy, rest = set(), set()
+    if index is not None:
+        slots = _index_slots(grid_teacher_index(grids, entries, index))
+        for t, y, d, p, kind in slots:
+            busy.add((t, d, p))
+            nxt = NEXT_REST_MAP.get(p)
+            # A lab block only forces a rest after its last period
+            if nxt is not None and not (kind == "lab" and (t, y, d, nxt, "lab") in slots):
+                rest.add((t, d, nxt))
+        return busy, rest
+
+    teachers_of = _cell_teachers(entries)
+    for y, days in grids.items():
+        y = int(y)
+        for d, row in days.items():
+            for p, cell in enumerate(row):
+                teachers = teachers_of.get((y, cell)) if cell else None
+                if not teachers:
+                    continue
+                nxt = NEXT_REST_MAP.get(p)
+                continues = nxt is not None and cell.endswith(" - Lab") and row[nxt] == cell
+                for t in teachers:
+                    busy.add((t, d, p))
+                    if nxt is not None and not continues:
+                        rest.add((t, d, nxt))
+    return busy, rest
+
+
+def add_warm_start(tm, previous, min_changes=None, index=None):
+    """
+    Hint the solver with a previous solution and require a different one.
+
+    `index` is the previous solve's teacher index; without it, classes of a
+    subject name two teachers share in one year are not counted as placed.
+
+    At least `min_changes` of the previously placed classes/lab blocks must
+    move (default: 10% of them, at least one). Since every requirement keeps
+    its hour count, moving k placements changes 2k variables, so the new
+    solution is at Hamming distance >= 2 * min_changes from the old one.
+    Returns the number of required changes.
+    """
+    assignment = previous_assignment(tm, previous, index)
+    for var, val in assignment.items():
+        tm.model.AddHint(var, val)
+
+    placed = [var for var, val in assignment.items() if val]
+    if not placed:
+        return 0
+    if min_changes is None:
+        min_changes = max(1, len(placed) // 10)
+    min_changes = min(min_changes, len(placed))
+    tm.model.Add(sum(placed) <= len(placed) - min_changes)
+    return min_changes
+
+
+def connected_components(entries):
+    """
+    Split entries into groups that share no year and no teacher.
+
+    Years only interact through shared teachers (C4), so each group of the
+    teacher-year graph can be solved as its own model. Groups are returned
+    in order of their first entry.
+    """
+    parent = {}
+
+    def find(node):
+        while parent.setdefault(node, node) != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    for e in entries:
+        a, b = find(("year", int(e.get("year", 1)))), find(("teacher", e['teacher']))
+        if a != b:
+            parent[a] = b
+
+    groups = {}
+    for e in entries:
+        groups.setdefault(find(("year", int(e.get("year", 1)))), []).append(e)
+    return list(groups.values())
+
+
+class _PoolStopper:
+    # Stands in for a CpSolver in on_solver callbacks when the search runs
+    # in worker processes: stopping it abandons the pending components.
+    def __init__(self):
+        self.stopped = False
+
+    def StopSearch(self):
+        self.stopped = True
+
+
+# Shared by every decomposed solve so none of them pays for starting the
+# workers; a pool a stopped solve still has components running in is retired
+# and terminated once the last solve using it lets go.
+_pool = None
+_pool_users = {}
+_pool_lock = threading.Lock()
+
+
+def _acquire_component_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            from .startup import process_context
+
+            _pool = process_context().Pool(os.cpu_count() or 1)
+        _pool_users[_pool] = _pool_users.get(_pool, 0) + 1
+        return _pool
+
+
+def _release_component_pool(pool, stopped):
+    global _pool
+    with _pool_lock:
+        if stopped and pool is _pool:
+            _pool = None
+        _pool_users[pool] -= 1
+        if pool is not _pool and not _pool_users[pool]:
+            del _pool_users[pool]
+            pool.terminate()
+
+
+def _terminate_component_pools():
+    # Before interpreter shutdown, where Pool.__del__ can no longer clean up
+    for pool in {_pool, *_pool_users} - {None}:
+        pool.terminate()
+
+
+atexit.register(_terminate_component_pools)
+
+
+def _solve_component(args):
+    entries, config, previous, previous_index = args
+    return solve_timetable(entries, profile=config, previous=previous, previous_index=previous_index,
+                           decompose=False)
+
+
+def solve_components(components, profile=None, on_solver=None, previous=None, previous_index=None,
+                     on_solution=None):
+    """
+    Solve independent components in a process pool and merge their grids.
+
+    The worker processes cannot report each improving solution, so with an
+    optimizing profile `on_solution` is called once per finished component
+    instead: "objective" and "best_bound" are summed over the components
+    finished so far, "solutions" counts them out of "components".
+    """
+    import time
+
+    started = time.perf_counter()
+    cores = os.cpu_count() or 1
+    processes = min(len(components), cores)
+    if isinstance(profile, dict):
+        profile_name = "custom"
+    else:
+        profile_name = profile if profile in SOLVER_PROFILES else DEFAULT_SOLVER_PROFILE
+    config = get_profile(profile)
+    config.pop("label", None)
+    # Share the cores between the sub-solves instead of oversubscribing them
+    config["num_workers"] = max(1, (config["num_workers"] or cores) // processes)
+
+    tasks = []
+    for comp in components:
+        years = {int(e.get("year", 1)) for e in comp}
+        comp_previous = {y: g for y, g in previous.items() if int(y) in years} if previous else None
+        comp_index = None
+        if previous_index is not None:
+            teachers = {e['teacher'] for e in comp}
+            comp_index = {t: slots for t, slots in previous_index.items() if t in teachers}
+        tasks.append((comp, config, comp_previous, comp_index))
+
+    finished = []
+
+    def component_done(result):
+        # Runs on the pool's result thread as each component comes back
+        if stopper.stopped:
+            return
+        finished.append(result)
+        scores = [r["stats"]["score"] for r in finished if "score" in r["stats"]]
+        if on_solution is not None and scores:
+            on_solution({
+                "solutions": len(finished),
+                "components": len(components),
+                "objective": sum(score["objective"] for score in scores),
+                "best_bound": sum(score["best_bound"] for score in scores),
+                "wall_time": round(time.perf_counter() - started, 3),
+            })
+
+    stopper = _PoolStopper()
+    pool = _acquire_component_pool()
+    try:
+        if on_solver is not None:
+            on_solver(stopper)
+        pending = [pool.apply_async(_solve_component, (task,), callback=component_done) for task in tasks]
+        for task_result in pending:
+            while not task_result.ready() and not stopper.stopped:
+                task_result.wait(0.1)
+        results = [task_result.get() for task_result in pending] if not stopper.stopped else []
+    finally:
+        _release_component_pool(pool, stopper.stopped)
+
+    if stopper.stopped:
+        years = sorted({int(e.get("year", 1)) for comp in components for e in comp})
+        return {
+            "timetables": {y: {d: [None] * PERIOD_COUNT for d in DAYS} for y in years},
+            "teacher_index": {},
+            "unallocated": [],
+            "stats": {"profile": profile_name, "status": "UNKNOWN",
+                      "wall_time": round(time.perf_counter() - started, 3),
+                      "num_branches": 0, "num_conflicts": 0, "num_workers": config["num_workers"],
+                      "components": len(components), "processes": processes},
+        }
+
+    timetables, teacher_index = {}, {}
+    for r in results:
+        timetables.update(r["timetables"])
+        # Components share no teacher, so the indexes never overlap
+        teacher_index.update(r["teacher_index"])
+
+    statuses = [r["stats"]["status"] for r in results]
+    for worst in ("MODEL_INVALID", "INFEASIBLE", "UNKNOWN", "FEASIBLE", "OPTIMAL"):
+        if worst in statuses:
+            break
+    stats = {
+        "profile": profile_name,
+        "status": worst,
+        "wall_time": round(time.perf_counter() - started, 3),
+        "num_branches": sum(r["stats"]["num_branches"] for r in results),
+        "num_conflicts": sum(r["stats"]["num_conflicts"] for r in results),
+        "num_workers": config["num_workers"],
+        "components": len(components),
+        "processes": processes,
+    }
+    conflicts = [c for r in results for c in r["stats"].get("conflicts", [])]
+    if conflicts:
+        stats["conflicts"] = conflicts
+    stats["model"] = {key: sum(r["stats"]["model"][key] for r in results) for key in ("variables", "constraints")}
+    # The components ran side by side, so only the end-to-end time is meaningful
+    stats["timings"] = {"solve": stats["wall_time"]}
+    scores = [r["stats"]["score"] for r in results if "score" in r["stats"]]
+    if scores:
+        # Components share no teacher or year, so their scores simply add up
+        stats["score"] = {name: sum(score.get(name, 0) for score in scores) for name in scores[0]}
+    if previous:
+        stats["warm_start"] = True
+        stats["min_changes"] = sum(r["stats"].get("min_changes", 0) for r in results)
+    return {
+        "timetables": dict(sorted(timetables.items())),
+        "teacher_index": teacher_index,
+        "unallocated": [u for r in results for u in r["unallocated"]],
+        "stats": stats,
+    }
+
+
+def get_profile(profile=None):
+    """Resolve a profile name (or an explicit dict of overrides) to solver settings."""
+    if isinstance(profile, dict):
+        return dict(SOLVER_PROFILES[DEFAULT_SOLVER_PROFILE], **profile)
+    return dict(SOLVER_PROFILES.get(profile) or SOLVER_PROFILES[DEFAULT_SOLVER_PROFILE])
+
+
+def configure_solver(solver, profile):
+    """Apply a resolved profile to a CpSolver."""
+    params = solver.parameters
+    params.num_workers = profile["num_workers"]
+    params.random_seed = profile["random_seed"]
+    params.max_time_in_seconds = profile["max_time_in_seconds"]
+    if profile["deterministic"]:
+        params.interleave_search = True
+        params.max_deterministic_time = profile["max_time_in_seconds"]
+        params.max_time_in_seconds = profile["max_time_in_seconds"] * DETERMINISTIC_WALL_TIME_FACTOR
+
+
+def solve_stats(solver, status, profile_name):
+    """Statistics reported next to a solve result."""
+    return {
+        "profile": profile_name,
+        "status": solver.StatusName(status),
+        "wall_time": round(solver.WallTime(), 3),
+        "num_branches": solver.NumBranches(),
+        "num_conflicts": solver.NumConflicts(),
+        "num_workers": solver.parameters.num_workers,
+    }
+
+
+def describe_guard(kind, req, detail=None):
+    """Short human-readable description of a guarded requirement."""
+    who = f"{req['subject']} ({req['teacher']}, Year {req['year']})"
+    if kind == "theory":
+        return f"{req['hours']} theory hours of {who}"
+    if kind == "lab":
+        return f"the lab of {who}"
+    day, period = detail
+    when = f"{day} {PERIOD_TIMES[period]}" if period in PERIOD_TIMES else day
+    what = "lab" if kind == "lab_pref" else "class"
+    return f"the {what} preference {when} of {who}"
+
+
+def diagnose_infeasibility(entries, profile=None, on_solver=None, time_limit=DIAGNOSIS_TIME_LIMIT):
+    """
+    Explain why `entries` have no timetable and schedule as much as possible.
+
+    The model is rebuilt with every hours requirement and preference behind
+    an assumption literal. Each infeasible solve yields a conflicting set of
+    assumptions, which is shrunk to a minimal one by deletion; one member
+    (preferences first, see RELAX_ORDER) is relaxed and the search repeats
+    until the rest is feasible. A final solve places as many of the relaxed
+    classes as still fit.
+    Returns (timetables, teacher_index, unallocated, conflicts);
+    `unallocated` holds one
+    record per entry that lost hours or a preference, `conflicts` the
+    minimal conflicting sets as lists of descriptions.
+    """
+    from ortools.sat.python import cp_model
+
+    config = get_profile(profile)
+    tm = build_model(entries, guarded=True)
+    model = tm.model
+
+    def check(indices):
+        solver = cp_model.CpSolver()
+        configure_solver(solver, config)
+        solver.parameters.max_time_in_seconds = time_limit
+        if on_solver is not None:
+            on_solver(solver)
+        model.ClearAssumptions()
+        model.AddAssumptions([tm.guards[i][0] for i in indices])
+        return solver, solver.Solve(model)
+
+    active = list(range(len(tm.guards)))
+    relaxed = {}  # guard index -> minimal conflict it was relaxed from
+    while active:
+        solver, status = check(active)
+        if status != cp_model.INFEASIBLE:
+            break
+        in_core = set(solver.SufficientAssumptionsForInfeasibility())
+        core = [i for i in active if tm.guards[i][0].Index() in in_core]
+        if not core:
+            break
+        # Deletion-based minimization: drop every member the conflict survives without
+        for i in list(core):
+            rest = [j for j in core if j != i]
+            if rest and check(rest)[1] == cp_model.INFEASIBLE:
+                core = rest
+        victim = min(core, key=lambda i: (RELAX_ORDER.index(tm.guards[i][1]), -i))
+        relaxed[victim] = core
+        active.remove(victim)
+
+    # Keep everything that was not relaxed and place as many classes as possible
+    model.ClearAssumptions()
+    for i in active:
+        model.Add(tm.guards[i][0] == 1)
+    model.Maximize(sum(tm.theory_vars.values()) + sum(tm.lab_vars.values()))
+    solver = cp_model.CpSolver()
+    configure_solver(solver, config)
+    solver.parameters.max_time_in_seconds = time_limit
+    if on_solver is not None:
+        on_solver(solver)
+    status = solver.Solve(model)
+    if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
+        value = solver.Value
+        timetables = extract_timetables(tm, value)
+        teacher_index = extract_teacher_index(tm, value)
+    else:
+        value = lambda var: 0  # noqa: E731
+        timetables = {y: {d: [None] * PERIOD_COUNT for d in DAYS} for y in tm.years}
+        teacher_index = {}
+
+    # One unallocated record per entry touched by a relaxed requirement
+    records = {}
+    for i, core in relaxed.items():
+        _, kind, req, detail = tm.guards[i]
+        record = records.get(req['id'])
+        if record is None:
+            entry = entries[req['id']]
+            record = records[req['id']] = {
+                "teacher": req['teacher'],
+                "year": req['year'],
+                "subject": req['subject'],
+                "theory_remaining": 0,
+                "lab_remaining": 0,
+                "remaining": 0,
+                "is_integrated": bool(entry.get("is_integrated")),
+                "is_external_lab": bool(entry.get("is_external_lab")),
+                "reasons": [],
+            }
+        others = [describe_guard(*tm.guards[j][1:]) for j in core if j != i]
+        reason = f"Relaxed {describe_guard(kind, req, detail)}"
+        reason += f": it conflicts with {'; '.join(others)}" if others else ": it cannot be met on its own"
+        record["reasons"].append(reason)
+
+    for r_idx, req in enumerate(tm.theory_reqs):
+        if req['id'] in records:
+            placed = sum(value(var) for (idx, _, _), var in tm.theory_vars.items() if idx == r_idx)
+            records[req['id']]["theory_remaining"] = req['hours'] - placed
+    for r_idx, req in enumerate(tm.lab_reqs):
+        if req['id'] in records:
+            placed = sum(value(var) for (idx, _, _), var in tm.lab_vars.items() if idx == r_idx)
+            records[req['id']]["lab_remaining"] = 1 - placed
+
+    unallocated = []
+    for record in records.values():
+        record["remaining"] = record["theory_remaining"] + record["lab_remaining"]
+        record["reason"] = " ".join(f"{r}." for r in record.pop("reasons"))
+        unallocated.append(record)
+    conflicts = [[describe_guard(*tm.guards[j][1:]) for j in core] for core in relaxed.values()]
+    return timetables, teacher_index, unallocated, conflicts
+
+
+def solve_timetable(entries_input, profile=None, on_solver=None, previous=None, min_changes=None,
+                    decompose=True, on_solution=None, previous_index=None):
+    """
+    Solve a timetable and return {"timetables", "teacher_index", "unallocated", "stats"}.
+
+    `profile` is a SOLVER_PROFILES name or a dict of overrides.
+    `on_solver`, if given, is called with the CpSolver right before the
+    search starts so a caller can StopSearch() it from another thread.
+    `previous`, if given, is an earlier timetables grid for the same
+    entries: it is used as a solution hint and the new timetable is required
+    to differ from it (see add_warm_start), with `previous_index` its
+    teacher index so that teachers sharing a subject name are told apart.
+    If no different timetable exists, the solve is repeated without that
+    requirement.
+    With `decompose`, departments that split into independent teacher-year
+    components are solved one model per component in parallel processes.
+    Optimizing profiles make preferences soft (see add_objective); the best
+    timetable found within the time limit is returned with stats["score"],
+    and `on_solution`, if given, is called with the progress of every
+    improving solution (of every finished component when decomposed, see
+    solve_components).
+    stats["timings"] holds the seconds spent in model_build, solve and
+    reconstruction (which includes any infeasibility diagnosis).
+    """
+    import copy
+    import time
+    from ortools.sat.python import cp_model
+
+    if decompose and len(entries_input) >= PARALLEL_MIN_ENTRIES and (os.cpu_count() or 1) > 1:
+        components = connected_components(entries_input)
+        if len(components) > 1:
+            return solve_components(components, profile=profile, on_solver=on_solver, previous=previous,
+                                    previous_index=previous_index, on_solution=on_solution)
+
+    entries = copy.deepcopy(entries_input)
+    if isinstance(profile, dict):
+        profile_name = "custom"
+    else:
+        profile_name = profile if profile in SOLVER_PROFILES else DEFAULT_SOLVER_PROFILE
+    config = get_profile(profile)
+    timings = {}
+    started = time.perf_counter()
+    tm = build_model(entries, soft_preferences=config["optimize"])
+    terms = add_objective(tm, config.get("weights")) if config["optimize"] else None
+    required_changes = add_warm_start(tm, previous, min_changes, previous_index) if previous else 0
+    timings["model_build"] = time.perf_counter() - started
+
+    # --- Solve ---
+    started = time.perf_counter()
+    solver = cp_model.CpSolver()
+    configure_solver(solver, config)
+    if on_solver is not None:
+        on_solver(solver)
+    if terms is not None and on_solution is not None:
+        status = solver.Solve(tm.model, _progress_callback(on_solution))
+    else:
+        status = solver.Solve(tm.model)
+    timings["solve"] = time.perf_counter() - started
+
+    if required_changes and status == cp_model.INFEASIBLE:
+        # Nothing can move (e.g. every class is pinned by a preference)
+        logger.warning("No different timetable exists; solving without the diversity constraint.")
+        return solve_timetable(entries_input, profile=profile, on_solver=on_solver, decompose=decompose,
+                               on_solution=on_solution)
+
+    # --- Reconstruct Timetable ---
+    started = time.perf_counter()
+    unallocated = []
+    conflicts = None
+    if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
+        logger.debug("OR-Tools found a solution (%s)", solver.StatusName(status))
+        timetables = extract_timetables(tm, solver.Value)
+        teacher_index = extract_teacher_index(tm, solver.Value)
+    elif status == cp_model.INFEASIBLE:
+        logger.warning("Timetable is infeasible; diagnosing the conflicting constraints.")
+        timetables, teacher_index, unallocated, conflicts = diagnose_infeasibility(entries, config,
+                                                                                  on_solver=on_solver)
+    else:
+        logger.warning("OR-Tools found no solution (%s); constraints might be too tight.", solver.StatusName(status))
+        timetables = {y: {d: [None] * PERIOD_COUNT for d in DAYS} for y in tm.years}
+        teacher_index = {}
+    timings["reconstruction"] = time.perf_counter() - started
+
+    stats = solve_stats(solver, status, profile_name)
+    stats["model"] = model_size(tm)
+    stats["timings"] = {phase: round(seconds, 4) for phase, seconds in timings.items()}
+    if conflicts is not None:
+        stats["conflicts"] = conflicts
+    if terms is not None and (status == cp_model.OPTIMAL or status == cp_model.FEASIBLE):
+        stats["score"] = dict(score_solution(terms, solver.Value), objective=solver.ObjectiveValue(),
+                              best_bound=solver.BestObjectiveBound())
+    if previous:
+        stats["warm_start"] = True
+        stats["min_changes"] = required_changes
+    return {
+        "timetables": timetables,
+        "teacher_index": teacher_index,
+        "unallocated": unallocated,
+        "stats": stats,
+    }
+
+
+def _unfitted_change(tm, entries, teacher):
+    # Unallocated records for a teacher whose changed entries could not be
+    # placed around everyone else's unchanged slots
+    records = {}
+    for req in tm.theory_reqs + tm.lab_reqs:
+        if req['teacher'] != teacher:
+            continue
+        record = records.get(req['id'])
+        if record is None:
+            entry = entries[req['id']]
+            record = records[req['id']] = {
+                "teacher": teacher,
+                "year": req['year'],
+                "subject": req['subject'],
+                "theory_remaining": 0,
+                "lab_remaining": 0,
+                "remaining": 0,
+                "is_integrated": bool(entry.get("is_integrated")),
+                "is_external_lab": bool(entry.get("is_external_lab")),
+                "reason": (f"The change to {teacher}'s classes does not fit around the other teachers' "
+                           f"existing slots, so the previous timetable was kept. Regenerate to re-solve "
+                           f"the whole timetable."),
+            }
+        if 'duration' in req:
+            record["lab_remaining"] += 1
+        else:
+            record["theory_remaining"] += req['hours']
+        record["remaining"] = record["theory_remaining"] + record["lab_remaining"]
+    return list(records.values())
+
+
+def resolve_teacher(entries_input, previous, teacher, years, profile=None, on_solver=None, previous_index=None):
+    """
+    Re-solve after one teacher's entries changed, keeping everyone else stable.
+
+    `entries_input` is the full, updated entries list, `previous` the
+    timetable solved before the change, `previous_index` its teacher index
+    and `years` every year the teacher taught before or teaches now. Years
+    outside `years` are copied as-is; their classes only block the slots of
+    teachers shared with the re-solved years. Inside `years`, every other
+    teacher is pinned to their previous slots. Slots are read from
+    `previous_index`; without it only cells whose label no other teacher of
+    the year shares are pinned. If the change does not fit around the
+    pinned slots, the previous timetable is returned unchanged with status
+    INFEASIBLE and the teacher's entries as unallocated, so the user can
+    decide to regenerate everything.
+    Returns the same structure as solve_timetable().
+    """
+    import copy
+    from ortools.sat.python import cp_model
+
+    entries = copy.deepcopy(entries_input)
+    grids = {int(y): days for y, days in previous.items()}
+    years = set(int(y) for y in years)
+    local = [e for e in entries if int(e.get("year", 1)) in years]
+    frozen = [e for e in entries if int(e.get("year", 1)) not in years]
+    frozen_grids = {y: g for y, g in grids.items() if y not in years}
+    busy, rest = frozen_occupancy(frozen_grids, frozen, previous_index)
+    config = get_profile(profile)
+
+    tm = build_model(local, fixed_busy=busy, fixed_rest=rest, soft_preferences=config["optimize"])
+    terms = add_objective(tm, config.get("weights")) if config["optimize"] else None
+    for req, var, val in _previous_values(tm, grids, previous_index):
+        tm.model.AddHint(var, val)
+        # Every other teacher's hours are unchanged, so keeping their
+        # placed classes also keeps them out of every other slot
+        if val and req['teacher'] != teacher:
+            tm.model.Add(var == 1)
+
+    solver = cp_model.CpSolver()
+    configure_solver(solver, config)
+    if on_solver is not None:
+        on_solver(solver)
+    status = solver.Solve(tm.model)
+
+    unallocated = []
+    if status == cp_model.INFEASIBLE:
+        logger.warning("Change for %s does not fit around the other teachers; keeping the previous timetable.",
+                       teacher)
+        timetables = dict(grids)
+        teacher_index = grid_teacher_index(grids, entries, previous_index)
+        unallocated = _unfitted_change(tm, local, teacher)
+    else:
+        timetables = dict(frozen_grids)
+        teacher_index = grid_teacher_index(frozen_grids, frozen, previous_index)
+        if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
+            timetables.update(extract_timetables(tm, solver.Value))
+            for teacher_name, slots in extract_teacher_index(tm, solver.Value).items():
+                teacher_index.setdefault(teacher_name, []).extend(slots)
+            _sort_index(teacher_index)
+        else:
+            # Cancelled or out of time
+            timetables.update({y: {d: [None] * PERIOD_COUNT for d in DAYS} for y in tm.years})
+
+    stats = solve_stats(solver, status, profile if profile in SOLVER_PROFILES else DEFAULT_SOLVER_PROFILE)
+    if terms is not None and (status == cp_model.OPTIMAL or status == cp_model.FEASIBLE):
+        stats["score"] = dict(score_solution(terms, solver.Value), objective=solver.ObjectiveValue(),
+                              best_bound=solver.BestObjectiveBound())
+    stats["incremental"] = True
+    stats["pinned_others"] = True
+    stats["resolved_years"] = sorted(years)
+    return {
+        "timetables": dict(sorted(timetables.items())),
+        "teacher_index": teacher_index,
+        "unallocated": unallocated,
+        "stats": stats,
+    }
+
+
+def allocate_timetable_with_ga(entries_input, profile=None, on_solver=None):
+    """
+    Allocates timetable using Constraint Programming (Google OR-Tools).
+    Guarantees strict adherence to:
+    1. Teacher availability (no double booking)
+    2. Rest periods (no consecutive classes)
+    3. Lab block validity
+    4. Single class per slot per year
+
+    Returns (timetables, unallocated); see solve_timetable() for the
+    variant that also reports solver statistics.
+    """
+    result = solve_timetable(entries_input, profile=profile, on_solver=on_solver)
+    return result["timetables"], result["unallocated"]
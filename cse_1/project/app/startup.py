@@ -0,0 +1,89 @@
+# startup.py
+# Startup policy for the heavy dependencies.
+#
+# Management commands and tests import the views without OR-Tools,
+# ReportLab or the PDF readers; each is imported the first time a view
+# needs it. Serving workers should not make their first user pay for that,
+# so project/wsgi.py and project/asgi.py call warm_up() before they accept
+# traffic (unless TIMETABLE_WARM_UP is off).
+#
+# The solver, PDF and roster process pools all fork their workers from the
+# one forkserver; its preload list is fixed by whichever pool starts it
+# first, so process_context() sets a single list covering all of them.
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# One teacher, one theory subject and one lab: exercises every constraint family
+WARM_UP_ENTRIES = [
+    {"teacher": "warm-up", "year": 1, "subject": "Theory", "hours": 2, "is_integrated": False,
+     "is_lab": False, "is_external_lab": False, "remaining": 2, "day_time_prefs": {}},
+    {"teacher": "warm-up", "year": 1, "subject": "Lab", "hours": 0, "is_integrated": False,
+     "is_lab": True, "is_external_lab": False, "remaining": 0, "day_time_prefs": {}},
+]
+
+# Modules imported once in the forkserver instead of in every worker
+WORKER_PRELOAD = [
+    f"{__package__}.solver", "ortools.sat.python.cp_model",
+    f"{__package__}.pdf_export", "reportlab.platypus",
+    f"{__package__}.roster", "pypdfium2", "pdfplumber",
+]
+
+_context = None
+_context_lock = threading.Lock()
+
+
+def process_context():
+    """Return the multiprocessing context shared by the worker process pools."""
+    global _context
+    with _context_lock:
+        if _context is None:
+            import multiprocessing
+
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                _context = multiprocessing.get_context("forkserver")
+                _context.set_forkserver_preload(WORKER_PRELOAD)
+            else:
+                _context = multiprocessing.get_context("spawn")
+        return _context
+
+
+def _warm_solver():
+    from .solver import solve_timetable
+
+    solve_timetable(WARM_UP_ENTRIES, profile={"num_workers": 1, "max_time_in_seconds": 5.0})
+
+
+def _warm_pdf():
+    import PyPDF2  # noqa: F401  (seating roster reader)
+    import pdfplumber  # noqa: F401  (automatic roster backends)
+    import pypdfium2  # noqa: F401
+
+    from .pdf_export import get_styles, teacher_timetable_pdf
+    from .solver import DAYS, PERIOD_COUNT
+
+    # Builds the shared PdfStyles the download views render with
+    get_styles()
+    grid = {day: ["Theory"] + [None] * (PERIOD_COUNT - 1) for day in DAYS}
+    teacher_timetable_pdf("warm-up", ["Theory"], {1: grid}, {1: "I"})
+
+
+def warm_up():
+    """Import OR-Tools and the PDF libraries and run a tiny solve and render."""
+    if not getattr(settings, "TIMETABLE_WARM_UP", True):
+        return {}
+    timings = {}
+    for name, step in (("solver", _warm_solver), ("pdf", _warm_pdf)):
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception:
+            # A failed warm-up only costs the first request its latency
+            logger.exception("Warm-up step %s failed", name)
+        timings[name] = round(time.perf_counter() - started, 3)
+    logger.info("Worker warmed up in %s", ", ".join(f"{k} {v}s" for k, v in timings.items()))
+    return timings
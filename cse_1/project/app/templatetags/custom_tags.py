@@ -8,6 +8,12 @@ def split(value, arg):
     return value.split(arg)
 
 @register.filter
-def split_once(value):
-    """Split the value by the first space."""
-    return value.split(' ', 1)
+def empty_seats(students, students_per_bench):
+    """The seats of a bench left empty, to loop over."""
+    return range(int(students_per_bench) - len(students))
+
+@register.filter
+def empty_benches(room):
+    """Numbers of the empty benches of a seating.Room, after its filled ones."""
+    number, benches, empty = room
+    return range(len(benches) + 1, len(benches) + empty + 1)
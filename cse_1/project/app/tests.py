@@ -1,6 +1,14 @@
-from django.test import TestCase, Client
+import os
+import zipfile
+from io import BytesIO
+
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.contrib.auth.models import User
+from unittest.mock import patch
+
+from app import solver
+
 
 class TeacherTimetablePDFTest(TestCase):
     def setUp(self):
@@ -30,6 +38,18 @@ class TeacherTimetablePDFTest(TestCase):
         self.assertEqual(response['Content-Type'], 'application/pdf')
         self.assertIn('Test_Teacher_timetable.pdf', response['Content-Disposition'])
 
+    def test_pdf_styles_are_built_once_and_never_mutated(self):
+        from app import pdf_export
+        styles = pdf_export.get_styles()
+        sizes = (styles.title.fontSize, styles.timetable_title.fontSize, styles.seating_title.fontSize)
+        grid = {1: {day: ['Math - Lab', 'Math - Lab'] + [None] * 7 for day in solver.DAYS}}
+        pdf_export.timetable_pdf(grid, [], {'T': ['Math']}, {1: 'I'})
+        pdf_export.teacher_timetable_pdf('T', ['Math'], grid, {1: 'I'})
+        pdf_export.seating_pdf([[1, [[['1AB21CS001', 'Long Name ' * 20, 1]]], 1]], 2)
+        self.assertIs(pdf_export.get_styles(), styles)
+        self.assertEqual((styles.title.fontSize, styles.timetable_title.fontSize, styles.seating_title.fontSize),
+                         sizes)
+
     def test_download_teacher_timetable_pdf_invalid_teacher(self):
         # Set session data
         session = self.client.session
@@ -45,3 +65,772 @@ class TeacherTimetablePDFTest(TestCase):
         # No session data
         response = self.client.get(reverse('download_teacher_timetable_pdf', kwargs={'teacher_name': 'Test Teacher'}))
         self.assertEqual(response.status_code, 302)  # Redirect to timetable_teachers
+
+
+class SeatingDownloadTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        User.objects.create_user('testuser', 'test@example.com', 'password')
+        self.client.login(username='testuser', password='password')
+        session = self.client.session
+        session['seating_arrangement'] = [[1, [[1, ['1AB21CS001 Asha Rao', '1AB22EC002 Ravi K']], [2, [None, None]]]]]
+        session['students_per_bench'] = 2
+        session.save()
+
+    def test_seating_pdf_carries_etag_and_answers_304(self):
+        response = self.client.get(reverse('download_seating_pdf'))
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertIn('private', response['Cache-Control'])
+        response = self.client.get(reverse('download_seating_pdf'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+
+def make_roster_pdf(lines):
+    """A one-column roster PDF with a header line and page numbers, like the uploaded class lists."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    for start in range(0, len(lines), 40):
+        pdf.drawString(50, 800, 'Sl No USN Name')
+        for i, line in enumerate(lines[start:start + 40]):
+            pdf.drawString(50, 780 - 18 * i, line)
+        pdf.drawString(280, 30, str(start // 40 + 1))
+        pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+class SeatingRosterTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        User.objects.create_user('testuser', 'test@example.com', 'password')
+        self.client.login(username='testuser', password='password')
+        self.rosters = [[(f'1AB2{sem}CS{i:03d}', f'Student {sem}-{i}') for i in range(1, 51)] for sem in (1, 2)]
+        self.pdfs = [make_roster_pdf([f'{usn} {name}' for usn, name in rows]) for rows in self.rosters]
+
+    def records(self, *sections):
+        from app.roster import Student
+        return [Student(usn, name, section) for section in sections for usn, name in self.rosters[section - 1]]
+
+    def test_each_page_yields_only_student_lines(self):
+        from app import roster
+        self.assertEqual(list(roster.iter_students(BytesIO(self.pdfs[0]))), self.rosters[0])
+
+    @override_settings(SEATING_PARSE_WORKERS=2)
+    def test_rosters_are_parsed_in_worker_processes(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from app import roster
+        files = [SimpleUploadedFile(f'sem{i}.pdf', data) for i, data in enumerate(self.pdfs)]
+        self.assertEqual(roster.parse_rosters(files), [self.records(1), self.records(2)])
+
+    def test_seating_places_every_student_from_every_roster(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        response = self.client.post(reverse('seating'), {
+            'num_sems': '2', 'num_classes': '5', 'benches_per_class': '10', 'students_per_bench': '2',
+            'pdf_sem_1': SimpleUploadedFile('sem1.pdf', self.pdfs[0]),
+            'pdf_sem_2': SimpleUploadedFile('sem2.pdf', self.pdfs[1]),
+        })
+        placed = [s for room in response.context['arrangement'] for bench in room.benches for s in bench]
+        self.assertEqual(sorted(placed), self.records(1, 2))
+        self.assertContains(response, '1AB21CS001<br>Student 1-1')
+
+        # The session keeps [usn, name, section]; the PDF is built from those
+        stored = self.client.session['seating_arrangement']
+        self.assertIn(['1AB22CS050', 'Student 2-50', 2],
+                      [s for _, benches, _ in stored for students in benches for s in students])
+        response = self.client.get(reverse('download_seating_pdf'))
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+
+    def test_reuploaded_roster_is_not_parsed_again(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from app import roster
+        data = self.pdfs[0]
+        self.assertEqual(roster.parse_rosters([SimpleUploadedFile('sem1.pdf', data)]), [self.records(1)])
+
+        def unreachable(roster_file):
+            raise AssertionError('cached roster parsed again')
+
+        with patch.dict(roster.BACKENDS, {backend: unreachable for backend in roster.BACKENDS}):
+            response = self.client.post(reverse('seating'), {
+                'num_sems': '1', 'num_classes': '3', 'benches_per_class': '20', 'students_per_bench': '1',
+                'pdf_sem_1': SimpleUploadedFile('renamed.pdf', data),
+            })
+        placed = [s for room in response.context['arrangement'] for bench in room.benches for s in bench]
+        self.assertEqual(sorted(placed), self.records(1))
+        # Another backend is another cache entry
+        with patch.dict(roster.BACKENDS, {'pypdfium2': unreachable}), self.assertRaises(roster.RosterError):
+            roster.parse_rosters([SimpleUploadedFile('sem1.pdf', data)], backend='pypdfium2')
+
+    def test_automatic_backend_follows_the_file_content(self):
+        import openpyxl
+        from reportlab.lib.pagesizes import A4
+        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle
+        from app import roster
+        from app.forms import SeatingForm
+
+        ruled = BytesIO()
+        table = Table([['Sl No', 'USN', 'Name']] + [[str(i), usn, name] for i, (usn, name) in
+                                                    enumerate(self.rosters[0], 1)])
+        table.setStyle(TableStyle([('GRID', (0, 0), (-1, -1), 0.5, (0, 0, 0))]))
+        SimpleDocTemplate(ruled, pagesize=A4).build([table])
+        workbook = openpyxl.Workbook()
+        workbook.active.append(['USN', 'Name'])
+        xlsx = BytesIO()
+        workbook.save(xlsx)
+
+        self.assertEqual(roster.backend_for('sem1.pdf'), roster.AUTO)
+        self.assertEqual(roster.detect_backend(ruled.getvalue(), 'sem1.pdf'), 'pdfplumber')
+        self.assertEqual(roster.detect_backend(self.pdfs[0], 'sem1.pdf'), 'pypdfium2')
+        self.assertEqual(roster.detect_backend(xlsx.getvalue(), 'export'), 'xlsx')
+        self.assertEqual(roster.detect_backend(b'USN,Name\n1AB21CS001,Om K\n', 'export.txt'), 'csv')
+        self.assertEqual(roster._parse_bytes(roster.AUTO, ruled.getvalue(), 'sem1.pdf'), self.rosters[0])
+        self.assertIn('misreads ruled tables', dict(SeatingForm().fields['roster_backend'].choices)['pypdf2'])
+
+    def test_pdf_backends_read_the_same_students(self):
+        from app import roster
+        for backend in roster.PDF_BACKENDS:
+            with self.subTest(backend=backend):
+                self.assertEqual(roster.read_roster(BytesIO(self.pdfs[0]), backend), self.rosters[0])
+
+    def test_tabular_rosters_keep_rows_the_line_heuristics_drop(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from app import roster
+        csv_data = b'Sl No,USN,Student Name\n1,1AB21CS001,Om K\n2,1AB21CS002,Ravi Name\n3,1AB21CS003,Usha\n'
+        files = [SimpleUploadedFile('sem1.csv', csv_data)]
+        self.assertEqual(roster.parse_rosters(files, backend='pdfplumber'),
+                         [[('1AB21CS001', 'Om K', 1), ('1AB21CS002', 'Ravi Name', 1), ('1AB21CS003', 'Usha', 1)]])
+
+    def test_xlsx_roster(self):
+        import openpyxl
+        from app import roster
+        workbook = openpyxl.Workbook()
+        workbook.active.append(['Class list, 3rd semester'])
+        workbook.active.append(['Sl No', 'USN', 'Name'])
+        workbook.active.append([1, '1AB21CS001', 'Namratha  Rao'])
+        buffer = BytesIO()
+        workbook.save(buffer)
+        buffer.seek(0)
+        self.assertEqual(roster.read_roster(buffer, roster.backend_for('sem1.xlsx')),
+                         [('1AB21CS001', 'Namratha Rao')])
+
+    def test_unreadable_roster_is_shown_as_a_form_error(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        response = self.client.post(reverse('seating'), {
+            'num_sems': '1', 'num_classes': '1', 'benches_per_class': '10', 'students_per_bench': '2',
+            'pdf_sem_1': SimpleUploadedFile('sem1.pdf', b'not a pdf'),
+        })
+        self.assertTemplateUsed(response, 'app/seating.html')
+        self.assertIn('sem1.pdf could not be read', response.content.decode())
+
+
+class BenchAllocatorTest(TestCase):
+    def sections(self, *sizes):
+        return [[(section, i) for i in range(size)] for section, size in enumerate(sizes)]
+
+    def test_benches_and_neighbouring_benches_mix_sections(self):
+        from app.seating import allocate_benches
+        benches, overflow = allocate_benches(self.sections(10, 10, 10, 10), 2, rng=None)
+        self.assertEqual(overflow, [])
+        self.assertEqual(len(benches), 20)
+        sections = [{section for section, _ in bench} for bench in benches]
+        self.assertTrue(all(len(s) == 2 for s in sections))
+        self.assertTrue(all(not (a & b) for a, b in zip(sections, sections[1:])))
+
+    def test_one_section_doubles_up_only_when_capacity_requires(self):
+        from app.seating import allocate_benches
+        benches, overflow = allocate_benches(self.sections(30, 5), 2, total_benches=40, rng=None)
+        self.assertEqual(overflow, [])
+        self.assertTrue(all(len({section for section, _ in bench}) == len(bench) for bench in benches))
+
+        benches, overflow = allocate_benches(self.sections(30, 5), 2, total_benches=20, rng=None)
+        self.assertEqual(overflow, [])
+        self.assertEqual(sum(len(bench) for bench in benches), 35)
+        mixed = sum(len({section for section, _ in bench}) == 2 for bench in benches)
+        doubled = sum(len(bench) == 2 and len({section for section, _ in bench}) == 1 for bench in benches)
+        # 5 benches can mix; the other 30 students need 10 doubled benches at the least
+        self.assertEqual((mixed, doubled), (5, 10))
+
+    def test_students_beyond_capacity_are_reported(self):
+        from app.seating import allocate_benches
+        benches, overflow = allocate_benches(self.sections(20000, 8000, 1500, 40, 1), 3, total_benches=9000)
+        self.assertEqual(sum(len(bench) for bench in benches), 27000)
+        self.assertEqual(len(overflow), 2541)
+        seated = {student for bench in benches for student in bench}
+        self.assertFalse(seated & set(overflow))
+
+    def test_seating_page_lists_students_that_do_not_fit(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        client = Client()
+        User.objects.create_user('testuser', 'test@example.com', 'password')
+        client.login(username='testuser', password='password')
+        csv_data = ''.join(f'1AB21CS{i:03d},Student {i}\n' for i in range(1, 8)).encode()
+        response = client.post(reverse('seating'), {
+            'num_sems': '1', 'num_classes': '1', 'benches_per_class': '3', 'students_per_bench': '2',
+            'pdf_sem_1': SimpleUploadedFile('sem1.csv', csv_data),
+        })
+        self.assertEqual(len(response.context['overflow']), 1)
+        self.assertContains(response, '1 student could not be seated')
+        response = client.get(reverse('download_seating_pdf'))
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+
+
+class RoomPackingTest(TestCase):
+    def test_capacities_accept_bench_counts_and_rows_by_columns(self):
+        from app.seating import parse_capacities
+        self.assertEqual(parse_capacities('30, 6x5; 24\n2 X 3'), [30, 30, 24, 6])
+        for text in ('30, big', '0', '3x'):
+            with self.subTest(text=text), self.assertRaises(ValueError):
+                parse_capacities(text)
+
+    def test_rooms_store_filled_benches_and_count_empty_ones(self):
+        from app.seating import Room, pack_rooms
+        benches = [[('A', i)] for i in range(7)]
+        self.assertEqual(pack_rooms(benches, [3, 5, 2]),
+                         [Room(1, benches[:3], 0), Room(2, benches[3:], 1), Room(3, [], 2)])
+        # A large hall stores no padding at all
+        rooms = pack_rooms([[('A', i), ('B', i)] for i in range(1000)], [30] * 100)
+        self.assertEqual(sum(room.empty for room in rooms), 2000)
+        self.assertNotIn(None, [s for room in rooms for bench in room.benches for s in bench])
+
+    def test_seating_uses_per_room_capacities(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        client = Client()
+        User.objects.create_user('testuser', 'test@example.com', 'password')
+        client.login(username='testuser', password='password')
+        csv_data = ''.join(f'1AB21CS{i:03d},Student {i}\n' for i in range(1, 10)).encode()
+        response = client.post(reverse('seating'), {
+            'num_sems': '1', 'room_benches': '4, 2x3', 'students_per_bench': '1',
+            'pdf_sem_1': SimpleUploadedFile('sem1.csv', csv_data),
+        })
+        rooms = response.context['arrangement']
+        self.assertEqual([(len(room.benches), room.empty) for room in rooms], [(4, 0), (5, 1)])
+        self.assertEqual(response.context['overflow'], [])
+        self.assertEqual(client.session['seating_arrangement'][1][2], 1)
+        self.assertEqual(client.get(reverse('download_seating_pdf'))['Content-Type'], 'application/pdf')
+
+        response = client.post(reverse('seating'), {
+            'num_sems': '1', 'room_benches': 'four', 'students_per_bench': '1',
+            'pdf_sem_1': SimpleUploadedFile('sem1.csv', csv_data),
+        })
+        self.assertContains(response, 'is not a number of benches')
+
+
+class AllocatorTest(TestCase):
+    entries = [
+        {"teacher": "T1", "year": 1, "subject": "Math", "hours": 4, "is_integrated": False,
+         "is_lab": False, "is_external_lab": False, "remaining": 4, "day_time_prefs": {"Mon": "0"}},
+        {"teacher": "T2", "year": 1, "subject": "Physics", "hours": 3, "is_integrated": True,
+         "is_lab": False, "is_external_lab": False, "remaining": 3, "day_time_prefs": {}},
+        {"teacher": "T1", "year": 2, "subject": "Chem", "hours": 0, "is_integrated": False,
+         "is_lab": True, "is_external_lab": True, "remaining": 0, "day_time_prefs": {}},
+    ]
+
+    def test_allocates_theory_hours_and_labs(self):
+        from app.solver import allocate_timetable_with_ga
+        timetables, unallocated = allocate_timetable_with_ga(self.entries)
+        self.assertEqual(unallocated, [])
+        slots = [s for days in timetables[1].values() for s in days]
+        self.assertEqual(slots.count('Math'), 4)
+        self.assertEqual(slots.count('Physics'), 3)
+        self.assertEqual(slots.count('Physics - Lab'), 2)
+        self.assertEqual(timetables[1]['Mon'][0], 'Math')
+        chem = [s for days in timetables[2].values() for s in days]
+        self.assertEqual(chem.count('Chem - Lab'), 3)
+
+    def test_warm_start_returns_a_different_timetable(self):
+        first = solver.solve_timetable(self.entries)
+        second = solver.solve_timetable(self.entries, previous=first['timetables'])
+        self.assertTrue(second['stats']['warm_start'])
+        self.assertGreaterEqual(second['stats']['min_changes'], 1)
+        self.assertNotEqual(first['timetables'], second['timetables'])
+        self.assertEqual(second['timetables'][1]['Mon'][0], 'Math')
+
+    def test_warm_start_tells_teachers_of_a_shared_subject_apart(self):
+        shared = [
+            {"teacher": teacher, "year": 1, "subject": "Math", "hours": hours, "is_integrated": False,
+             "is_lab": False, "is_external_lab": False, "remaining": hours, "day_time_prefs": {}}
+            for teacher, hours in (("T1", 3), ("T2", 2))
+        ]
+        first = solver.solve_timetable(shared)
+        second = solver.solve_timetable(shared, previous=first['timetables'], previous_index=first['teacher_index'])
+        self.assertEqual(second['stats']['min_changes'], 1)
+        moved = {t: {tuple(s) for s in second['teacher_index'][t]} - {tuple(s) for s in first['teacher_index'][t]}
+                 for t in ("T1", "T2")}
+        self.assertGreaterEqual(sum(map(len, moved.values())), 1)
+
+        # Without the index the grid cannot tell whose Math a cell is, so none counts as placed
+        tm = solver.build_model(shared)
+        self.assertFalse(any(solver.previous_assignment(tm, first['timetables']).values()))
+
+    def test_resolve_teacher_pins_others_by_their_own_slots(self):
+        shared = [
+            {"teacher": teacher, "year": 1, "subject": "Math", "hours": hours, "is_integrated": False,
+             "is_lab": False, "is_external_lab": False, "remaining": hours, "day_time_prefs": {}}
+            for teacher, hours in (("T1", 2), ("T2", 2))
+        ]
+        first = solver.solve_timetable(shared)
+        changed = [shared[0], dict(shared[1], hours=3, remaining=3)]
+        result = solver.resolve_teacher(changed, first['timetables'], "T2", [1],
+                                        previous_index=first['teacher_index'])
+        self.assertEqual(result['stats']['status'], 'OPTIMAL')
+        self.assertEqual(result['teacher_index']['T1'], first['teacher_index']['T1'])
+        self.assertEqual(len(result['teacher_index']['T2']), 3)
+
+    def test_resolve_teacher_reports_a_change_that_does_not_fit(self):
+        shared = [
+            {"teacher": teacher, "year": 1, "subject": "Math", "hours": 2, "is_integrated": False,
+             "is_lab": False, "is_external_lab": False, "remaining": 2, "day_time_prefs": {}}
+            for teacher in ("T1", "T2")
+        ]
+        first = solver.solve_timetable(shared)
+        # Math is taught once a day, and T1 already has two of the five days
+        changed = [shared[0], dict(shared[1], hours=4, remaining=4)]
+        result = solver.resolve_teacher(changed, first['timetables'], "T2", [1],
+                                        previous_index=first['teacher_index'])
+        self.assertEqual(result['stats']['status'], 'INFEASIBLE')
+        self.assertTrue(result['stats']['pinned_others'])
+        self.assertEqual(result['timetables'], first['timetables'])
+        self.assertEqual(result['teacher_index'], first['teacher_index'])
+        [record] = result['unallocated']
+        self.assertEqual((record['teacher'], record['theory_remaining']), ('T2', 4))
+        self.assertIn('previous timetable was kept', record['reason'])
+
+    def test_warm_start_falls_back_when_nothing_can_move(self):
+        pinned = [{"teacher": "T1", "year": 1, "subject": "Math", "hours": 1, "is_integrated": False,
+                   "is_lab": False, "is_external_lab": False, "remaining": 1, "day_time_prefs": {"Mon": "0"}}]
+        first = solver.solve_timetable(pinned)
+        second = solver.solve_timetable(pinned, previous=first['timetables'])
+        self.assertEqual(first['timetables'], second['timetables'])
+
+    def test_infeasible_preferences_are_reported_as_unallocated(self):
+        clash = self.entries + [
+            {"teacher": "T3", "year": 1, "subject": "Bio", "hours": 2, "is_integrated": False,
+             "is_lab": False, "is_external_lab": False, "remaining": 2, "day_time_prefs": {"Mon": "0"}},
+        ]
+        result = solver.solve_timetable(clash)
+        self.assertEqual(result['stats']['status'], 'INFEASIBLE')
+        self.assertEqual(len(result['stats']['conflicts']), 1)
+        [record] = result['unallocated']
+        self.assertEqual((record['teacher'], record['subject']), ('T3', 'Bio'))
+        self.assertIn('Mon 9:00-10:00', record['reason'])
+        self.assertIn('Math (T1, Year 1)', record['reason'])
+        # Everything else is still scheduled
+        slots = [s for days in result['timetables'][1].values() for s in days]
+        self.assertEqual(slots.count('Math'), 4)
+        self.assertEqual(slots.count('Bio'), 2 - record['theory_remaining'])
+
+    def test_deterministic_profile_is_bounded_by_deterministic_time(self):
+        from ortools.sat.python import cp_model
+        cp_solver = cp_model.CpSolver()
+        solver.configure_solver(cp_solver, solver.get_profile('deterministic'))
+        self.assertEqual(cp_solver.parameters.max_deterministic_time, 10.0)
+        self.assertGreater(cp_solver.parameters.max_time_in_seconds, 10.0)
+
+    def test_optimize_profile_treats_preferences_as_soft(self):
+        clash = self.entries + [
+            {"teacher": "T3", "year": 1, "subject": "Bio", "hours": 2, "is_integrated": False,
+             "is_lab": False, "is_external_lab": False, "remaining": 2, "day_time_prefs": {"Mon": "0"}},
+        ]
+        progress = []
+        result = solver.solve_timetable(clash, profile={"optimize": True, "max_time_in_seconds": 5.0},
+                                        on_solution=progress.append)
+        self.assertIn(result['stats']['status'], ('OPTIMAL', 'FEASIBLE'))
+        self.assertEqual(result['unallocated'], [])
+        score = result['stats']['score']
+        self.assertEqual((score['preferences_met'], score['preferences_total']), (1, 2))
+        self.assertTrue(progress)
+        self.assertEqual(progress[-1]['objective'], score['objective'])
+        slots = [s for days in result['timetables'][1].values() for s in days]
+        self.assertEqual(slots.count('Bio'), 2)
+
+    def test_reduced_model_is_smaller_and_keeps_preferences(self):
+        from ortools.sat.python import cp_model
+        literal = solver.model_size(solver.build_model(self.entries, reduce=False))
+        reduced = solver.model_size(solver.build_model(self.entries))
+        self.assertLess(reduced['variables'], literal['variables'])
+        self.assertLess(reduced['constraints'], literal['constraints'])
+
+        # An integrated lab preferred in the afternoon breaks rule C5b either way
+        afternoon = [dict(self.entries[1], day_time_prefs={"Tue": "6"})]
+        for reduce in (False, True):
+            tm = solver.build_model(afternoon, reduce=reduce)
+            self.assertEqual(cp_model.CpSolver().Solve(tm.model), cp_model.INFEASIBLE)
+
+    def test_connected_components_split_on_shared_teachers(self):
+        entries = self.entries + [
+            {"teacher": "T3", "year": 3, "subject": "Bio", "hours": 2, "is_integrated": False,
+             "is_lab": False, "is_external_lab": False, "remaining": 2, "day_time_prefs": {}},
+        ]
+        components = solver.connected_components(entries)
+        self.assertEqual([[e['subject'] for e in c] for c in components], [['Math', 'Physics', 'Chem'], ['Bio']])
+
+    def test_components_solved_in_parallel_are_merged(self):
+        entries = [dict(e, teacher=f"{e['teacher']}-{y}", year=y) for y in (1, 2, 3) for e in self.entries[:2]]
+        result = solver.solve_components(solver.connected_components(entries))
+        self.assertEqual(result['stats']['components'], 3)
+        self.assertEqual(result['stats']['status'], 'OPTIMAL')
+        self.assertEqual(sorted(result['timetables']), [1, 2, 3])
+        for grid in result['timetables'].values():
+            self.assertEqual(sum(slots.count('Math') for slots in grid.values()), 4)
+
+    def test_components_report_progress_as_each_one_finishes(self):
+        entries = [dict(e, teacher=f"{e['teacher']}-{y}", year=y) for y in (1, 2, 3) for e in self.entries[:2]]
+        progress = []
+        result = solver.solve_components(solver.connected_components(entries),
+                                         profile={"optimize": True, "max_time_in_seconds": 5.0},
+                                         on_solution=progress.append)
+        self.assertEqual([p['solutions'] for p in progress], [1, 2, 3])
+        self.assertEqual(progress[-1]['components'], 3)
+        self.assertEqual(progress[-1]['objective'], result['stats']['score']['objective'])
+
+    def test_component_pool_is_reused_until_a_solve_is_stopped(self):
+        entries = [dict(e, teacher=f"{e['teacher']}-{y}", year=y) for y in (1, 2) for e in self.entries[:2]]
+        components = solver.connected_components(entries)
+        solver.solve_components(components)
+        pool = solver._pool
+        solver.solve_components(components)
+        self.assertIs(solver._pool, pool)
+
+        result = solver.solve_components(components, on_solver=lambda stopper: stopper.StopSearch())
+        self.assertEqual(result['stats']['status'], 'UNKNOWN')
+        self.assertIsNone(solver._pool)
+        self.assertNotIn(pool, solver._pool_users)
+
+    def test_teacher_index_keeps_shared_subject_names_apart(self):
+        entries = self.entries + [
+            {"teacher": "T3", "year": 2, "subject": "Math", "hours": 2, "is_integrated": False,
+             "is_lab": False, "is_external_lab": False, "remaining": 2, "day_time_prefs": {}},
+        ]
+        result = solver.solve_timetable(entries)
+        index = result['teacher_index']
+        self.assertEqual(len(index['T3']), 2)
+        self.assertEqual(len([s for s in index['T1'] if s[0] == 1 and s[3] == 'theory']), 4)
+        self.assertFalse({tuple(s) for s in index['T1']} & {tuple(s) for s in index['T3']})
+        for year, day, period, kind in index['T1'] + index['T3']:
+            label = result['timetables'][year][day][period]
+            self.assertEqual(label, 'Chem - Lab' if kind == 'lab' else 'Math')
+        self.assertTrue(any(s[3] == 'lab' for s in index['T1']))
+
+    def test_teacher_never_double_booked(self):
+        from app.solver import allocate_timetable_with_ga, DAYS, TEACHING_PERIODS
+        timetables, _ = allocate_timetable_with_ga(self.entries)
+        for d in DAYS:
+            for p in TEACHING_PERIODS:
+                t1_busy = [timetables[1][d][p] == 'Math', timetables[2][d][p] == 'Chem - Lab']
+                self.assertLessEqual(sum(t1_busy), 1)
+
+
+@override_settings(TIMETABLE_JOBS_EAGER=True)
+class TimetableJobTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user('testuser', 'test@example.com', 'password')
+        self.client.login(username='testuser', password='password')
+        session = self.client.session
+        session['total_teachers'] = 1
+        session['semester_type'] = 'odd'
+        session.save()
+
+    def post_teacher(self):
+        return self.client.post(reverse('timetable_teachers'), {
+            'teachers-TOTAL_FORMS': '1', 'teachers-INITIAL_FORMS': '0',
+            'teachers-0-teacher_name': 'Test Teacher', 'teachers-0-years_handling': ['1'],
+            'teachers-0-subject_y1': 'Math', 'teachers-0-hours_y1': '3',
+        })
+
+    def test_submit_redirects_to_job_and_renders_result(self):
+        response = self.post_teacher()
+        job_id = self.client.session['timetable_job']
+        self.assertRedirects(response, reverse('timetable_job', kwargs={'job_id': job_id}))
+
+        status = self.client.get(reverse('timetable_job_status', kwargs={'job_id': job_id})).json()
+        self.assertEqual(status['status'], 'done')
+
+        response = self.client.get(reverse('timetable_job', kwargs={'job_id': job_id}))
+        self.assertTemplateUsed(response, 'app/timetable_result.html')
+        self.assertContains(response, 'Math')
+
+        response = self.client.get(reverse('download_timetable_pdf'))
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+
+    def test_download_links_get_conditional_requests(self):
+        self.post_teacher()
+        pages = [
+            (reverse('timetable_job', kwargs={'job_id': self.client.session['timetable_job']}),
+             reverse('download_timetable_pdf')),
+            (reverse('teacher_timetable', kwargs={'teacher_name': 'Test Teacher'}),
+             reverse('download_teacher_timetable_pdf', kwargs={'teacher_name': 'Test Teacher'})),
+        ]
+        for page, download in pages:
+            # A plain link, so the browser revalidates with a GET
+            self.assertContains(self.client.get(page), f'<a href="{download}">')
+            response = self.client.get(download)
+            self.assertEqual(response['Content-Type'], 'application/pdf')
+            response = self.client.get(download, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(response.status_code, 304)
+
+    def test_job_missing_from_the_registry_is_served_from_its_stored_result(self):
+        from app import jobs
+        self.post_teacher()
+        job_id = self.client.session['timetable_job']
+        # As seen from another worker process, or after a restart
+        jobs._jobs.clear()
+
+        status = self.client.get(reverse('timetable_job_status', kwargs={'job_id': job_id})).json()
+        self.assertEqual(status['status'], 'done')
+        cancel = self.client.post(reverse('timetable_job_cancel', kwargs={'job_id': job_id})).json()
+        self.assertFalse(cancel['cancelled'])
+
+        response = self.client.get(reverse('timetable_job', kwargs={'job_id': job_id}))
+        self.assertTemplateUsed(response, 'app/timetable_result.html')
+        self.assertContains(response, 'Math')
+        self.assertIn('timetable_result', self.client.session)
+        response = self.client.get(reverse('download_timetable_pdf'))
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+
+        unknown = self.client.get(reverse('timetable_job_status', kwargs={'job_id': 'f' * 32}))
+        self.assertEqual(unknown.status_code, 404)
+
+    def test_job_running_in_another_worker_is_polled_and_cancelled_through_its_state(self):
+        from app import jobs
+        from app.models import TimetableJobState
+        job = jobs.SolveJob([{"teacher": "T", "year": 1, "subject": "Math", "hours": 2, "is_integrated": False,
+                              "is_lab": False, "is_external_lab": False, "remaining": 2, "day_time_prefs": {}}],
+                            owner=self.user.pk)
+        # Accepted by another worker process: only its state row is visible here
+        job._save_state()
+
+        status = self.client.get(reverse('timetable_job_status', kwargs={'job_id': job.id})).json()
+        self.assertEqual(status['status'], 'pending')
+        response = self.client.get(reverse('timetable_job', kwargs={'job_id': job.id}))
+        self.assertTemplateUsed(response, 'app/timetable_pending.html')
+
+        cancel = self.client.post(reverse('timetable_job_cancel', kwargs={'job_id': job.id})).json()
+        self.assertTrue(cancel['cancelled'])
+        self.assertEqual(TimetableJobState.objects.get(pk=job.id).status, 'cancelled')
+        # The worker running it honours the cancel
+        job.run()
+        self.assertEqual(job.status, 'cancelled')
+        self.assertIsNone(job.result_id)
+
+    def test_result_is_stored_server_side_and_referenced_by_id(self):
+        from app import results
+        self.post_teacher()
+        job_id = self.client.session['timetable_job']
+        self.client.get(reverse('timetable_job', kwargs={'job_id': job_id}))
+
+        session = self.client.session
+        for key in ('entries', 'timetables', 'unallocated', 'teacher_subjects'):
+            self.assertNotIn(key, session)
+        stored = results.load(session['timetable_result'], self.user.pk, teacher='Test Teacher',
+                              with_entries=True)
+        self.assertEqual(list(stored['timetables']), [1])
+        self.assertEqual(stored['entries'][0]['subject'], 'Math')
+        self.assertIsNone(results.load(session['timetable_result'], self.user.pk + 1))
+
+        response = self.client.get(reverse('teacher_timetable', kwargs={'teacher_name': 'Test Teacher'}))
+        self.assertContains(response, 'Math')
+
+    def test_metrics_endpoint_exports_phase_histograms(self):
+        self.post_teacher()
+        self.client.get(reverse('timetable_job', kwargs={'job_id': self.client.session['timetable_job']}))
+        self.client.get(reverse('download_timetable_pdf'))
+        self.user.is_staff = True
+        self.user.save()
+        body = self.client.get(reverse('metrics')).content.decode()
+        for view, phase in [('timetable_teachers', 'formset_validation'),
+                            ('timetable_teachers', 'entry_extraction'),
+                            ('timetable_teachers', 'session_write'),
+                            ('timetable_teachers', 'model_build'),
+                            ('timetable_teachers', 'solve'),
+                            ('timetable_job', 'render'),
+                            ('download_timetable_pdf', 'pdf_build')]:
+            self.assertIn(f'timetable_phase_seconds_count{{phase="{phase}",view="{view}"}}', body)
+        self.assertIn('timetable_view_requests_total{method="POST",view="timetable_teachers"}', body)
+
+    @override_settings(TIMETABLE_METRICS_TOKEN='s3cret', TIMETABLE_METRICS_ALLOWED_IPS=['10.0.0.5'])
+    def test_metrics_endpoint_needs_staff_an_allowed_address_or_the_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        anonymous = Client()
+        self.assertEqual(anonymous.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        self.assertEqual(anonymous.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer s3cret').status_code, 200)
+        self.assertEqual(anonymous.get(reverse('metrics'), REMOTE_ADDR='10.0.0.5').status_code, 200)
+
+    def test_metrics_of_all_workers_are_merged_in_multiprocess_mode(self):
+        import tempfile
+        from prometheus_client import multiprocess
+        self.user.is_staff = True
+        self.user.save()
+        with tempfile.TemporaryDirectory() as directory, \
+                patch.dict(os.environ, {'PROMETHEUS_MULTIPROC_DIR': directory}), \
+                patch.object(multiprocess, 'MultiProcessCollector', wraps=multiprocess.MultiProcessCollector) as collector:
+            response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        collector.assert_called_once()
+        self.assertEqual(collector.call_args.args[0].__class__.__name__, 'CollectorRegistry')
+
+    def test_selected_profile_is_used_and_reported(self):
+        self.client.post(reverse('timetable_start'), {
+            'total_teachers': '1', 'semester_type': 'odd', 'solver_profile': 'fast',
+        })
+        self.post_teacher()
+        job_id = self.client.session['timetable_job']
+        response = self.client.get(reverse('timetable_job', kwargs={'job_id': job_id}))
+        stats = response.context['solver_stats']
+        self.assertEqual(stats['profile'], 'fast')
+        self.assertEqual(stats['status'], 'OPTIMAL')
+
+    def test_resubmitting_same_entries_hits_solution_cache(self):
+        self.post_teacher()
+        first = self.client.session['timetable_job']
+        with patch('app.solver.build_model') as build_model:
+            self.post_teacher()
+            build_model.assert_not_called()
+        second = self.client.session['timetable_job']
+        self.assertNotEqual(first, second)
+        response = self.client.get(reverse('timetable_job', kwargs={'job_id': second}))
+        self.assertTrue(response.context['solver_stats']['cached'])
+        self.assertEqual(list(response.context['timetables']), [1])
+
+    def test_regenerate_bypasses_solution_cache(self):
+        self.post_teacher()
+        with patch('app.solver.build_model', wraps=solver.build_model) as build_model:
+            self.client.post(reverse('timetable_teachers'), {'regenerate': 'regenerate'})
+            build_model.assert_called_once()
+
+    def test_edit_teacher_only_moves_that_teachers_classes(self):
+        self.client.post(reverse('timetable_teachers'), {
+            'teachers-TOTAL_FORMS': '2', 'teachers-INITIAL_FORMS': '0',
+            'teachers-0-teacher_name': 'Alice', 'teachers-0-years_handling': ['1'],
+            'teachers-0-subject_y1': 'Math', 'teachers-0-hours_y1': '3',
+            'teachers-1-teacher_name': 'Bob', 'teachers-1-years_handling': ['1', '2'],
+            'teachers-1-subject_y1': 'Physics', 'teachers-1-hours_y1': '3',
+            'teachers-1-subject_y2': 'Chemistry', 'teachers-1-hours_y2': '2',
+        })
+        before = self.client.get(reverse('timetable_job', kwargs={'job_id': self.client.session['timetable_job']}))
+        before = before.context['timetables']
+
+        response = self.client.get(reverse('edit_teacher', kwargs={'teacher_name': 'Alice'}))
+        self.assertEqual(response.context['formset'].forms[0].initial['hours_y1'], 3)
+        # A cached full solve of the edited entries could move everyone, and the
+        # partial re-solve is no full solve to cache
+        with patch('app.solution_cache.get') as cache_get, patch('app.solution_cache.put') as cache_put:
+            self.client.post(reverse('edit_teacher', kwargs={'teacher_name': 'Alice'}), {
+                'teachers-TOTAL_FORMS': '1', 'teachers-INITIAL_FORMS': '1',
+                'teachers-0-teacher_name': 'Alice', 'teachers-0-years_handling': ['1'],
+                'teachers-0-subject_y1': 'Math', 'teachers-0-hours_y1': '5',
+            })
+        cache_get.assert_not_called()
+        cache_put.assert_not_called()
+        response = self.client.get(reverse('timetable_job', kwargs={'job_id': self.client.session['timetable_job']}))
+        after = response.context['timetables']
+        stats = response.context['solver_stats']
+        self.assertTrue(stats['incremental'])
+        self.assertTrue(stats['pinned_others'])
+        self.assertEqual(stats['resolved_years'], [1])
+        self.assertEqual(after[2], before[2])
+        for day, slots in before[1].items():
+            for before_slot, after_slot in zip(slots, after[1][day]):
+                if before_slot == 'Physics':
+                    self.assertEqual(after_slot, 'Physics')
+        self.assertEqual(sum(slots.count('Math') for slots in after[1].values()), 5)
+
+    def test_teacher_page_shows_only_own_slots_of_a_shared_subject(self):
+        self.client.post(reverse('timetable_teachers'), {
+            'teachers-TOTAL_FORMS': '2', 'teachers-INITIAL_FORMS': '0',
+            'teachers-0-teacher_name': 'Alice', 'teachers-0-years_handling': ['1'],
+            'teachers-0-subject_y1': 'Math', 'teachers-0-hours_y1': '3',
+            'teachers-1-teacher_name': 'Bob', 'teachers-1-years_handling': ['1'],
+            'teachers-1-subject_y1': 'Math', 'teachers-1-hours_y1': '2',
+        })
+        self.client.get(reverse('timetable_job', kwargs={'job_id': self.client.session['timetable_job']}))
+        for teacher, hours in (('Alice', 3), ('Bob', 2)):
+            response = self.client.get(reverse('teacher_timetable', kwargs={'teacher_name': teacher}))
+            grid = response.context['timetables'][1]
+            self.assertEqual(sum(slots.count('Math') for slots in grid.values()), hours)
+
+    def test_all_teacher_pdfs_are_streamed_as_one_zip(self):
+        self.post_teacher()
+        response = self.client.get(reverse('download_teacher_timetables_zip') + '?master=1')
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        archive = zipfile.ZipFile(BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(sorted(archive.namelist()), ['Test_Teacher_timetable.pdf', 'timetable.pdf'])
+        self.assertTrue(archive.read('Test_Teacher_timetable.pdf').startswith(b'%PDF'))
+
+    def test_teacher_pdf_bundle_renders_in_worker_processes(self):
+        from app import pdf_export
+        grid = {1: {day: ['Math'] + [None] * 8 for day in solver.DAYS}}
+        teachers = [(f'Teacher {i}', ['Math'], grid) for i in range(3)]
+        data = b''.join(pdf_export.iter_teacher_bundle(teachers, {1: 'I'}, processes=2))
+        names = zipfile.ZipFile(BytesIO(data)).namelist()
+        self.assertEqual(sorted(names), [f'Teacher_{i}_timetable.pdf' for i in range(3)])
+        pool = pdf_export._pool
+        b''.join(pdf_export.iter_teacher_bundle(teachers, {1: 'I'}, processes=2))
+        self.assertIs(pdf_export._pool, pool)
+
+    def test_repeat_downloads_are_cached_and_revalidated(self):
+        self.post_teacher()
+        for name, kwargs in (('download_timetable_pdf', {}),
+                             ('download_teacher_timetable_pdf', {'teacher_name': 'Test Teacher'})):
+            url = reverse(name, kwargs=kwargs)
+            first = self.client.get(url)
+            self.assertEqual(first.status_code, 200)
+            self.assertIn('Last-Modified', first)
+            with patch('app.pdf_export.timetable_pdf') as master, \
+                    patch('app.pdf_export.teacher_timetable_pdf') as teacher:
+                again = self.client.get(url)
+                master.assert_not_called()
+                teacher.assert_not_called()
+            self.assertEqual(again.content, first.content)
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+        # A new solve of different entries gets a new version
+        self.client.post(reverse('timetable_teachers'), {
+            'teachers-TOTAL_FORMS': '1', 'teachers-INITIAL_FORMS': '0',
+            'teachers-0-teacher_name': 'Test Teacher', 'teachers-0-years_handling': ['1'],
+            'teachers-0-subject_y1': 'Physics', 'teachers-0-hours_y1': '3',
+        })
+        response = self.client.get(reverse('download_timetable_pdf'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_cancel_finished_job_is_a_no_op(self):
+        self.post_teacher()
+        job_id = self.client.session['timetable_job']
+        data = self.client.post(reverse('timetable_job_cancel', kwargs={'job_id': job_id})).json()
+        self.assertFalse(data['cancelled'])
+        self.assertEqual(data['status'], 'done')
+
+    def test_other_users_job_is_not_found(self):
+        self.post_teacher()
+        job_id = self.client.session['timetable_job']
+        User.objects.create_user('other', 'other@example.com', 'password')
+        self.client.login(username='other', password='password')
+        response = self.client.get(reverse('timetable_job_status', kwargs={'job_id': job_id}))
+        self.assertEqual(response.status_code, 404)
+
+
+class ProfileMiddlewareTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user('testuser', 'test@example.com', 'password')
+        self.client.login(username='testuser', password='password')
+
+    def test_profile_is_ignored_for_non_staff(self):
+        response = self.client.get(reverse('choice') + '?_profile=1')
+        self.assertTemplateUsed(response, 'app/choice.html')
+
+    def test_staff_can_get_or_store_a_profile(self):
+        import tempfile
+        self.user.is_staff = True
+        self.user.save()
+
+        response = self.client.get(reverse('choice'), HTTP_X_PROFILE='1')
+        self.assertEqual(response['Content-Type'], 'text/plain; charset=utf-8')
+        self.assertIn('cumulative', response.content.decode())
+
+        with tempfile.TemporaryDirectory() as directory, self.settings(TIMETABLE_PROFILE_DIR=directory):
+            response = self.client.get(reverse('choice') + '?_profile=store')
+            self.assertTemplateUsed(response, 'app/choice.html')
+            self.assertIn(response['X-Profile-File'], os.listdir(directory))
@@ -14,7 +14,15 @@ urlpatterns = [
     # Timetable flow
     path("timetable/start/", views.start_timetable_input, name="timetable_start"),
     path("timetable/teachers/", views.timetable_teachers, name="timetable_teachers"),
+    path("timetable/jobs/<str:job_id>/", views.timetable_job, name="timetable_job"),
+    path("timetable/jobs/<str:job_id>/status/", views.timetable_job_status, name="timetable_job_status"),
+    path("timetable/jobs/<str:job_id>/cancel/", views.timetable_job_cancel, name="timetable_job_cancel"),
+    path("timetable/teachers/download/", views.download_teacher_timetables_zip, name="download_teacher_timetables_zip"),
     path("timetable/teacher/<str:teacher_name>/", views.teacher_timetable, name="teacher_timetable"),
+    path("timetable/teacher/<str:teacher_name>/edit/", views.edit_teacher, name="edit_teacher"),
     path("timetable/teacher/<str:teacher_name>/download/", views.download_teacher_timetable_pdf, name="download_teacher_timetable_pdf"),
     path("timetable/download/", views.download_timetable_pdf, name="download_timetable_pdf"),
+
+    # Monitoring
+    path("metrics/", views.metrics_view, name="metrics"),
 ]
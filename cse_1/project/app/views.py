@@ -1,25 +1,28 @@
 # views.py
 # Python 3.10+ compatible
-import random
-import copy
-import PyPDF2
+import json
 import logging
-from io import BytesIO
+import time
 
+from django.conf import settings
 from django.shortcuts import render, redirect
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.contrib.auth import authenticate, login as auth_login, logout as auth_logout
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from django.forms import formset_factory
 
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+# PyPDF2 and ReportLab are imported inside the code that uses them, so
+# management commands and tests do not pay for them; serving workers load
+# them up front in app.startup.warm_up().
 
+from . import jobs, metrics, pdf_export, render_cache, results, roster, seating
 from .forms import TeacherForm, TotalTeachersForm, SeatingForm
+from .pdf_export import PERIODS
+from .solver import DAYS
+
+logger = logging.getLogger(__name__)
 
 TeacherFormSet = formset_factory(TeacherForm, extra=0)
 def user_login(request):
@@ -49,6 +52,7 @@ def choice_page(request):
 # ----------------------
 # Seating arrangement views
 @login_required
+@metrics.timed_view("seating")
 def seating_arrangement(request):
     arrangement = []
     student_lists = []
@@ -66,236 +70,219 @@ def seating_arrangement(request):
                 if file_key in request.FILES:
                     pdf_files.append(request.FILES[file_key])
 
-            total_rooms = form.cleaned_data.get('num_classes', 0)
-            benches_per_room = form.cleaned_data.get('benches_per_class', 0)
+            capacities = form.cleaned_data['room_benches']
             students_per_bench = form.cleaned_data.get('students_per_bench', 2)
 
             # Read PDFs and collect student lists
-            student_lists = []
-            for pdf_file in pdf_files:
-                pdf = PyPDF2.PdfReader(pdf_file)
-                text = ''.join(page.extract_text() for page in pdf.pages if page.extract_text())
-                students = [line.strip() for line in text.split('\n') if line.strip()]
-                # Filter out lines that are page numbers, serial numbers, or headers (case-insensitive)
-                students = [
-                    line for line in students
-                    if not line.isdigit()
-                    and not line.lower().startswith('page')
-                    and not any(word in line.lower() for word in ['sl no', 'sl.no', 'serial', 'usn', 'name'])
-                    and len(line) > 5
-                    and any(c.isalpha() for c in line)
-                ]
-                student_lists.append(students)
-
-            # Group students by section
-            section_students = [[] for _ in range(num_sems)]
-            for section_idx, students in enumerate(student_lists):
-                for student in students:
-                    section_students[section_idx].append(student)
-            # Shuffle within sections
-            for sec in section_students:
-                random.shuffle(sec)
-
-            # Assign students to benches using round-robin to ensure different sections per bench
-            from collections import deque
-            section_deques = [deque(sec) for sec in section_students]
-            benches = []
-            bench = []
-            sec_cycle = 0
-            while any(d for d in section_deques):
-                if section_deques[sec_cycle]:
-                    student = section_deques[sec_cycle].popleft()
-                    bench.append(student)
-                    if len(bench) == students_per_bench:
-                        benches.append(bench)
-                        bench = []
-                sec_cycle = (sec_cycle + 1) % num_sems
-            # Add remaining students to benches
-            for sec_idx in range(num_sems):
-                while section_deques[sec_idx]:
-                    student = section_deques[sec_idx].popleft()
-                    if not benches or len(benches[-1]) == students_per_bench:
-                        benches.append([student])
-                    else:
-                        benches[-1].append(student)
-            if bench:
-                benches.append(bench)
-
-            # Assign benches to rooms
-            arrangement = []
-            bench_idx = 0
-            for room in range(1, max(1, total_rooms) + 1):
-                room_benches = []
-                for b in range(1, max(1, benches_per_room) + 1):
-                    if bench_idx < len(benches):
-                        # Pad bench to students_per_bench with None if necessary
-                        bench_students = benches[bench_idx] + [None] * (students_per_bench - len(benches[bench_idx]))
-                        room_benches.append((b, bench_students))
-                        bench_idx += 1
-                    else:
-                        room_benches.append((b, [None] * students_per_bench))
-                arrangement.append((room, room_benches))
+            parse_started = time.perf_counter()
+            try:
+                student_lists = roster.parse_rosters(pdf_files, backend=form.cleaned_data.get('roster_backend'))
+            except roster.RosterError as exc:
+                form.add_error(None, str(exc))
+                with metrics.span("render"):
+                    return render(request, 'app/seating.html', {'form': form})
+            metrics.mark("pdf_parse", parse_started)
+
+            # Seat the sections bench by bench, mixed as far as the rooms allow
+            allocation_started = time.perf_counter()
+            total_benches = sum(capacities)
+            benches, overflow = seating.allocate_benches(student_lists, students_per_bench, total_benches)
+            if overflow:
+                logger.info("Seating: %d students do not fit on %d benches", len(overflow), total_benches)
+            arrangement = seating.pack_rooms(benches, capacities)
+            metrics.mark("allocation", allocation_started)
 
             # Store arrangement and students_per_bench in session for download
             request.session["seating_arrangement"] = arrangement
+            request.session["seating_overflow"] = overflow
             request.session["students_per_bench"] = students_per_bench
+            request.session["seating_version"] = render_cache.content_version(arrangement, students_per_bench,
+                                                                              overflow)
+            request.session["seating_generated_at"] = int(time.time())
 
             # Redirect to result page with data
-            return render(request, 'app/seating_result.html', {
-                'arrangement': arrangement,
-                'students_per_bench': students_per_bench
-            })
+            with metrics.span("render"):
+                return render(request, 'app/seating_result.html', {
+                    'arrangement': arrangement,
+                    'overflow': overflow,
+                    'students_per_bench': students_per_bench,
+                    'seats': range(students_per_bench),
+                })
     else:
         form = SeatingForm()
 
-    return render(request, 'app/seating.html', {
-        'form': form,
-        'arrangement': arrangement,
-        'student_lists': student_lists
-    })
+    with metrics.span("render"):
+        return render(request, 'app/seating.html', {
+            'form': form,
+            'arrangement': arrangement,
+            'student_lists': student_lists
+        })
+
+
+def _stored_rooms(arrangement):
+    """
+    A stored arrangement as seating.Room records. Sessions from before rooms
+    were stored as [number, benches, empty] hold every bench of a room,
+    padded with None, and older ones "USN Name" strings for students.
+    """
+    rooms = []
+    for room in arrangement:
+        if len(room) == 3:
+            rooms.append(seating.Room(*room))
+            continue
+        number, benches = room
+        filled = [[roster.Student(*roster.split_line(s), None) if isinstance(s, str) else s for s in students if s]
+                  for _, students in benches]
+        filled = [bench for bench in filled if bench]
+        rooms.append(seating.Room(number, filled, len(benches) - len(filled)))
+    return rooms
 
 
 @login_required
 @login_required
+@metrics.timed_view("download_seating_pdf")
 def download_seating_pdf(request):
     arrangement = request.session.get("seating_arrangement")
     students_per_bench = request.session.get("students_per_bench", 2)
     if not arrangement:
         return redirect('seating')
-
-    from io import BytesIO
-    from reportlab.lib.pagesizes import A4
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-    from reportlab.lib import colors
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(
-        buffer,
-        pagesize=A4,
-        leftMargin=20,
-        rightMargin=20,
-        topMargin=20,
-        bottomMargin=20
-    )
-
-    elements = []
-    styles = getSampleStyleSheet()
-
-    # Title style
-    title_style = styles['Title']
-    title_style.fontSize = 18
-    title_style.alignment = 1  # center
-
-    # Decide column headers based on students_per_bench
-    if students_per_bench == 3:
-        col_headers = ["column 1 (left)", "column 2 (middle)", "column 3 (right)"]
-    elif students_per_bench == 2:
-        col_headers = ["column 1 (left)", "column 2 (right)"]
-    else:
-        col_headers = [f"Student {j+1}" for j in range(students_per_bench)]
-
-    headers = ['Bench'] + col_headers
-
-    # Page width for colWidths
-    page_width = 555  # approx usable width (A4 - margins)
-    bench_width = 60
-    student_width = (page_width - bench_width) / students_per_bench
-    colWidths = [bench_width] + [student_width] * students_per_bench
-
-    # Cell style for student cells
-    cell_style = ParagraphStyle(
-        'Cell',
-        parent=styles['Normal'],
-        fontSize=10,
-        leading=10
+    overflow = request.session.get("seating_overflow") or []
+    version = request.session.get("seating_version") or render_cache.content_version(arrangement,
+                                                                                      students_per_bench)
+    return render_cache.download(
+        request, version, "seating",
+        lambda: pdf_export.seating_pdf(_stored_rooms(arrangement), students_per_bench, mark=metrics.mark,
+                                       overflow=overflow),
+        "seating_arrangement.pdf", last_modified=request.session.get("seating_generated_at"),
     )
 
-    for room_index, (room, benches) in enumerate(arrangement):
-        # Room title
-        elements.append(Paragraph(f"Seating Arrangement - Room {room}", title_style))
-        elements.append(Spacer(1, 12))
-
-        # ✅ make sure bench numbers are in order
-        benches_sorted = sorted(benches, key=lambda x: x[0])
-
-        # ✅ create a SEPARATE TABLE for every 5 benches
-        for start in range(0, len(benches_sorted), 5):
-            chunk = benches_sorted[start:start + 5]
-
-            data = [headers]
-
-            for bench_num, students in chunk:
-                row = [str(bench_num)]
-                for s in students:
-                    if s:
-                        parts = s.split(' ', 1)
-                        usn = parts[0]
-                        name = parts[1] if len(parts) > 1 else ''
-                        cell_text = f"{usn}<br/>{name}" if name else usn
-                        row.append(Paragraph(cell_text, cell_style))
-                    else:
-                        row.append('')
-                data.append(row)
-
-            table = Table(data, colWidths=colWidths)
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 12),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
-                ('TOPPADDING', (0, 0), (-1, 0), 8),
-                ('LEFTPADDING', (0, 0), (-1, -1), 6),
-                ('RIGHTPADDING', (0, 0), (-1, -1), 6),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('FONTSIZE', (0, 1), (-1, -1), 10),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-            ]))
-
-            elements.append(table)
-            elements.append(Spacer(1, 16))  # space between groups of 5 benches
-
-        # Page break between rooms
-        if room_index < len(arrangement) - 1:
-            elements.append(PageBreak())
-
-    doc.build(elements)
-    buffer.seek(0)
-    response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
-    response['Content-Disposition'] = 'attachment; filename="seating_arrangement.pdf"'
-    return response
-
-
 
 # ----------------------
-# Periods and indices:
-PERIODS = [
-    ("1st", "9:00-10:00"), ("2nd", "10:00-11:00"),
-    ("Break", "11:00-11:15"),
-    ("3rd", "11:15-12:15"), ("4th", "12:15-1:15"),
-    ("Lunch", "1:15-2:30"),
-    ("5th", "2:30-3:20"), ("6th", "3:20-4:15"), ("7th", "4:15-5:00")
-]
-
-# Days used in timetable generation
-DAYS = ["Mon", "Tue", "Wed", "Thu", "Fri"]
-
-# Schedulable period indices (exclude Break and Lunch)
-SCHEDULABLE_PERIOD_INDICES = [0, 1, 3, 4, 6, 7, 8]
-
-# Lab slot tuples and lengths
-# Lab slots: prioritize morning (9:00-11:00), then mid (11:15-1:15), then afternoon (2:30-5:00)
-LAB_SLOTS = [(0, 1), (3, 4), (6, 7, 8)]
-LAB_SLOT_LENGTH = {(6, 7, 8): 3, (0, 1): 2, (3, 4): 2}
-
-# Last 3 slots reserved for labs if teacher has unplaced lab hours
-LAST_LAB_SLOTS = [6, 7, 8]
+# TIMETABLE FLOW
+def _year_labels(semester_type):
+    """Year labels based on semester type"""
+    if semester_type == "odd":
+        return {1: "3", 2: "5", 3: "7"}
+    return {1: "4", 2: "6", 3: "8"}
+
+
+def _teacher_entries(cd, name=None):
+    """Solver entries for one cleaned TeacherForm (one entry per semester handled)."""
+    name = name or cd.get("teacher_name")
+    years = cd.get("years_handling") or []
+    entries = []
+    for year in (1, 2, 3):
+        if str(year) not in years:
+            continue
+        subj = cd.get(f"subject_y{year}") or f"{name}-Y{year}"
+        hrs = cd.get(f"hours_y{year}") or 0
+        integrated = cd.get(f"integrated_y{year}") or False
+        ext = cd.get(f"external_y{year}") or False
+        # Get preference data (JSON format: {"Mon": "0", "Wed": "3", ...})
+        has_pref = cd.get(f"has_preference_y{year}") or False
+        day_time_json = cd.get(f"day_time_prefs_y{year}") or "{}"
+        try:
+            day_time_prefs = json.loads(day_time_json) if day_time_json else {}
+        except ValueError:
+            day_time_prefs = {}
+
+        if has_pref or day_time_prefs:
+            logger.debug("Preferences for %s, year %s: has_preference=%s raw=%s parsed=%s",
+                         name, year, has_pref, day_time_json, day_time_prefs)
+
+        # Allow lab-only subjects (hours may be zero) — set is_lab/is_external accordingly
+        if hrs > 0:
+            entries.append({"teacher": name, "year": year, "subject": subj, "hours": hrs, "is_integrated": integrated, "is_lab": False, "is_external_lab": ext, "remaining": hrs, "day_time_prefs": day_time_prefs if has_pref else {}})
+        elif integrated or ext or cd.get(f"lab_y{year}") or cd.get(f"external_lab_y{year}"):
+            # if hours == 0 but lab checkbox checked, include entry so lab allocation can occur
+            entries.append({"teacher": name, "year": year, "subject": subj, "hours": 0, "is_integrated": integrated, "is_lab": True if cd.get(f"lab_y{year}") else False, "is_external_lab": ext, "remaining": 0, "day_time_prefs": day_time_prefs if has_pref else {}})
+    return entries
+
+
+def _teacher_initial(entries, teacher_name):
+    """TeacherForm initial data rebuilt from a teacher's entries."""
+    initial = {"teacher_name": teacher_name, "years_handling": []}
+    for e in entries:
+        if e["teacher"] != teacher_name:
+            continue
+        year = int(e["year"])
+        initial["years_handling"].append(str(year))
+        initial[f"subject_y{year}"] = e["subject"]
+        initial[f"hours_y{year}"] = e["hours"]
+        initial[f"integrated_y{year}"] = e["is_integrated"]
+        initial[f"external_y{year}"] = e["is_external_lab"]
+        initial[f"has_preference_y{year}"] = bool(e["day_time_prefs"])
+        initial[f"day_time_prefs_y{year}"] = json.dumps(e["day_time_prefs"])
+    return initial
+
+
+def _submit_timetable_job(request, entries, year_labels, semester_type, use_cache=True, previous=None, **job_kwargs):
+    """Queue a solve for `entries` and send the user to the job page."""
+    profile = request.session.get("solver_profile") or settings.TIMETABLE_SOLVER_PROFILE
+    source = request.resolver_match.url_name if request.resolver_match else None
+    with metrics.span("job_submit"):
+        job = jobs.submit(entries, owner=request.user.pk, profile=profile, use_cache=use_cache, previous=previous,
+                          source=source, **job_kwargs)
+    request.session["timetable_job"] = job.id
+    request.session["year_labels"] = year_labels
+    request.session["semester_type"] = semester_type
+    # Results are stored server-side; drop any blob left by an older solve
+    for key in ("timetables", "unallocated", "teacher_subjects", "entries", "timetable_result"):
+        request.session.pop(key, None)
+    return redirect("timetable_job", job_id=job.id)
+
+
+def _get_timetable_result(request, teacher=None, with_entries=False, with_index=False):
+    """
+    Return the current timetable result for this session, or None.
+
+    The session references the stored result by id (see app/results.py);
+    with `teacher` only that teacher's years are loaded, together with
+    their "teacher_slots" from the solver's teacher index (None when the
+    result has no index). `with_index` adds every teacher's slots as
+    "teacher_index" and `with_entries` adds the solver input. A job
+    that just finished is picked up from the job registry. Sessions written
+    before results were stored server-side still carry the result inline.
+    """
+    year_labels = _year_labels(request.session.get("semester_type", "odd"))
+    result_id = request.session.get("timetable_result")
+    job_id = request.session.get("timetable_job")
+    if job_id:
+        job = jobs.get(job_id, owner=request.user.pk)
+        if job is None:
+            # Finished in another worker process, or before a restart
+            stored_id = results.job_result_id(job_id, request.user.pk)
+            if stored_id is not None and stored_id != result_id:
+                result_id = request.session["timetable_result"] = stored_id
+        elif job.status == jobs.DONE:
+            if job.result_id is None:
+                result = dict(job.result, entries=job.entries, year_labels=year_labels,
+                              teacher_years=results.teacher_years(job.entries))
+                if teacher is not None:
+                    result["teacher_slots"] = job.result["teacher_index"].get(teacher, [])
+                return result
+            if job.result_id != result_id:
+                result_id = request.session["timetable_result"] = job.result_id
+    if result_id:
+        loaded = results.load(result_id, request.user.pk, teacher=teacher, with_entries=with_entries,
+                              with_index=with_index)
+        if loaded is not None:
+            if loaded["version"] is None:
+                loaded["version"] = results.result_version(loaded)
+            return dict(loaded, year_labels=year_labels)
+    if request.session.get("timetables"):
+        result = {
+            "timetables": request.session["timetables"],
+            "unallocated": request.session.get("unallocated"),
+            "teacher_subjects": request.session.get("teacher_subjects", {}),
+            "year_labels": request.session.get("year_labels", {}),
+            "entries": request.session.get("entries"),
+        }
+        result["version"] = results.result_version(result)
+        return result
+    return None
 
 
-# ----------------------
-# TIMETABLE FLOW
 @login_required
 def start_timetable_input(request):
     if request.method == "POST":
@@ -303,6 +290,7 @@ def start_timetable_input(request):
         if form.is_valid():
             request.session["total_teachers"] = form.cleaned_data["total_teachers"]
             request.session["semester_type"] = form.cleaned_data["semester_type"]
+            request.session["solver_profile"] = form.cleaned_data["solver_profile"] or settings.TIMETABLE_SOLVER_PROFILE
             return redirect("timetable_teachers")
     else:
         form = TotalTeachersForm()
@@ -311,6 +299,7 @@ def start_timetable_input(request):
 
 @login_required
 @csrf_exempt
+@metrics.timed_view("timetable_teachers")
 def timetable_teachers(request):
     total = request.session.get("total_teachers")
     semester_type = request.session.get("semester_type", "odd")
@@ -325,11 +314,7 @@ def timetable_teachers(request):
     # clamp to reasonable max
     total = min(total, 50)
 
-    # Year labels based on semester type
-    if semester_type == "odd":
-        year_labels = {1: "3", 2: "5", 3: "7"}
-    else:
-        year_labels = {1: "4", 2: "6", 3: "8"}
+    year_labels = _year_labels(semester_type)
 
     # Use a safe high max_num to avoid accidental truncation.
     TeacherFormSet = formset_factory(TeacherForm, extra=0, max_num=50)
@@ -337,36 +322,13 @@ def timetable_teachers(request):
 
     # Handle regenerate request
     if request.method == "POST" and 'regenerate' in request.POST:
-        entries = request.session.get("entries")
-        if entries:
-            timetables, unallocated = allocate_timetable_with_ga(entries)
-
-            # Collect teachers and their subjects
-            teacher_subjects = {}
-            for entry in entries:
-                teacher = entry['teacher']
-                subject = entry['subject']
-                if teacher not in teacher_subjects:
-                    teacher_subjects[teacher] = []
-                if subject not in teacher_subjects[teacher]:
-                    teacher_subjects[teacher].append(subject)
-
-            # Store in session for PDF download and individual teacher views
-            request.session["timetables"] = timetables
-            request.session["unallocated"] = unallocated
-            request.session["teacher_subjects"] = teacher_subjects
-            request.session["year_labels"] = year_labels
-            request.session["semester_type"] = semester_type
-
-            return render(request, "app/timetable_result.html", {
-                "timetables": timetables,
-                "periods": PERIODS,
-                "days": DAYS,
-                "unallocated": unallocated,
-                "teacher_subjects": teacher_subjects,
-                "year_labels": year_labels,
-                "semester_type": semester_type
-            })
+        previous = _get_timetable_result(request, with_entries=True, with_index=True)
+        if previous and previous.get("entries"):
+            # A fresh solve, warm-started from the timetable on screen and
+            # required to differ from it
+            return _submit_timetable_job(request, previous["entries"], year_labels, semester_type,
+                                         use_cache=False, previous=previous["timetables"],
+                                         previous_index=previous.get("teacher_index"))
         else:
             return redirect("timetable_start")
 
@@ -380,108 +342,17 @@ def timetable_teachers(request):
                 "formset": formset, "total": total,
                 "error": "Formset did not bind to POST. Ensure the template includes formset.management_form and uses the correct prefix ('teachers')."
             })
-        if formset.is_valid():
-            entries = []
-            for f in formset:
-                # Only attempt to read cleaned_data if the form had data.
-                cd = getattr(f, "cleaned_data", None) or {}
-                name = cd.get("teacher_name")
-                years = cd.get("years_handling") or []
-                if "1" in years:
-                    subj = cd.get("subject_y1") or f"{name}-Y1"
-                    hrs = cd.get("hours_y1") or 0
-                    integrated = cd.get("integrated_y1") or False
-                    ext = cd.get("external_y1") or False
-                    # Get preference data (JSON format: {"Mon": "0", "Wed": "3", ...})
-                    has_pref = cd.get("has_preference_y1") or False
-                    day_time_json = cd.get("day_time_prefs_y1") or "{}"
-                    import json
-                    try:
-                        day_time_prefs = json.loads(day_time_json) if day_time_json else {}
-                    except:
-                        day_time_prefs = {}
-                    
-                    # DEBUG: Print what we received
-                    if has_pref or day_time_prefs:
-                        print(f"\n[DEBUG] Preference data for {name} - Year 1:")
-                        print(f"   has_preference_y1: {has_pref}")
-                        print(f"   day_time_prefs_y1 JSON: {day_time_json}")
-                        print(f"   Parsed preferences: {day_time_prefs}")
-                    
-                    # Allow lab-only subjects (hours may be zero) — set is_lab/is_external accordingly
-                    if hrs > 0:
-                        entries.append({"teacher": name, "year": 1, "subject": subj, "hours": hrs, "is_integrated": integrated, "is_lab": False, "is_external_lab": ext, "remaining": hrs, "day_time_prefs": day_time_prefs if has_pref else {}})
-                    else:
-                        # if hours == 0 but lab checkbox checked, include entry so lab allocation can occur
-                        if integrated or ext or cd.get("lab_y1") or cd.get("external_lab_y1"):
-                            entries.append({"teacher": name, "year": 1, "subject": subj, "hours": 0, "is_integrated": integrated, "is_lab": True if cd.get("lab_y1") else False, "is_external_lab": ext, "remaining": 0, "day_time_prefs": day_time_prefs if has_pref else {}})
-                if "2" in years:
-                    subj = cd.get("subject_y2") or f"{name}-Y2"
-                    hrs = cd.get("hours_y2") or 0
-                    integrated = cd.get("integrated_y2") or False
-                    ext = cd.get("external_y2") or False
-                    # Get preference data (JSON format)
-                    has_pref = cd.get("has_preference_y2") or False
-                    day_time_json = cd.get("day_time_prefs_y2") or "{}"
-                    try:
-                        day_time_prefs = json.loads(day_time_json) if day_time_json else {}
-                    except:
-                        day_time_prefs = {}
-                    if hrs > 0:
-                        entries.append({"teacher": name, "year": 2, "subject": subj, "hours": hrs, "is_integrated": integrated, "is_lab": False, "is_external_lab": ext, "remaining": hrs, "day_time_prefs": day_time_prefs if has_pref else {}})
-                    else:
-                        if integrated or ext or cd.get("lab_y2") or cd.get("external_lab_y2"):
-                            entries.append({"teacher": name, "year": 2, "subject": subj, "hours": 0, "is_integrated": integrated, "is_lab": True if cd.get("lab_y2") else False, "is_external_lab": ext, "remaining": 0, "day_time_prefs": day_time_prefs if has_pref else {}})
-                if "3" in years:
-                    subj = cd.get("subject_y3") or f"{name}-Y3"
-                    hrs = cd.get("hours_y3") or 0
-                    integrated = cd.get("integrated_y3") or False
-                    ext = cd.get("external_y3") or False
-                    # Get preference data (JSON format)
-                    has_pref = cd.get("has_preference_y3") or False
-                    day_time_json = cd.get("day_time_prefs_y3") or "{}"
-                    try:
-                        day_time_prefs = json.loads(day_time_json) if day_time_json else {}
-                    except:
-                        day_time_prefs = {}
-                    if hrs > 0:
-                        entries.append({"teacher": name, "year": 3, "subject": subj, "hours": hrs, "is_integrated": integrated, "is_lab": False, "is_external_lab": ext, "remaining": hrs, "day_time_prefs": day_time_prefs if has_pref else {}})
-                    else:
-                        if integrated or ext or cd.get("lab_y3") or cd.get("external_lab_y3"):
-                            entries.append({"teacher": name, "year": 3, "subject": subj, "hours": 0, "is_integrated": integrated, "is_lab": True if cd.get("lab_y3") else False, "is_external_lab": ext, "remaining": 0, "day_time_prefs": day_time_prefs if has_pref else {}})
-
-            # Store entries in session for regeneration
-            request.session["entries"] = entries
-            
-            # call allocation (defined in later parts)
-            timetables, unallocated = allocate_timetable_with_ga(entries)
-
-            # Collect teachers and their subjects
-            teacher_subjects = {}
-            for entry in entries:
-                teacher = entry['teacher']
-                subject = entry['subject']
-                if teacher not in teacher_subjects:
-                    teacher_subjects[teacher] = []
-                if subject not in teacher_subjects[teacher]:
-                    teacher_subjects[teacher].append(subject)
-
-            # Store in session for PDF download and individual teacher views
-            request.session["timetables"] = timetables
-            request.session["unallocated"] = unallocated
-            request.session["teacher_subjects"] = teacher_subjects
-            request.session["year_labels"] = year_labels
-            request.session["semester_type"] = semester_type
-
-            return render(request, "app/timetable_result.html", {
-                "timetables": timetables,
-                "periods": PERIODS,
-                "days": DAYS,
-                "unallocated": unallocated,
-                "teacher_subjects": teacher_subjects,
-                "year_labels": year_labels,
-                "semester_type": semester_type
-            })
+        with metrics.span("formset_validation"):
+            valid = formset.is_valid()
+        if valid:
+            with metrics.span("entry_extraction"):
+                entries = []
+                for f in formset:
+                    # Only attempt to read cleaned_data if the form had data.
+                    cd = getattr(f, "cleaned_data", None) or {}
+                    entries.extend(_teacher_entries(cd))
+
+            return _submit_timetable_job(request, entries, year_labels, semester_type)
         else:
             # show form errors to user for easier debugging (no debug prints)
             error_list = []
@@ -491,41 +362,140 @@ def timetable_teachers(request):
                         error_list.append(f"{field}: {error}")
             for error in formset.non_form_errors():
                 error_list.append(str(error))
-            return render(request, "app/timetable_teachers_raw.html", {"formset": formset, "total": total, "errors": error_list, "year_labels": year_labels, "semester_type": semester_type})
+            with metrics.span("render"):
+                return render(request, "app/timetable_teachers_raw.html", {"formset": formset, "total": total, "errors": error_list, "year_labels": year_labels, "semester_type": semester_type})
     else:
         # create an unbound formset with exactly `total` empty forms
         formset = TeacherFormSet(prefix=formset_prefix, initial=[{} for _ in range(total)], form_kwargs={'semester_type': semester_type})
 
-    return render(request, "app/timetable_teachers_raw.html", {"formset": formset, "total": total, "year_labels": year_labels, "semester_type": semester_type})
+    with metrics.span("render"):
+        return render(request, "app/timetable_teachers_raw.html", {"formset": formset, "total": total, "year_labels": year_labels, "semester_type": semester_type})
+
+def metrics_view(request):
+    """Prometheus scrape endpoint, see metrics.scrape_allowed for who may read it."""
+    if not metrics.scrape_allowed(request):
+        return HttpResponse(status=403)
+    body, content_type = metrics.exposition()
+    return HttpResponse(body, content_type=content_type)
+
 
 @login_required
-def teacher_timetable(request, teacher_name):
-    timetables = request.session.get("timetables")
-    teacher_subjects = request.session.get("teacher_subjects", {})
-    year_labels = request.session.get("year_labels", {})
-    if not timetables or teacher_name not in teacher_subjects:
+@metrics.timed_view("timetable_job")
+def timetable_job(request, job_id):
+    job = jobs.get(job_id, owner=request.user.pk)
+    if job is None:
+        # Not in this process's registry: the job runs in another worker, or
+        # finished there or before a restart and its result is in the database
+        result_id = results.job_result_id(job_id, request.user.pk)
+        result = results.load(result_id, request.user.pk) if result_id is not None else None
+        if result is not None:
+            request.session["timetable_result"] = result_id
+            return _render_timetable_result(request, result)
+        state = jobs.get_state(job_id, owner=request.user.pk)
+        if state is None or state.status == jobs.DONE:
+            return redirect("timetable_start")
+        return render(request, "app/timetable_pending.html", {"job": state})
+    if job.status != jobs.DONE:
+        return render(request, "app/timetable_pending.html", {"job": job})
+
+    if job.result_id is not None:
+        request.session["timetable_result"] = job.result_id
+    return _render_timetable_result(request, job.result)
+
+
+def _render_timetable_result(request, result):
+    with metrics.span("render"):
+        return render(request, "app/timetable_result.html", {
+            "timetables": result["timetables"],
+            "periods": PERIODS,
+            "days": DAYS,
+            "unallocated": result["unallocated"],
+            "teacher_subjects": result["teacher_subjects"],
+            "year_labels": _year_labels(request.session.get("semester_type", "odd")),
+            "semester_type": request.session.get("semester_type", "odd"),
+            "solver_stats": result["stats"],
+            "result_version": result["version"] or results.result_version(result),
+        })
+
+
+def _stored_job_status(request, job_id):
+    # Status of a job missing from the registry: from its state row, or for
+    # jobs from before those rows existed, from its stored result
+    state = jobs.get_state(job_id, owner=request.user.pk)
+    if state is not None:
+        return state, {"id": job_id, "status": state.status, "error": state.error or None, "progress": None}
+    if results.job_result_id(job_id, request.user.pk) is not None:
+        return None, {"id": job_id, "status": jobs.DONE, "error": None, "progress": None}
+    return None, None
+
+
+@login_required
+def timetable_job_status(request, job_id):
+    job = jobs.get(job_id, owner=request.user.pk)
+    if job is None:
+        _, stored = _stored_job_status(request, job_id)
+        if stored is None:
+            return JsonResponse({"error": "Unknown job"}, status=404)
+        return JsonResponse(stored)
+    return JsonResponse({"id": job.id, "status": job.status, "error": job.error, "progress": job.progress})
+
+
+@login_required
+@require_POST
+def timetable_job_cancel(request, job_id):
+    job = jobs.get(job_id, owner=request.user.pk)
+    if job is None:
+        state, stored = _stored_job_status(request, job_id)
+        if stored is None:
+            return JsonResponse({"error": "Unknown job"}, status=404)
+        cancelled = jobs.cancel_elsewhere(state) if state is not None else False
+        return JsonResponse({"id": job_id, "status": state.status if state is not None else stored["status"],
+                             "cancelled": cancelled})
+    cancelled = job.cancel()
+    return JsonResponse({"id": job.id, "status": job.status, "cancelled": cancelled})
+
+
+@login_required
+def edit_teacher(request, teacher_name):
+    """Change one teacher's entries and re-solve only around that teacher."""
+    result = _get_timetable_result(request, with_entries=True, with_index=True)
+    entries = result.get("entries") if result else None
+    if not entries or teacher_name not in result["teacher_subjects"]:
         return redirect("timetable_teachers")
+    semester_type = request.session.get("semester_type", "odd")
+    year_labels = _year_labels(semester_type)
+    EditFormSet = formset_factory(TeacherForm, extra=0, max_num=1)
 
-    # Filter timetables to show only this teacher's assignments
-    teacher_timetables = {}
-    for year, days_dict in timetables.items():
-        teacher_timetables[year] = {}
-        for day, slots in days_dict.items():
-            teacher_slots = []
-            for slot in slots:
-                # Exact match check to avoid substring issues (e.g. "Math" in "Advanced Math")
-                is_match = False
-                if slot:
-                    for subject in teacher_subjects[teacher_name]:
-                        if slot == subject or slot == f"{subject} - Lab":
-                            is_match = True
-                            break
-                
-                if is_match:
-                    teacher_slots.append(slot)
-                else:
-                    teacher_slots.append(None)
-            teacher_timetables[year][day] = teacher_slots
+    if request.method == "POST":
+        formset = EditFormSet(request.POST, prefix='teachers', form_kwargs={'semester_type': semester_type})
+        if formset.is_valid() and formset.forms:
+            cd = formset.forms[0].cleaned_data
+            changed = _teacher_entries(cd, name=teacher_name)
+            new_entries = [e for e in entries if e["teacher"] != teacher_name] + changed
+            years = {int(e["year"]) for e in entries + changed if e["teacher"] == teacher_name}
+            return _submit_timetable_job(request, new_entries, year_labels, semester_type,
+                                         use_cache=False, previous=result["timetables"],
+                                         previous_index=result.get("teacher_index"),
+                                         changed_teacher=teacher_name, changed_years=sorted(years))
+    else:
+        formset = EditFormSet(prefix='teachers', initial=[_teacher_initial(entries, teacher_name)],
+                              form_kwargs={'semester_type': semester_type})
+
+    return render(request, "app/timetable_teachers_raw.html", {
+        "formset": formset, "total": 1, "year_labels": year_labels, "semester_type": semester_type,
+        "editing_teacher": teacher_name
+    })
+
+
+@login_required
+def teacher_timetable(request, teacher_name):
+    result = _get_timetable_result(request, teacher=teacher_name)
+    if not result or teacher_name not in result["teacher_subjects"]:
+        return redirect("timetable_teachers")
+    teacher_subjects = result["teacher_subjects"]
+    year_labels = result["year_labels"]
+    teacher_timetables = results.teacher_grids(result["timetables"], teacher_subjects[teacher_name],
+                                               result.get("teacher_slots"))
 
     return render(request, "app/teacher_timetable.html", {
         "teacher_name": teacher_name,
@@ -533,758 +503,69 @@ def teacher_timetable(request, teacher_name):
         "periods": PERIODS,
         "days": DAYS,
         "subjects": teacher_subjects[teacher_name],
-        "year_labels": year_labels
+        "year_labels": year_labels,
+        "semester_type": request.session.get("semester_type", "odd"),
+        "result_version": result["version"],
     })
 
 
 @login_required
+@metrics.timed_view("download_timetable_pdf")
 def download_timetable_pdf(request):
-    timetables = request.session.get("timetables")
-    unallocated = request.session.get("unallocated")
-    year_labels = request.session.get("year_labels", {})
-    teacher_subjects = request.session.get("teacher_subjects", {})
-    if not timetables:
+    with metrics.span("result_lookup"):
+        result = _get_timetable_result(request)
+    if not result:
         return redirect("timetable_start")
-
-    # Generate PDF matching HTML layout exactly
-    buffer = BytesIO()
-    # Use minimal margins to maximize space
-    doc = SimpleDocTemplate(buffer, pagesize=letter, leftMargin=10, rightMargin=10, topMargin=10, bottomMargin=10)
-    elements = []
-    styles = getSampleStyleSheet()
-
-    # Centered title, smaller
-    title_style = styles['Title']
-    title_style.alignment = 1  # Center
-    title_style.fontSize = 14
-    elements.append(Paragraph("Generated Timetables", title_style))
-    elements.append(Spacer(1, 6))  # Smaller spacer
-
-    # Warning box if unallocated, smaller
-    if unallocated:
-        warning_text = "<strong>Warning — some hours couldn't be scheduled:</strong><br/>"
-        for u in unallocated:
-            theory_rem = u.get('theory_remaining', 0)
-            lab_rem = u.get('lab_remaining', 0)
-            warning_text += f"• {u['teacher']} (Year {u['year']}) — {u['subject']} — theory: {theory_rem}, lab: {lab_rem} — int: {'Y' if u['is_integrated'] else 'N'} — ext: {'Y' if u['is_external_lab'] else 'N'}<br/>"
-        warning_style = ParagraphStyle('Warning', parent=styles['Normal'], backColor=colors.HexColor('#ffe6e6'), borderColor=colors.HexColor('#ff9999'), borderWidth=1, borderPadding=5, spaceAfter=10, fontSize=8)
-        elements.append(Paragraph(warning_text, warning_style))
-        elements.append(Spacer(1, 6))
-
-    # Teacher boxes: smaller
-    if teacher_subjects:
-        teacher_data = []
-        row = []
-        for teacher, subjects in teacher_subjects.items():
-            box_text = f"<strong>{teacher}</strong><br/>{', '.join(subjects)}"
-            box_style = ParagraphStyle('TeacherBox', parent=styles['Normal'], backColor=colors.HexColor('#e9f7ef'), borderColor=colors.HexColor('#27ae60'), borderWidth=1, borderPadding=5, alignment=1, fontSize=8)
-            row.append(Paragraph(box_text, box_style))
-            if len(row) == 3:  # 3 boxes per row
-                teacher_data.append(row)
-                row = []
-        if row:
-            while len(row) < 3:
-                row.append('')  # Pad row
-            teacher_data.append(row)
-        teacher_table = Table(teacher_data, colWidths=[180]*3)
-        teacher_table.setStyle(TableStyle([('VALIGN', (0, 0), (-1, -1), 'MIDDLE')]))
-        elements.append(teacher_table)
-        elements.append(Spacer(1, 10))
-
-    # Timetables per semester
-    for year, days_dict in timetables.items():
-        sem_label = year_labels.get(year, f"Year {year}")
-        # Semester heading, smaller
-        heading_style = styles['Heading3']
-        heading_style.borderWidth = 0
-        heading_style.borderColor = colors.HexColor('#ddd')
-        heading_style.borderPadding = 2
-        heading_style.spaceAfter = 5
-        heading_style.fontSize = 12
-        elements.append(Paragraph(f"Semester {sem_label}", heading_style))
-
-        # Table data
-        data = []
-        # Header row, smaller font
-        header = ['Day']
-        for period_name, time in PERIODS:
-            header.append(f"{period_name} {time}")
-        data.append(header)
-
-        # Data rows
-        for day in DAYS:
-            row = [day]
-            slots = days_dict.get(day, [None] * len(PERIODS))
-            for slot in slots:
-                cell_text = slot if slot else '-'
-                row.append(cell_text)
-            data.append(row)
-
-        # Calculate column widths to fit the page (letter: 612 points, margins 10 each, usable ~592)
-        page_width = 592
-        num_cols = 10  # Day + 9 periods
-        col_width = page_width / num_cols
-        colWidths = [col_width] * num_cols
-
-        # Create table with fixed widths
-        table = Table(data, colWidths=colWidths)
-        table_styles = [
-            # Header: background #f2f2f2, bold, center, tiny font
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f2f2f2')),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('FONTSIZE', (0, 0), (-1, 0), 6),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 1),
-            ('TOPPADDING', (0, 0), (-1, 0), 1),
-            ('LEFTPADDING', (0, 0), (-1, -1), 1),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 1),
-            # Body: tiny font
-            ('FONTSIZE', (0, 1), (-1, -1), 4),
-            # Grid: thin
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#ddd')),
-        ]
-
-        # Apply lab highlighting
-        for row_idx in range(1, len(data)):  # Skip header
-            for col_idx in range(1, len(data[row_idx])):  # Skip 'Day' column
-                slot = data[row_idx][col_idx]
-                if slot and ' - Lab' in slot:
-                    table_styles.append(('BACKGROUND', (col_idx, row_idx), (col_idx, row_idx), colors.lightblue))
-
-        table.setStyle(TableStyle(table_styles))
-        elements.append(table)
-        elements.append(Spacer(1, 10))  # Smaller spacer
-
-    doc.build(elements)
-    buffer.seek(0)
-    response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
-    response['Content-Disposition'] = 'attachment; filename="timetable.pdf"'
-    return response
+    return render_cache.download(
+        request, result["version"], ["timetable", result["year_labels"]],
+        lambda: pdf_export.timetable_pdf(result["timetables"], result["unallocated"], result["teacher_subjects"],
+                                         result["year_labels"], mark=metrics.mark),
+        "timetable.pdf", last_modified=result.get("last_modified"),
+    )
 
 
 @login_required
+@metrics.timed_view("download_teacher_timetable_pdf")
 def download_teacher_timetable_pdf(request, teacher_name):
-    timetables = request.session.get("timetables")
-    teacher_subjects = request.session.get("teacher_subjects", {})
-    year_labels = request.session.get("year_labels", {})
-    if not timetables or teacher_name not in teacher_subjects:
+    with metrics.span("result_lookup"):
+        result = _get_timetable_result(request, teacher=teacher_name)
+    if not result or teacher_name not in result["teacher_subjects"]:
         return redirect("timetable_teachers")
+    subjects = result["teacher_subjects"][teacher_name]
 
-    # Filter timetables to show only this teacher's assignments
-    teacher_timetables = {}
-    for year, days_dict in timetables.items():
-        teacher_timetables[year] = {}
-        for day, slots in days_dict.items():
-            teacher_slots = []
-            for slot in slots:
-                # Exact match check to avoid substring issues
-                is_match = False
-                if slot:
-                    for subject in teacher_subjects[teacher_name]:
-                        if slot == subject or slot == f"{subject} - Lab":
-                            is_match = True
-                            break
-                
-                if is_match:
-                    teacher_slots.append(slot)
-                else:
-                    teacher_slots.append(None)
-            teacher_timetables[year][day] = teacher_slots
-
-    # Generate PDF matching the HTML layout and styles
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    elements = []
-    styles = getSampleStyleSheet()
-
-    # Title
-    elements.append(Paragraph(f"{teacher_name}'s Timetable", styles['Title']))
-
-    # Subjects
-    subjects_str = ", ".join(teacher_subjects[teacher_name])
-    elements.append(Paragraph(f"Subjects: {subjects_str}", styles['Normal']))
-    elements.append(Paragraph("", styles['Normal']))  # Spacer
-
-    for year, days_dict in teacher_timetables.items():
-        # Year heading
-        sem_label = year_labels.get(year, f"Year {year}")
-        elements.append(Paragraph(f"Semester {sem_label}", styles['Heading1']))
-
-        # Build table data: rows for each day, columns for Day + periods
-        data = []
-        # Header row
-        header = ['Day']
-        for period_name, time in PERIODS:
-            header.append(f"{period_name}\n{time}")
-        data.append(header)
-
-        # Data rows for each day
-        for day in DAYS:
-            row = [day]
-            slots = days_dict.get(day, [None] * len(PERIODS))
-            for slot in slots:
-                row.append(slot if slot else '-')
-            data.append(row)
-
-        # Create table
-        table = Table(data)
-
-        # Define styles to match HTML CSS
-        table_styles = [
-            # Header row: background #f2f2f2, bold, center
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f2f2f2')),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
-            ('TOPPADDING', (0, 0), (-1, 0), 8),
-            ('LEFTPADDING', (0, 0), (-1, -1), 8),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 8),
-            # Grid: 1px solid #ddd
-            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#ddd')),
-        ]
-
-        # Apply cell-specific styles for body rows
-        for row_idx in range(1, len(data)):  # Skip header
-            for col_idx in range(1, len(data[row_idx])):  # Skip 'Day' column
-                slot = data[row_idx][col_idx]
-                if slot and slot != '-' and any(subject in slot for subject in teacher_subjects[teacher_name]):
-                    # Subject highlight: background #e9f7ef, bold
-                    table_styles.append(('BACKGROUND', (col_idx, row_idx), (col_idx, row_idx), colors.HexColor('#e9f7ef')))
-                    table_styles.append(('FONTNAME', (col_idx, row_idx), (col_idx, row_idx), 'Helvetica-Bold'))
-                elif not slot or slot == '-':
-                    # Empty slot: background #f9f9f9, color #999
-                    table_styles.append(('BACKGROUND', (col_idx, row_idx), (col_idx, row_idx), colors.HexColor('#f9f9f9')))
-                    table_styles.append(('TEXTCOLOR', (col_idx, row_idx), (col_idx, row_idx), colors.HexColor('#999')))
-
-        table.setStyle(TableStyle(table_styles))
-        elements.append(table)
-        elements.append(Paragraph("", styles['Normal']))  # Spacer
-
-    doc.build(elements)
-    buffer.seek(0)
-    response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="{teacher_name}_timetable.pdf"'
-    return response
-
+    def render_pdf():
+        teacher_timetables = results.teacher_grids(result["timetables"], subjects, result.get("teacher_slots"))
+        return pdf_export.teacher_timetable_pdf(teacher_name, subjects, teacher_timetables, result["year_labels"],
+                                                mark=metrics.mark)
 
-# ----------------------
-# TIMETABLE ALLOCATION WITH GOOGLE OR-TOOLS (CP-SAT)
-# ----------------------
-def allocate_timetable_with_ga(entries_input):
-    """
-    Allocates timetable using Constraint Programming (Google OR-Tools).
-    Guarantees strict adherence to:
-    1. Teacher availability (no double booking)
-    2. Rest periods (no consecutive classes)
-    3. Lab block validity
-    4. Single class per slot per year
-    """
-    import copy
-    from ortools.sat.python import cp_model
-    
-    entries = copy.deepcopy(entries_input)
-    model = cp_model.CpModel()
-
-    # --- Constants & Data Prep ---
-    PERIODS = [0, 1, 2, 3, 4, 5, 6, 7, 8]  # Internal indices
-    TEACHING_PERIODS = [0, 1, 3, 4, 6, 7, 8] # Periods where classes can happen
-    DAYS = ["Mon", "Tue", "Wed", "Thu", "Fri"]
-    
-    # Map periods to next rest period
-    # 0->1, 1->3, 3->4, 4->6, 6->7, 7->8, 8->None
-    NEXT_REST_MAP = {0: 1, 1: 3, 3: 4, 4: 6, 6: 7, 7: 8, 8: None}
-
-    # Extract Years and Teachers
-    years = sorted(list(set(int(e.get("year", 1)) for e in entries)))
-    teachers = sorted(list(set(e['teacher'] for e in entries)))
-    
-    # Organize entries by ID for easy access
-    # Split entries into Theory and Lab components
-    theory_reqs = [] # (entry_idx, year, teacher, subject, hours, prefs)
-    lab_reqs = []    # (entry_idx, year, teacher, subject, duration, prefs)
-    
-    for i, e in enumerate(entries):
-        y = int(e.get("year", 1))
-        t = e['teacher']
-        s = e['subject']
-        prefs = e.get('day_time_prefs', {})
-        
-        # Theory Component
-        # IMPORTANT: For integrated subjects (with or without external), 
-        # the 'hours' field represents ONLY theory hours.
-        # Labs are allocated separately and do NOT consume theory hours.
-        th_hours = 0
-        if e.get("is_integrated") or e.get("is_integrated") and e.get("is_external_lab"):
-            # Integrated subjects: 'hours' = theory hours only
-            th_hours = int(e.get("hours", 0))
-        elif not (e.get("is_lab") or e.get("is_external_lab")):
-            # Pure theory subjects (no lab component)
-            th_hours = int(e.get("hours", 0))
-        # Note: For pure lab subjects (is_lab=True but not integrated), 
-        # th_hours stays 0 as all time is in lab
-        
-        if th_hours > 0:
-            theory_reqs.append({
-                'id': i, 'year': y, 'teacher': t, 'subject': s, 
-                'hours': th_hours, 'prefs': prefs
-            })
-
-        # Lab Component
-        # Labs are allocated if: is_lab OR is_external_lab OR is_integrated
-        # For integrated subjects, lab allocation is INDEPENDENT of theory hours
-        is_lab = e.get("is_lab") or e.get("is_external_lab") or e.get("is_integrated")
-        if is_lab:
-            lab_dur = 3 if e.get("is_external_lab") else 2
-            lab_reqs.append({
-                'id': i, 'year': y, 'teacher': t, 'subject': s, 
-                'duration': lab_dur, 'prefs': prefs,
-                'is_integrated': e.get("is_integrated", False),
-                'is_external_lab': e.get("is_external_lab", False)
-            })
+    return render_cache.download(
+        request, result["version"], ["teacher", teacher_name, result["year_labels"]], render_pdf,
+        pdf_export.teacher_filename(teacher_name), last_modified=result.get("last_modified"),
+    )
 
-    # --- Variables ---
-    # theory_vars[(req_idx, day, period)] = bool
-    theory_vars = {} 
-    # lab_vars[(req_idx, day, start_period)] = bool
-    lab_vars = {}
-    
-    # 1. Create Theory Variables
-    for r_idx, req in enumerate(theory_reqs):
-        for d in DAYS:
-            for p in TEACHING_PERIODS:
-                theory_vars[(r_idx, d, p)] = model.NewBoolVar(f'T_{r_idx}_{d}_{p}')
-
-    # 2. Create Lab Variables
-    for r_idx, req in enumerate(lab_reqs):
-        dur = req['duration']
-        valid_starts = []
-        if dur == 2:
-            valid_starts = [0, 3, 6, 7]
-        elif dur == 3:
-            valid_starts = [0, 3, 6]
-            
-        for d in DAYS:
-            for p in valid_starts:
-                lab_vars[(r_idx, d, p)] = model.NewBoolVar(f'L_{r_idx}_{d}_{p}')
-
-    # --- Constraints ---
-
-    # C1. Subject Hours (Theory)
-    for r_idx, req in enumerate(theory_reqs):
-        model.Add(sum(theory_vars[(r_idx, d, p)] for d in DAYS for p in TEACHING_PERIODS) == req['hours'])
-
-    # C2. Subject Hours (Lab) - Exactly one slot per lab requirement
-    for r_idx, req in enumerate(lab_reqs):
-        dur = req['duration']
-        valid_starts = []
-        if dur == 2:
-            valid_starts = [0, 3, 6, 7]
-        elif dur == 3:
-            valid_starts = [0, 3, 6]
-            
-        if valid_starts:
-            model.Add(sum(lab_vars[(r_idx, d, p)] for d in DAYS for p in valid_starts) == 1)
-
-    # C3. Single Class per Year/Day/Period
-    for y in years:
-        for d in DAYS:
-            for p in TEACHING_PERIODS:
-                # Gather all theory vars for this y,d,p
-                active_vars = []
-                for r_idx, req in enumerate(theory_reqs):
-                    if req['year'] == y:
-                        active_vars.append(theory_vars[(r_idx, d, p)])
-                
-                # Gather all lab vars that COVER this p
-                for r_idx, req in enumerate(lab_reqs):
-                    if req['year'] == y:
-                        dur = req['duration']
-                        valid_starts = [0, 3, 6, 7] if dur == 2 else [0, 3, 6]
-                        for start in valid_starts:
-                            covers_p = False
-                            if start == 0:
-                                if dur == 2: covers_p = (p in [0, 1])
-                                else: covers_p = (p in [0, 1, 3]) 
-                            elif start == 3:
-                                if dur == 2: covers_p = (p in [3, 4])
-                                else: covers_p = (p in [3, 4, 6])
-                            elif start == 6:
-                                if dur == 2: covers_p = (p in [6, 7])
-                                else: covers_p = (p in [6, 7, 8])
-                            elif start == 7: 
-                                covers_p = (p in [7, 8])
-                                
-                            if covers_p:
-                                active_vars.append(lab_vars[(r_idx, d, start)])
-                
-                model.Add(sum(active_vars) <= 1)
-
-    # C5. Integrated + External Labs MUST be in 2:30-5:00 PM slot (period 6 start only)
-    # If a subject is both integrated AND external, its lab can ONLY start at period 6
-    for r_idx, req in enumerate(lab_reqs):
-        if req.get('is_integrated') and req.get('is_external_lab'):
-            # This lab MUST start at period 6 (the 2:30-5:00 slot)
-            # Force all other start periods to be 0
-            valid_starts = [0, 3, 6, 7] if req['duration'] == 2 else [0, 3, 6]
-            for d in DAYS:
-                for p in valid_starts:
-                    if p != 6:  # Only period 6 is allowed
-                        model.Add(lab_vars[(r_idx, d, p)] == 0)
-    
-    # C5b. Integrated-ONLY Labs (not external) MUST be in morning/midday slots
-    # If a subject is integrated but NOT external, its lab can ONLY start at period 0 or 3
-    # (9:00-11:00 or 11:15-1:15, excluding the afternoon 2:30-5:00 slot)
-    for r_idx, req in enumerate(lab_reqs):
-        if req.get('is_integrated') and not req.get('is_external_lab'):
-            # This lab can ONLY start at period 0 or 3 (morning/midday slots)
-            # Force afternoon start periods (6, 7) to be 0
-            valid_starts = [0, 3, 6, 7] if req['duration'] == 2 else [0, 3, 6]
-            for d in DAYS:
-                for p in valid_starts:
-                    if p not in [0, 3]:  # Only periods 0 and 3 are allowed
-                        model.Add(lab_vars[(r_idx, d, p)] == 0)
-    
-    # C6. Only one theory class per subject per day
-    # Group theory_reqs by (year, subject)
-    subject_theory_map = {}  # (year, subject) -> [list of r_idx]
-    for r_idx, req in enumerate(theory_reqs):
-        key = (req['year'], req['subject'])
-        if key not in subject_theory_map:
-            subject_theory_map[key] = []
-        subject_theory_map[key].append(r_idx)
-    
-    # For each subject, ensure at most 1 theory class per day
-    for (year, subject), req_indices in subject_theory_map.items():
-        for d in DAYS:
-            # Sum all theory vars for this subject on this day
-            day_vars = []
-            for r_idx in req_indices:
-                for p in TEACHING_PERIODS:
-                    day_vars.append(theory_vars[(r_idx, d, p)])
-            # At most 1 theory class for this subject on this day
-            model.Add(sum(day_vars) <= 1)
-
-    # C6b. Only ONE lab per day per year
-    # For each year and each day, at most one lab can be scheduled
-    for y in years:
-        for d in DAYS:
-            # Collect all lab variables for this year on this day
-            day_lab_vars = []
-            for r_idx, req in enumerate(lab_reqs):
-                if req['year'] == y:
-                    # Add all possible start times for this lab on this day
-                    valid_starts = [0, 3, 6, 7] if req['duration'] == 2 else [0, 3, 6]
-                    for start in valid_starts:
-                        day_lab_vars.append(lab_vars[(r_idx, d, start)])
-            
-            # Constraint: At most ONE lab on this day for this year
-            if day_lab_vars:  # Only add if there are lab variables
-                print(f"[DEBUG] C6b: Year {y} Day {d} - Enforcing max 1 lab")
-                model.Add(sum(day_lab_vars) <= 1)
-
-    # C4. Teacher Availability & Rest Periods
-    for t in teachers:
-        for d in DAYS:
-            for p in TEACHING_PERIODS:
-                # 1. Is teacher busy at p?
-                busy_vars = []
-                
-                # Theory
-                for r_idx, req in enumerate(theory_reqs):
-                    if req['teacher'] == t:
-                        busy_vars.append(theory_vars[(r_idx, d, p)])
-                
-                # Labs
-                for r_idx, req in enumerate(lab_reqs):
-                    if req['teacher'] == t:
-                        dur = req['duration']
-                        valid_starts = [0, 3, 6, 7] if dur == 2 else [0, 3, 6]
-                        for start in valid_starts:
-                            covers_p = False
-                            if start == 0: covers_p = (p in ([0, 1] if dur==2 else [0, 1, 3]))
-                            elif start == 3: covers_p = (p in ([3, 4] if dur==2 else [3, 4, 6]))
-                            elif start == 6: covers_p = (p in ([6, 7] if dur==2 else [6, 7, 8]))
-                            elif start == 7: covers_p = (p in [7, 8])
-                            
-                            if covers_p:
-                                busy_vars.append(lab_vars[(r_idx, d, start)])
-                
-                # Constraint: Teacher busy at most once at p
-                is_busy = model.NewBoolVar(f'Busy_{t}_{d}_{p}')
-                model.Add(sum(busy_vars) == is_busy)
-                
-                # 2. Rest Period Constraint
-                # If is_busy is true, then teacher CANNOT be busy at next_period
-                # unless it's part of the SAME lab block.
-                # But we handle this by checking who forces a rest.
-                
-                rest_vars = [] # Variables that force a rest at 'p'
-                
-                # Theory at 'prev' forces rest at 'p' if NEXT_REST_MAP[prev] == p
-                for prev in TEACHING_PERIODS:
-                    if NEXT_REST_MAP.get(prev) == p:
-                        for r_idx, req in enumerate(theory_reqs):
-                            if req['teacher'] == t:
-                                rest_vars.append(theory_vars[(r_idx, d, prev)])
-                
-                # Lab ending before 'p' forces rest at 'p'
-                for r_idx, req in enumerate(lab_reqs):
-                    if req['teacher'] == t:
-                        dur = req['duration']
-                        valid_starts = [0, 3, 6, 7] if dur == 2 else [0, 3, 6]
-                        for start in valid_starts:
-                            last_p = -1
-                            if start == 0: last_p = 1 if dur==2 else 3
-                            elif start == 3: last_p = 4 if dur==2 else 6
-                            elif start == 6: last_p = 7 if dur==2 else 8
-                            elif start == 7: last_p = 8
-                            
-                            if NEXT_REST_MAP.get(last_p) == p:
-                                rest_vars.append(lab_vars[(r_idx, d, start)])
-
-                # Constraint: If any variable in rest_vars is True, then is_busy must be False
-                model.Add(sum(rest_vars) + is_busy <= 1)
-
-    # C7. Morning Periods Must Be Filled (DISABLED - Too Strict)
-    # This constraint required ALL morning periods to be filled on EVERY day,
-    # which requires at least 15 periods per semester (3 periods × 5 days).
-    # Users with fewer hours would get infeasible solutions.
-    # Commenting out to allow flexible timetable generation.
-    
-    # MORNING_PERIODS = [0, 1, 3]
-    # for y in years:
-    #     for d in DAYS:
-    #         for p in MORNING_PERIODS:
-    #             active_vars = []
-    #             for r_idx, req in enumerate(theory_reqs):
-    #                 if req['year'] == y:
-    #                     active_vars.append(theory_vars[(r_idx, d, p)])
-    #             for r_idx, req in enumerate(lab_reqs):
-    #                 if req['year'] == y:
-    #                     dur = req['duration']
-    #                     valid_starts = [0, 3, 6, 7] if dur == 2 else [0, 3, 6]
-    #                     for start in valid_starts:
-    #                         covers_p = False
-    #                         if start == 0:
-    #                             if dur == 2: covers_p = (p in [0, 1])
-    #                             else: covers_p = (p in [0, 1, 3])
-    #                         elif start == 3:
-    #                             if dur == 2: covers_p = (p in [3, 4])
-    #                             else: covers_p = (p in [3, 4, 6])
-    #                         if covers_p:
-    #                             active_vars.append(lab_vars[(r_idx, d, start)])
-    #             model.Add(sum(active_vars) >= 1)
-
-    # C8. Afternoon Periods Must Be Filled in Order (Sequential) - DISABLED
-    # This constraint was causing infeasibility.
-    # Afternoon periods must be filled sequentially from period 6 onwards.
-    # Afternoon periods: 6 (2:30-3:20), 7 (3:20-4:15), 8 (4:15-5:00)
-    # Rules:
-    #   - If period 7 is occupied, period 6 MUST also be occupied
-    #   - If period 8 is occupied, periods 6 AND 7 MUST also be occupied
-    # This ensures patterns like: [P6], [P6,P7], [P6,P7,P8], or [empty]
-    # NOT allowed: [P7], [P8], [P7,P8], [P6,P8]
-    # AFTERNOON_PERIODS = [6, 7, 8]
-    # 
-    # for y in years:
-    #     for d in DAYS:
-    #         # Check if period 6 has a class
-    #         period_6_vars = []
-    #         for r_idx, req in enumerate(theory_reqs):
-    #             if req['year'] == y:
-    #                 period_6_vars.append(theory_vars[(r_idx, d, 6)])
-    #         for r_idx, req in enumerate(lab_reqs):
-    #             if req['year'] == y:
-    #                 dur = req['duration']
-    #                 valid_starts = [0, 3, 6, 7] if dur == 2 else [0, 3, 6]
-    #                 for start in valid_starts:
-    #                     if start == 6 or (start == 3 and dur == 3):  # Labs covering period 6
-    #                         period_6_vars.append(lab_vars[(r_idx, d, start)])
-    #         
-    #         # Check if period 7 has a class
-    #         period_7_vars = []
-    #         for r_idx, req in enumerate(theory_reqs):
-    #             if req['year'] == y:
-    #                 period_7_vars.append(theory_vars[(r_idx, d, 7)])
-    #         for r_idx, req in enumerate(lab_reqs):
-    #             if req['year'] == y:
-    #                 dur = req['duration']
-    #                 valid_starts = [0, 3, 6, 7] if dur == 2 else [0, 3, 6]
-    #                 for start in valid_starts:
-    #                     covers_7 = False
-    #                     if start == 6: covers_7 = True  # All labs starting at 6 cover 7
-    #                     elif start == 7: covers_7 = True  # Labs starting at 7 cover 7
-    #                     if covers_7:
-    #                         period_7_vars.append(lab_vars[(r_idx, d, start)])
-    #         
-    #         # Check if period 8 has a class
-    #         period_8_vars = []
-    #         for r_idx, req in enumerate(theory_reqs):
-    #             if req['year'] == y:
-    #                 period_8_vars.append(theory_vars[(r_idx, d, 8)])
-    #         for r_idx, req in enumerate(lab_reqs):
-    #             if req['year'] == y:
-    #                 dur = req['duration']
-    #                 valid_starts = [0, 3, 6, 7] if dur == 2 else [0, 3, 6]
-    #                 for start in valid_starts:
-    #                     if start == 6 or start == 7:  # Labs covering period 8
-    #                         period_8_vars.append(lab_vars[(r_idx, d, start)])
-    #         
-    #         # Create boolean indicators for each period
-    #         period_6_occupied = model.NewBoolVar(f'P6_occupied_Y{y}_D{d}')
-    #         model.Add(sum(period_6_vars) >= 1).OnlyEnforceIf(period_6_occupied)
-    #         model.Add(sum(period_6_vars) == 0).OnlyEnforceIf(period_6_occupied.Not())
-    #         
-    #         period_7_occupied = model.NewBoolVar(f'P7_occupied_Y{y}_D{d}')
-    #         model.Add(sum(period_7_vars) >= 1).OnlyEnforceIf(period_7_occupied)
-    #         model.Add(sum(period_7_vars) == 0).OnlyEnforceIf(period_7_occupied.Not())
-    #         
-    #         period_8_occupied = model.NewBoolVar(f'P8_occupied_Y{y}_D{d}')
-    #         model.Add(sum(period_8_vars) >= 1).OnlyEnforceIf(period_8_occupied)
-    #         model.Add(sum(period_8_vars) == 0).OnlyEnforceIf(period_8_occupied.Not())
-    #         
-    #         # Constraint 1: If period 7 is occupied, period 6 MUST be occupied
-    #         # P7 => P6  (equivalent to: NOT P7 OR P6)
-    #         model.AddBoolOr([period_7_occupied.Not(), period_6_occupied])
-    #         
-    #         # Constraint 2: If period 8 is occupied, period 7 MUST be occupied
-    #         # P8 => P7  (equivalent to: NOT P8 OR P7)
-    #         model.AddBoolOr([period_8_occupied.Not(), period_7_occupied])
-    #         
-    #         # Note: Constraint 2 combined with Constraint 1 ensures:
-    #         # P8 => P7 => P6 (if 8 is filled, then 7 and 6 must also be filled)
-
-
-    # --- Hard Constraints: User Preferences ---
-    # If a user specifies a preference, we enforce it as a HARD constraint.
-    
-    # 1. Theory Preferences
-    for r_idx, req in enumerate(theory_reqs):
-        prefs = req['prefs']
-        for d, p_str in prefs.items():
-            if d in DAYS:
-                if p_str:
-                    try:
-                        p = int(p_str)
-                        if p in TEACHING_PERIODS:
-                            # Force theory class to be at this specific day and period
-                            model.Add(theory_vars[(r_idx, d, p)] == 1)
-                    except ValueError:
-                        pass
-                else:
-                    # Day preference only (Any time on this day)
-                    # Force the class to be scheduled on this day (at any valid time)
-                    model.Add(sum(theory_vars[(r_idx, d, p)] for p in SCHEDULABLE_PERIOD_INDICES) == 1)
-
-    # 2. Lab Preferences
-    for r_idx, req in enumerate(lab_reqs):
-        prefs = req['prefs']
-        for d, p_str in prefs.items():
-            if d in DAYS:
-                if p_str:
-                    try:
-                        target_p = int(p_str)
-                        # Find which valid start period covers this target period
-                        dur = req['duration']
-                        valid_starts = []
-                        if dur == 2:
-                            valid_starts = [0, 3, 6, 7]
-                        elif dur == 3:
-                            valid_starts = [0, 3, 6]
-                        
-                        forced_start = None
-                        for start in valid_starts:
-                            covers_p = False
-                            if start == 0:
-                                if dur == 2: covers_p = (target_p in [0, 1])
-                                else: covers_p = (target_p in [0, 1, 3])
-                            elif start == 3:
-                                if dur == 2: covers_p = (target_p in [3, 4])
-                                else: covers_p = (target_p in [3, 4, 6])
-                            elif start == 6:
-                                if dur == 2: covers_p = (target_p in [6, 7])
-                                else: covers_p = (target_p in [6, 7, 8])
-                            elif start == 7:
-                                covers_p = (target_p in [7, 8])
-                            
-                            if covers_p:
-                                forced_start = start
-                                break
-                        
-                        if forced_start is not None:
-                            # Force lab to start at the calculated start period
-                            model.Add(lab_vars[(r_idx, d, forced_start)] == 1)
-                            
-                    except ValueError:
-                        pass
-                else:
-                    # Day preference only (Any time on this day)
-                    # Force the lab to be scheduled on this day
-                    valid_starts = []
-                    for p in SCHEDULABLE_PERIOD_INDICES:
-                        if (r_idx, d, p) in lab_vars:
-                            valid_starts.append(lab_vars[(r_idx, d, p)])
-                    if valid_starts:
-                        model.Add(sum(valid_starts) == 1)
-
-    # --- Objective: Maximize Compactness (Optional) ---
-    # Since preferences are now hard constraints, we can use the objective 
-    # to keep the timetable compact or just leave it empty for feasibility only.
-    # For now, we'll just maximize feasibility.
-    # model.Maximize(sum(pref_score)) # Removed soft preferences
-                    
-    # model.Maximize(sum(pref_score)) # Removed soft preferences
-
-    # --- Solve ---
-    solver = cp_model.CpSolver()
-    solver.parameters.max_time_in_seconds = 10.0
-    status = solver.Solve(model)
-
-    # --- Reconstruct Timetable ---
-    timetables = {y: {d: [None] * len(PERIODS) for d in DAYS} for y in years}
-    
-    if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
-        print("[SUCCESS] OR-Tools found a solution!")
-        
-        # Fill Theory
-        for r_idx, req in enumerate(theory_reqs):
-            for d in DAYS:
-                for p in TEACHING_PERIODS:
-                    if solver.Value(theory_vars[(r_idx, d, p)]):
-                        y = req['year']
-                        s = req['subject']
-                        timetables[y][d][p] = s
-
-        # Fill Labs
-        for r_idx, req in enumerate(lab_reqs):
-            for d in DAYS:
-                valid_starts = [0, 3, 6, 7] if req['duration'] == 2 else [0, 3, 6]
-                for start in valid_starts:
-                    if solver.Value(lab_vars[(r_idx, d, start)]):
-                        y = req['year']
-                        s = req['subject']
-                        dur = req['duration']
-                        label = f"{s} - Lab"
-                        
-                        periods = []
-                        if start == 0: periods = [0, 1] if dur==2 else [0, 1, 3]
-                        elif start == 3: periods = [3, 4] if dur==2 else [3, 4, 6]
-                        elif start == 6: periods = [6, 7] if dur==2 else [6, 7, 8]
-                        elif start == 7: periods = [7, 8]
-                        
-                        for p in periods:
-                            timetables[y][d][p] = label
-
-        # Fill empty slots with Tutorial
-        for y in years:
-            for d in DAYS:
-                for p in TEACHING_PERIODS:
-                    if timetables[y][d][p] is None:
-                        timetables[y][d][p] = "Tutorial"
 
-    else:
-        print("[FAILURE] OR-Tools FAILED to find a solution. Constraints might be too tight.")
-    
-    return timetables, []
+@login_required
+@metrics.timed_view("download_teacher_timetables_zip")
+def download_teacher_timetables_zip(request):
+    """Every teacher's timetable PDF in one ZIP; ?master=1 adds the department PDF."""
+    with metrics.span("result_lookup"):
+        result = _get_timetable_result(request, with_index=True)
+    if not result:
+        return redirect("timetable_start")
+    timetables = result["timetables"]
+    index = result.get("teacher_index")
+    teacher_years = result.get("teacher_years") or {}
+    teachers = []
+    for teacher_name, subjects in result["teacher_subjects"].items():
+        slots = index.get(teacher_name, []) if index is not None else None
+        grids = results.teacher_grids(timetables, subjects, slots, years=teacher_years.get(teacher_name))
+        teachers.append((teacher_name, subjects, grids))
+    master = None
+    if request.GET.get("master"):
+        master = pdf_export.timetable_pdf(timetables, result["unallocated"], result["teacher_subjects"],
+                                          result["year_labels"], mark=metrics.mark)
+
+    response = StreamingHttpResponse(pdf_export.iter_teacher_bundle(teachers, result["year_labels"], master=master),
+                                     content_type='application/zip')
+    response['Content-Disposition'] = 'attachment; filename="teacher_timetables.zip"'
+    return response
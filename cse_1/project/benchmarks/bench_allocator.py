@@ -0,0 +1,141 @@
+# Benchmark suite: allocator build/solve time, model size and memory on
+# synthetic departments, checked against a JSON baseline.
+#
+# Usage (from cse_1/project):
+#   python benchmarks/bench_allocator.py                    # run and compare with the baseline
+#   python benchmarks/bench_allocator.py --save             # run and overwrite the baseline
+#   python benchmarks/bench_allocator.py --sizes 5 25 --years 1 2 3 --pref-density 0 0.3
+#
+# Every case runs in a fresh process so its peak RSS is its own. The run
+# exits with status 1 when a case changed status or model size, or got
+# slower than the baseline by more than --tolerance.
+import argparse
+import json
+import os
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(HERE, '..')))
+
+DEFAULT_BASELINE = os.path.join(HERE, "baselines", "allocator.json")
+
+# Timing differences below this many seconds are noise, whatever the ratio
+MIN_TIME_DELTA = 0.05
+
+
+def run_case(case):
+    """Build and solve one generated department; runs in a child process."""
+    import tracemalloc
+
+    from ortools.sat.python import cp_model
+
+    from app.solver import build_model, configure_solver, get_profile, model_size
+    from generators import make_department
+
+    entries = make_department(case["teachers"], years=case["years"], seed=case["seed"],
+                              pref_density=case["pref_density"])
+    started = time.perf_counter()
+    tm = build_model(entries)
+    build_seconds = time.perf_counter() - started
+
+    # tracemalloc slows allocation down, so measure memory on a second build
+    tracemalloc.start()
+    build_model(entries)
+    _, python_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    solver = cp_model.CpSolver()
+    configure_solver(solver, get_profile(case["profile"]))
+    started = time.perf_counter()
+    status = solver.Solve(tm.model)
+    solve_seconds = time.perf_counter() - started
+
+    return dict(
+        case,
+        entries=len(entries),
+        status=solver.StatusName(status),
+        build_seconds=round(build_seconds, 4),
+        solve_seconds=round(solve_seconds, 4),
+        python_peak_mb=round(python_peak / 2**20, 2),
+        # ru_maxrss is in KiB on Linux
+        peak_rss_mb=round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        **model_size(tm),
+    )
+
+
+def case_key(case):
+    return f"{case['teachers']}t-{case['years']}y-p{case['pref_density']}"
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of human-readable regressions against `baseline`."""
+    problems = []
+    for result in results:
+        key = case_key(result)
+        base = baseline.get(key)
+        if base is None or (base["seed"], base["profile"]) != (result["seed"], result["profile"]):
+            continue
+        for field in ("status", "variables", "constraints"):
+            if result[field] != base[field]:
+                problems.append(f"{key}: {field} {base[field]} -> {result[field]}")
+        for field in ("build_seconds", "solve_seconds"):
+            if result[field] - base[field] > max(MIN_TIME_DELTA, base[field] * tolerance):
+                problems.append(f"{key}: {field} {base[field]:.3f}s -> {result[field]:.3f}s")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Allocator benchmark suite with JSON baselines.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5, 10, 25, 50, 100, 200],
+                        help="numbers of teachers")
+    parser.add_argument("--years", type=int, nargs="+", default=[3], choices=[1, 2, 3])
+    parser.add_argument("--pref-density", type=float, nargs="+", default=[0.0, 0.2],
+                        help="share of entries with a day/time preference")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--profile", default="fast", help="solver profile name")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed fractional slowdown before a timing counts as a regression")
+    args = parser.parse_args(argv)
+
+    cases = [
+        {"teachers": n, "years": y, "pref_density": p, "seed": args.seed, "profile": args.profile}
+        for n in args.sizes for y in args.years for p in args.pref_density
+    ]
+
+    print(f"{'case':>16} {'entries':>7} {'vars':>7} {'cons':>7} {'build s':>8} {'solve s':>8} "
+          f"{'py MB':>6} {'rss MB':>7}  status")
+    results = []
+    for case in cases:
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            result = pool.submit(run_case, case).result()
+        results.append(result)
+        print(f"{case_key(result):>16} {result['entries']:>7} {result['variables']:>7} {result['constraints']:>7} "
+              f"{result['build_seconds']:>8.3f} {result['solve_seconds']:>8.3f} {result['python_peak_mb']:>6.1f} "
+              f"{result['peak_rss_mb']:>7.1f}  {result['status']}")
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump({case_key(r): r for r in results}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save to create one.")
+        return 0
+    with open(args.baseline) as f:
+        problems = compare(results, json.load(f), args.tolerance)
+    for problem in problems:
+        print("REGRESSION", problem)
+    print("No regressions." if not problems else f"{len(problems)} regression(s).")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,29 @@
+# Benchmark: CP-SAT model build time vs. number of entries.
+#
+# Usage (from cse_1/project):
+#   python benchmarks/bench_model_build.py
+#
+# Build time per entry should stay roughly flat as the department grows.
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.solver import build_model
+from generators import make_entries
+
+
+def main():
+    build_model(make_entries(1))  # warm up the OR-Tools import
+    print(f"{'teachers':>8} {'entries':>8} {'build ms':>10} {'us/entry':>10}")
+    for num_teachers in (5, 10, 25, 50, 100, 200):
+        entries = make_entries(num_teachers)
+        start = time.perf_counter()
+        build_model(entries)
+        elapsed = time.perf_counter() - start
+        print(f"{num_teachers:>8} {len(entries):>8} {elapsed * 1000:>10.1f} {elapsed * 1e6 / len(entries):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+# Benchmark: model size and presolve time, literal vs. reduced encoding.
+#
+# Usage (from cse_1/project):
+#   python benchmarks/bench_model_size.py
+#
+# The literal encoding creates every lab start and then forbids the
+# inadmissible ones, and adds preferences as equalities; the reduced one
+# (build_model's default) only creates admissible variables.
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ortools.sat.python import cp_model
+
+from app.solver import build_model, model_size
+from generators import make_entries
+
+
+def presolve_seconds(tm):
+    solver = cp_model.CpSolver()
+    solver.parameters.num_workers = 1
+    solver.parameters.stop_after_presolve = True
+    solver.Solve(tm.model)
+    return solver.WallTime()
+
+
+def main():
+    print(f"{'teachers':>8} {'encoding':>9} {'vars':>7} {'cons':>7} {'presolve ms':>12}")
+    for num_teachers in (5, 10, 25, 50, 100, 200):
+        entries = make_entries(num_teachers, pref_rate=0.3)
+        for reduce in (False, True):
+            tm = build_model(entries, reduce=reduce)
+            size = model_size(tm)
+            print(f"{num_teachers:>8} {'reduced' if reduce else 'literal':>9} {size['variables']:>7} "
+                  f"{size['constraints']:>7} {presolve_seconds(tm) * 1000:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+# Benchmark: render time per document of the three PDF exporters.
+#
+# Usage (from cse_1/project):
+#   python benchmarks/bench_pdf_render.py            # run and compare with the baseline
+#   python benchmarks/bench_pdf_render.py --save     # run and overwrite the baseline
+#   python benchmarks/bench_pdf_render.py --against HEAD~1   # before/after in one process
+#   python benchmarks/bench_pdf_render.py --teachers 10 50 --rooms 20
+#
+# A generated department is solved once (not timed); then the department
+# timetable, every teacher's timetable and a seating arrangement are
+# rendered --repeat times each. The table shows the median milliseconds per
+# document, split into layout (flowables and styles) and the ReportLab
+# build, next to the baseline's numbers. Timings drift between runs on a
+# busy machine; --against loads app/pdf_export.py from a git revision and
+# renders the same documents with it, alternating with the working tree,
+# so both columns see the same conditions.
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+import types
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(HERE, '..')))
+
+DEFAULT_BASELINE = os.path.join(HERE, "baselines", "pdf_render.json")
+
+YEAR_LABELS = {1: "I", 2: "III", 3: "V"}
+
+
+def make_arrangement(rooms, benches_per_room=30, students_per_bench=2, seed=0):
+    """A filled seating arrangement of seating.Room records, as views.seating_arrangement builds it."""
+    from app.roster import Student
+    from app.seating import Room
+
+    rng = random.Random(seed)
+    arrangement = []
+    serial = 0
+    for room in range(1, rooms + 1):
+        benches = []
+        for _ in range(benches_per_room):
+            students = []
+            for _ in range(students_per_bench):
+                serial += 1
+                section = rng.randint(1, 4)
+                students.append(Student(f"1AB2{section}CS{serial:03d}", f"Student {serial}", section))
+            benches.append(students)
+        arrangement.append(Room(room, benches, 0))
+    return arrangement
+
+
+def arrangement_for(exporter, arrangement):
+    """
+    `arrangement` in the shape `exporter` reads: exporters from before
+    seating.pack_rooms (see --against) take (room, [(bench, students)]).
+    """
+    try:
+        exporter.seating_pdf(arrangement[:1], 2)
+    except ValueError:
+        return [(room.number, list(enumerate(room.benches, 1))) for room in arrangement]
+    return arrangement
+
+
+def load_exporter(rev):
+    """app/pdf_export.py as of git revision `rev`, as a module of the app package."""
+    source = subprocess.run(["git", "show", f"{rev}:./app/pdf_export.py"], cwd=os.path.join(HERE, '..'),
+                            capture_output=True, text=True, check=True).stdout
+    module = types.ModuleType("app._pdf_export_baseline")
+    module.__package__ = "app"
+    exec(compile(source, f"{rev}:app/pdf_export.py", "exec"), module.__dict__)
+    return module
+
+
+def timed(render, repeat, exporters):
+    """
+    Median (total, layout, build) milliseconds of `repeat` calls of
+    render(exporter, mark) for each exporter; the exporters take turns.
+    """
+    samples = [[] for _ in exporters]
+    for _ in range(repeat):
+        for exporter, exporter_samples in zip(exporters, samples):
+            phases = {}
+
+            def mark(phase, started):
+                phases[phase] = time.perf_counter() - started
+
+            started = time.perf_counter()
+            render(exporter, mark)
+            exporter_samples.append((time.perf_counter() - started, phases["pdf_layout"], phases["pdf_build"]))
+    return [tuple(round(statistics.median(s[i] for s in runs) * 1000, 2) for i in range(3)) for runs in samples]
+
+
+def median_rows(rows):
+    return [tuple(round(statistics.median(r[k][i] for r in rows), 2) for i in range(3)) for k in range(len(rows[0]))]
+
+
+def run_timetables(num_teachers, repeat, seed, exporters):
+    from app import results
+    from app.jobs import collect_teacher_subjects
+    from app.solver import solve_timetable
+    from generators import make_department
+
+    entries = make_department(num_teachers, seed=seed)
+    solved = solve_timetable(entries, profile="fast")
+    timetables = solved["timetables"]
+    teacher_subjects = collect_teacher_subjects(entries)
+    index = solved["teacher_index"]
+    teacher_years = results.teacher_years(entries)
+
+    rows = {}
+    rows[f"timetable-{num_teachers}t"] = timed(
+        lambda exporter, mark: exporter.timetable_pdf(timetables, solved["unallocated"], teacher_subjects,
+                                                      YEAR_LABELS, mark=mark), repeat, exporters)
+
+    per_teacher = []
+    for teacher, subjects in teacher_subjects.items():
+        grids = results.teacher_grids(timetables, subjects, index.get(teacher, []),
+                                      years=teacher_years[teacher])
+        per_teacher.append(timed(
+            lambda exporter, mark: exporter.teacher_timetable_pdf(teacher, subjects, grids, YEAR_LABELS,
+                                                                  mark=mark), repeat, exporters))
+    rows[f"teacher-{num_teachers}t"] = median_rows(per_teacher)
+    return rows
+
+
+def run_seating(rooms, repeat, seed, exporters):
+    arrangement = make_arrangement(rooms, seed=seed)
+    shaped = {id(exporter): arrangement_for(exporter, arrangement) for exporter in exporters}
+    return {f"seating-{rooms}r": timed(
+        lambda exporter, mark: exporter.seating_pdf(shaped[id(exporter)], 2, mark=mark), repeat, exporters)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PDF exporter render-time benchmark with a JSON baseline.")
+    parser.add_argument("--teachers", type=int, nargs="+", default=[10, 50], help="department sizes")
+    parser.add_argument("--rooms", type=int, default=10, help="rooms in the seating arrangement")
+    parser.add_argument("--repeat", type=int, default=5, help="renders per document (median is shown)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--against", metavar="REV", help="also render with app/pdf_export.py from this git revision")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project.settings")
+    import django
+    django.setup()
+
+    from app import pdf_export
+    from app.startup import _warm_pdf
+    _warm_pdf()  # keep the ReportLab import out of the first sample
+
+    exporters = [pdf_export] + ([load_exporter(args.against)] if args.against else [])
+    rows = {}
+    for num_teachers in args.teachers:
+        rows.update(run_timetables(num_teachers, args.repeat, args.seed, exporters))
+    rows.update(run_seating(args.rooms, args.repeat, args.seed, exporters))
+    measured = {key: timings[0] for key, timings in rows.items()}
+
+    baseline = {}
+    if args.against:
+        baseline = {key: {"total_ms": timings[1][0]} for key, timings in rows.items()}
+        print(f"Baseline: app/pdf_export.py at {args.against}, rendered alternately with the working tree")
+    elif not args.save and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    print(f"{'document':>16} {'total ms':>9} {'layout ms':>10} {'build ms':>9} {'baseline ms':>12} {'speedup':>8}")
+    for key, (total, layout, build) in measured.items():
+        base = baseline.get(key)
+        base_text = f"{base['total_ms']:>12.2f} {base['total_ms'] / total:>7.2f}x" if base else f"{'-':>12} {'-':>8}"
+        print(f"{key:>16} {total:>9.2f} {layout:>10.2f} {build:>9.2f} {base_text}")
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump({key: {"total_ms": t, "layout_ms": lay, "build_ms": b, "repeat": args.repeat}
+                       for key, (t, lay, b) in measured.items()}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+# Benchmark: throughput and row accuracy of the roster backends.
+#
+# Usage (from cse_1/project):
+#   python benchmarks/bench_roster.py             # run and compare with the baseline
+#   python benchmarks/bench_roster.py --save      # run and overwrite the baseline
+#   python benchmarks/bench_roster.py --students 500 2000 --repeat 5
+#
+# A synthetic class list (generators.make_roster) is written once as a
+# ruled PDF table with a serial-number column and a header repeated on
+# every page, the way the department exports them, and as CSV and XLSX.
+# Each backend of app/roster.py parses its format --repeat times. The
+# table shows the median seconds, students per second, the share of
+# students read back with exactly their USN and name and the number of
+# rows that are not a student, next to the baseline's throughput.
+import argparse
+import csv
+import io
+import json
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(HERE, '..')))
+
+DEFAULT_BASELINE = os.path.join(HERE, "baselines", "roster.json")
+
+
+def roster_pdf(rows):
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle
+
+    buffer = io.BytesIO()
+    data = [["Sl No", "USN", "Name"]] + [[str(i), usn, name] for i, (usn, name) in enumerate(rows, 1)]
+    table = Table(data, colWidths=[50, 120, 250], repeatRows=1)
+    table.setStyle(TableStyle([("GRID", (0, 0), (-1, -1), 0.5, colors.black)]))
+    SimpleDocTemplate(buffer, pagesize=A4).build([table])
+    return buffer.getvalue()
+
+
+def roster_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["Sl No", "USN", "Name"])
+    writer.writerows([i, usn, name] for i, (usn, name) in enumerate(rows, 1))
+    return buffer.getvalue().encode("utf-8")
+
+
+def roster_xlsx(rows):
+    import openpyxl
+
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(["Sl No", "USN", "Name"])
+    for i, (usn, name) in enumerate(rows, 1):
+        sheet.append([i, usn, name])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def accuracy(parsed, rows):
+    """(share of rows read back exactly, parsed rows that are not in the roster)."""
+    expected = Counter(rows)
+    found = Counter(parsed)
+    exact = sum((expected & found).values())
+    return round(exact / len(rows), 4), sum((found - expected).values())
+
+
+def run(students, repeat, seed):
+    from app import roster
+    from generators import make_roster
+
+    rows = make_roster(students, seed=seed)
+    documents = {"pdf": roster_pdf(rows), "csv": roster_csv(rows)}
+    try:
+        documents["xlsx"] = roster_xlsx(rows)
+    except ImportError:
+        print("openpyxl is not installed; skipping the xlsx backend")
+
+    measured = {}
+    for backend in roster.BACKENDS:
+        data = documents.get(backend if backend in roster.EXTENSION_BACKENDS.values() else "pdf")
+        if data is None:
+            continue
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            parsed = roster.read_roster(io.BytesIO(data), backend)
+            samples.append(time.perf_counter() - started)
+        seconds = statistics.median(samples)
+        exact, extra = accuracy(parsed, rows)
+        measured[f"{backend}-{students}"] = {
+            "seconds": round(seconds, 4),
+            "students_per_s": round(students / seconds),
+            "exact": exact,
+            "extra": extra,
+            "repeat": repeat,
+        }
+    return measured
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Roster backend throughput and accuracy benchmark.")
+    parser.add_argument("--students", type=int, nargs="+", default=[2000], help="class list sizes")
+    parser.add_argument("--repeat", type=int, default=3, help="parses per backend (median is shown)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project.settings")
+    import django
+    django.setup()
+
+    measured = {}
+    for students in args.students:
+        measured.update(run(students, args.repeat, args.seed))
+
+    baseline = {}
+    if not args.save and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    print(f"{'backend':>16} {'seconds':>8} {'students/s':>11} {'exact':>7} {'extra':>6} {'baseline/s':>11}")
+    for key, row in measured.items():
+        base = baseline.get(key)
+        base_text = f"{base['students_per_s']:>11}" if base else f"{'-':>11}"
+        print(f"{key:>16} {row['seconds']:>8.3f} {row['students_per_s']:>11} {row['exact']:>7.1%} "
+              f"{row['extra']:>6} {base_text}")
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(measured, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+# Benchmark: bench allocation time and section mixing for large exams.
+#
+# Usage (from cse_1/project):
+#   python benchmarks/bench_seating.py                    # 10k and 50k students
+#   python benchmarks/bench_seating.py --students 30000 --sections 12
+#
+# Sections get skewed sizes (each half the size of the one before), as
+# when one big semester sits with a few small ones. Both the round-robin
+# loop seating_arrangement used before app/seating.py and
+# seating.allocate_benches seat them on as few benches as fit everyone
+# (every seat taken); the table shows the milliseconds, benches with two
+# students of one section and neighbouring benches that share a section.
+#
+# A second table packs a plan into --rooms rooms of --benches benches,
+# filled to --fill, with the padded bench-by-bench loop used before
+# seating.pack_rooms and with pack_rooms itself, and shows the
+# milliseconds to build and to JSON-encode the plan (as the session does)
+# and its size.
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(HERE, '..')))
+
+
+def round_robin(sections, students_per_bench):
+    """The allocation loop of views.seating_arrangement before app/seating.py."""
+    num_sems = len(sections)
+    section_deques = [deque(sec) for sec in sections]
+    benches = []
+    bench = []
+    sec_cycle = 0
+    while any(d for d in section_deques):
+        if section_deques[sec_cycle]:
+            bench.append(section_deques[sec_cycle].popleft())
+            if len(bench) == students_per_bench:
+                benches.append(bench)
+                bench = []
+        sec_cycle = (sec_cycle + 1) % num_sems
+    if bench:
+        benches.append(bench)
+    return benches
+
+
+def skewed_sections(students, sections):
+    sizes = [students >> (i + 1) for i in range(sections)]
+    sizes[0] += students - sum(sizes)
+    return [[(section, i) for i in range(size)] for section, size in enumerate(sizes)]
+
+
+def padded_rooms(benches, total_rooms, benches_per_room, students_per_bench):
+    """The room loop of views.seating_arrangement before seating.pack_rooms."""
+    arrangement = []
+    bench_idx = 0
+    for room in range(1, total_rooms + 1):
+        room_benches = []
+        for b in range(1, benches_per_room + 1):
+            if bench_idx < len(benches):
+                bench_students = benches[bench_idx] + [None] * (students_per_bench - len(benches[bench_idx]))
+                room_benches.append((b, bench_students))
+                bench_idx += 1
+            else:
+                room_benches.append((b, [None] * students_per_bench))
+        arrangement.append((room, room_benches))
+    return arrangement
+
+
+def mixing(benches):
+    """(benches seating one section twice, neighbouring benches sharing a section)."""
+    sets = [{section for section, _ in bench} for bench in benches]
+    doubled = sum(len(s) < len(bench) for s, bench in zip(sets, benches))
+    shared = sum(bool(a & b) for a, b in zip(sets, sets[1:]))
+    return doubled, shared
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bench allocator time and mixing benchmark.")
+    parser.add_argument("--students", type=int, nargs="+", default=[10000, 50000])
+    parser.add_argument("--sections", type=int, default=8)
+    parser.add_argument("--per-bench", type=int, default=2)
+    parser.add_argument("--rooms", type=int, default=100)
+    parser.add_argument("--benches", type=int, default=30, help="benches per room")
+    parser.add_argument("--fill", type=float, default=0.6, help="share of benches taken")
+    args = parser.parse_args(argv)
+
+    from app.roster import Student
+    from app.seating import allocate_benches, pack_rooms
+
+    def capacity(sections):
+        return -(-sum(map(len, sections)) // args.per_bench)
+
+    allocators = {
+        "round-robin": lambda sections: round_robin(sections, args.per_bench),
+        "allocate_benches": lambda sections: allocate_benches(sections, args.per_bench, capacity(sections),
+                                                              rng=None)[0],
+    }
+    print(f"{'allocator':>18} {'students':>9} {'ms':>9} {'benches':>8} {'doubled':>8} {'shared':>8}")
+    for students in args.students:
+        sections = skewed_sections(students, args.sections)
+        for name, allocate in allocators.items():
+            started = time.perf_counter()
+            benches = allocate(sections)
+            elapsed = (time.perf_counter() - started) * 1000
+            doubled, shared = mixing(benches)
+            print(f"{name:>18} {students:>9} {elapsed:>9.1f} {len(benches):>8} {doubled:>8} {shared:>8}")
+
+    used = int(args.rooms * args.benches * args.fill)
+    benches = [[Student(f"1AB2{seat}CS{i:04d}", f"Student {i}-{seat}", seat) for seat in range(args.per_bench)]
+               for i in range(used)]
+    packers = {
+        "padded loop": lambda: padded_rooms(benches, args.rooms, args.benches, args.per_bench),
+        "pack_rooms": lambda: pack_rooms(benches, [args.benches] * args.rooms),
+    }
+    print()
+    print(f"{'packer':>18} {'rooms':>9} {'pack ms':>9} {'json ms':>8} {'kB':>8}")
+    for name, pack in packers.items():
+        started = time.perf_counter()
+        rooms = pack()
+        packed = time.perf_counter()
+        blob = json.dumps(rooms)
+        encoded = time.perf_counter()
+        print(f"{name:>18} {args.rooms:>9} {(packed - started) * 1000:>9.2f} {(encoded - packed) * 1000:>8.2f} "
+              f"{len(blob) / 1024:>8.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
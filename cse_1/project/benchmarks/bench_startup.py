@@ -0,0 +1,78 @@
+# Benchmark: process startup and first-request cost for both startup modes.
+#
+# Usage (from cse_1/project):
+#   python benchmarks/bench_startup.py [--runs 3]
+#
+# "tooling" is what manage.py commands and tests pay to load the app; the
+# "eager imports" row loads PyPDF2/ReportLab/OR-Tools up front the way the
+# views module used to. "serving" imports project.wsgi with the warm-up
+# hook on and off, then times the first solve and the first PDF render.
+# Every measurement runs in a fresh interpreter.
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROJECT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+TOOLING = """
+import os, time, json
+started = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
+import django
+django.setup()
+import app.urls, app.views
+if {eager}:
+    import PyPDF2, reportlab.platypus
+    from ortools.sat.python import cp_model
+print(json.dumps({{"startup": time.perf_counter() - started}}))
+"""
+
+SERVING = """
+import os, time, json
+os.environ['TIMETABLE_WARM_UP'] = '{warm}'
+started = time.perf_counter()
+import project.wsgi
+startup = time.perf_counter() - started
+from app.startup import WARM_UP_ENTRIES, _warm_pdf
+from app.solver import solve_timetable
+started = time.perf_counter()
+solve_timetable(WARM_UP_ENTRIES, profile={{"num_workers": 1}})
+first_solve = time.perf_counter() - started
+started = time.perf_counter()
+_warm_pdf()
+first_pdf = time.perf_counter() - started
+print(json.dumps({{"startup": startup, "first_solve": first_solve, "first_pdf": first_pdf}}))
+"""
+
+
+def measure(code, runs):
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", code], cwd=PROJECT, capture_output=True, text=True, check=True)
+        samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return {key: statistics.median(s[key] for s in samples) for key in samples[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup-time benchmark for tooling and serving modes.")
+    parser.add_argument("--runs", type=int, default=3, help="fresh processes per mode (median is shown)")
+    args = parser.parse_args()
+
+    rows = [
+        ("tooling, lazy imports", measure(TOOLING.format(eager=False), args.runs)),
+        ("tooling, eager imports", measure(TOOLING.format(eager=True), args.runs)),
+        ("serving, no warm-up", measure(SERVING.format(warm=0), args.runs)),
+        ("serving, warm-up", measure(SERVING.format(warm=1), args.runs)),
+    ]
+    print(f"{'mode':<24} {'startup s':>10} {'1st solve s':>12} {'1st pdf s':>10}")
+    for name, r in rows:
+        solve = f"{r['first_solve']:.3f}" if "first_solve" in r else "-"
+        pdf = f"{r['first_pdf']:.3f}" if "first_pdf" in r else "-"
+        print(f"{name:<24} {r['startup']:>10.3f} {solve:>12} {pdf:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# Seeded generators of synthetic `entries` lists for the allocator benchmarks,
+# and of student class lists for the roster benchmark.
+#
+# Entries have the same shape as the ones views.timetable_teachers builds
+# from the teacher formset, so anything the solver accepts from the UI can
+# be benchmarked here.
+import random
+
+DAYS = ["Mon", "Tue", "Wed", "Thu", "Fri"]
+
+# Share of each entry kind in a generated department
+DEFAULT_MIX = {"theory": 0.55, "integrated": 0.2, "external": 0.1, "lab": 0.15}
+
+
+# Periods a preference of each kind may name ("" = any time that day).
+# An integrated entry shares one preference between its theory class and
+# its lab, so only a day-only preference can hold for both.
+PREF_PERIODS = {
+    "theory": ["0", "1", "3", "4", "6", "7", "8"],
+    "integrated": [""],
+    "external": [""],
+    "lab": ["0", "3", "6"],
+}
+
+# Load one year group can take: teaching hours (labs count their periods)
+# out of the 35 weekly teaching slots, and labs (at most one per day)
+GROUP_HOURS = 24
+GROUP_LABS = 4
+
+
+def make_department(num_teachers, years=3, seed=0, pref_density=0.0, mix=None):
+    """
+    A department of `num_teachers` teachers teaching years 1..`years`.
+
+    Every teacher handles one to three subjects in distinct year groups,
+    drawn from `mix` (kind -> weight, see DEFAULT_MIX). Once a year group
+    is full (GROUP_HOURS, GROUP_LABS), further subjects of that year go to
+    a new section, numbered year + 10 * section; the solver treats every
+    section as a year of its own. `pref_density` is the share of entries
+    that carry one day/time preference; a third of those are day-only.
+    The same arguments always give the same list.
+    """
+    rng = random.Random(seed)
+    kinds, weights = zip(*(mix or DEFAULT_MIX).items())
+    load = {}  # year group -> [hours, labs]
+    entries = []
+    for t in range(num_teachers):
+        teacher = f"T{t}"
+        taken = set()
+        for year in rng.sample(range(1, years + 1), rng.randint(1, min(3, years))):
+            kind = rng.choices(kinds, weights)[0]
+            hours = 0 if kind == "lab" else rng.randint(2, 4)
+            has_lab = kind != "theory"
+            periods = hours + (3 if kind == "external" else 2 if has_lab else 0)
+
+            group = year
+            while group in taken or (load.get(group, [0, 0])[0] + periods > GROUP_HOURS
+                                     or load.get(group, [0, 0])[1] + has_lab > GROUP_LABS):
+                group += 10
+            taken.add(group)
+            group_load = load.setdefault(group, [0, 0])
+            group_load[0] += periods
+            group_load[1] += has_lab
+
+            entries.append({
+                "teacher": teacher, "year": group, "subject": f"S{t}_{year}",
+                "hours": hours,
+                "is_integrated": kind in ("integrated", "external"),
+                "is_lab": kind == "lab",
+                "is_external_lab": kind == "external",
+                "remaining": hours,
+                "day_time_prefs": {},
+            })
+            if rng.random() < pref_density:
+                day = rng.choice(DAYS)
+                period = "" if rng.random() < 1 / 3 else rng.choice(PREF_PERIODS[kind])
+                entries[-1]["day_time_prefs"] = {day: period}
+    return entries
+
+
+def make_entries(num_teachers, years=3, seed=0, pref_rate=0.0):
+    """
+    Two entries per teacher spread over `years`, with a mix of theory and lab subjects.
+
+    A `pref_rate` share of the entries gets a day/time preference.
+    """
+    rng = random.Random(seed)
+    entries = []
+    for t in range(num_teachers):
+        for k in range(2):
+            year = rng.randint(1, years)
+            kind = rng.random()
+            entries.append({
+                "teacher": f"T{t}", "year": year, "subject": f"S{t}_{k}",
+                "hours": 0 if kind > 0.85 else rng.randint(2, 4),
+                "is_integrated": 0.6 < kind <= 0.85, "is_lab": kind > 0.85,
+                "is_external_lab": kind > 0.95, "remaining": 0,
+                "day_time_prefs": {},
+            })
+            if rng.random() < pref_rate:
+                day = rng.choice(DAYS)
+                entries[-1]["day_time_prefs"] = {day: rng.choice(["", "0", "3", "6"])}
+    return entries
+
+
+# Name parts of generated students; some are short or contain the words
+# the roster line heuristics look for ("Namratha", "Usha")
+FIRST_NAMES = ["Aditya", "Namratha", "Usha", "Om", "Ravi", "Sneha", "Kiran", "Bhavana", "Mohammed", "Rohan",
+               "Shreya", "Tejas", "Ananya", "Vinay", "Pooja", "Ali"]
+LAST_NAMES = ["Rao", "K", "Hegde", "Shetty", "Naik", "Gowda", "Kulkarni", "Bhat", "M S", "Patil", "Name", ""]
+
+
+def make_roster(students, sem=1, seed=0):
+    """
+    (usn, name) rows of a class list of `students` students of semester `sem`.
+
+    USNs are unique within a semester and names repeat, as they do in real
+    lists. The same arguments always give the same list.
+    """
+    rng = random.Random(seed * 1000 + sem)
+    year = 26 - (sem + 1) // 2
+    rows = []
+    for i in range(1, students + 1):
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}".strip()
+        rows.append((f"1AB{year}CS{i:03d}", name.upper() if rng.random() < 0.3 else name))
+    return rows
@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
 
 application = get_asgi_application()
+
+# Serving workers load OR-Tools and ReportLab before taking traffic
+from app.startup import warm_up  # noqa: E402
+
+warm_up()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,10 +43,13 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    # SessionMiddleware that also times the session write (see app/metrics.py)
+    'app.metrics.TimedSessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # Staff-only ?_profile=1 / ?_profile=store (see app/profiling.py)
+    'app.profiling.ProfileMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -121,3 +125,86 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Timetable solve jobs
+# Solves run on a background thread pool; TIMETABLE_JOBS_EAGER runs them
+# inline instead (useful for tests and debugging).
+TIMETABLE_JOB_WORKERS = 4
+TIMETABLE_JOBS_KEEP = 200
+TIMETABLE_JOBS_EAGER = False
+
+# Default CP-SAT profile (see app/solver.py SOLVER_PROFILES); users can
+# pick another one per run on the timetable start page.
+TIMETABLE_SOLVER_PROFILE = 'balanced'
+
+# Maximum number of solved timetables kept in the solution cache (LRU)
+TIMETABLE_SOLUTION_CACHE_SIZE = 500
+
+# Finished timetables kept per user (app/results.py); the session only
+# stores the id of the current one
+TIMETABLE_RESULTS_PER_USER = 20
+
+# Processes parsing the roster PDFs of one seating run side by side
+# (app/roster.py); None means one per CPU core.
+SEATING_PARSE_WORKERS = None
+
+# Backend reading uploaded roster PDFs when the seating form leaves it on
+# automatic: "auto" picks one per file by its content (app/roster.py
+# detect_backend), or force "pypdfium2", "pdfplumber" (ruled tables) or
+# "pypdf2". PyPDF2 splits the cells of ruled tables and read none of their
+# rows back exactly in benchmarks/bench_roster.py. CSV and XLSX rosters are
+# always read directly.
+SEATING_ROSTER_BACKEND = "auto"
+
+# Parsed rosters kept by content hash (app/roster_cache.py, LRU), so
+# re-uploading the same class lists skips extraction
+SEATING_ROSTER_CACHE_SIZE = 200
+
+# Rendered download PDFs and result-page grids, keyed by result version
+# (app/render_cache.py). Each worker process keeps its own LRU-bounded copy.
+TIMETABLE_RENDER_CACHE_SIZE = 200
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'renders': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'timetable-renders',
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': TIMETABLE_RENDER_CACHE_SIZE},
+    },
+}
+
+# Who may scrape /metrics/ besides staff users (app/metrics.py): client
+# addresses, and a token sent as "Authorization: Bearer <token>". Metrics
+# are per worker process; run several workers with PROMETHEUS_MULTIPROC_DIR
+# set so a scrape covers all of them.
+TIMETABLE_METRICS_ALLOWED_IPS = []
+TIMETABLE_METRICS_TOKEN = os.environ.get('TIMETABLE_METRICS_TOKEN', '')
+
+# Raw cProfile dumps of requests profiled with ?_profile=store
+TIMETABLE_PROFILE_DIR = BASE_DIR / 'profiles'
+
+# Logging: the app logs through the standard `logging` module; raise
+# TIMETABLE_LOG_LEVEL to DEBUG to see per-teacher preference and model details.
+TIMETABLE_LOG_LEVEL = os.environ.get('TIMETABLE_LOG_LEVEL', 'INFO')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simple': {'format': '%(asctime)s %(levelname)s %(name)s: %(message)s'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'simple'},
+    },
+    'loggers': {
+        'app': {'handlers': ['console'], 'level': TIMETABLE_LOG_LEVEL, 'propagate': False},
+    },
+}
+
+# Serving workers (project/wsgi.py, project/asgi.py) import OR-Tools and
+# ReportLab and run a tiny solve and PDF render before taking traffic.
+# Management commands and tests never warm up.
+TIMETABLE_WARM_UP = os.environ.get('TIMETABLE_WARM_UP', '1') != '0'
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
 
 application = get_wsgi_application()
+
+# Serving workers load OR-Tools and ReportLab before taking traffic
+from app.startup import warm_up  # noqa: E402
+
+warm_up()
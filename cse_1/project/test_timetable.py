@@ -25,7 +25,7 @@ if not settings.configured:
 # Add project root to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), 'cse_1', 'project')))
 
-from app.views import allocate_timetable_with_ga
+from app.solver import allocate_timetable_with_ga
 
 def test_allocation():
     entries = [
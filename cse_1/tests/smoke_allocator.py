@@ -1,6 +1,7 @@
+import os
 import sys
-sys.path.insert(0, r'c:\Users\Rohan H G\OneDrive\Desktop\cse_1')
-from project.app.views import allocate_timetable_with_rest
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'project'))
+from app.solver import allocate_timetable_with_ga
 import pprint
 
 entries = [
@@ -10,7 +11,7 @@ entries = [
 ]
 
 if __name__ == '__main__':
-    tt, un = allocate_timetable_with_rest(entries)
+    tt, un = allocate_timetable_with_ga(entries)
     print('Year1 Mon:')
     pprint.pprint(tt[1]['Mon'])
     print('\nYear1 Tue:')